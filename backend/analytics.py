@@ -0,0 +1,367 @@
+"""
+🧮 EnterprisePro - Motor de Analítica (NumPy)
+Instantáneas columnares de projects, employees, tasks y time_entries en arrays
+Cada informe se calcula en pasadas vectorizadas sobre las columnas en memoria
+"""
+
+import threading
+import time
+from datetime import date
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+
+# Columnas cargadas por tabla: (nombre, expresión SQL, tipo)
+# Tipos: int (NULL → 0, los ids empiezan en 1), float (NULL → NaN),
+# date (NULL → NaT), str y bool. Las filas se leen ordenadas por id.
+SNAPSHOT_COLUMNS = {
+    'projects': [
+        ('id', 'id', 'int'),
+        ('name', 'name', 'object'),
+        ('status', 'status', 'str'),
+        ('progress', 'progress', 'float'),
+        ('budget', 'budget', 'float'),
+        ('spent_budget', 'spent_budget', 'float'),
+        ('department_id', 'department_id', 'int'),
+        ('start_date', 'date(start_date)', 'date'),
+        ('deadline', 'date(deadline)', 'date')
+    ],
+    'employees': [
+        ('id', 'id', 'int'),
+        ('user_id', 'user_id', 'int'),
+        ('department_id', 'department_id', 'int'),
+        ('status', 'status', 'str'),
+        ('salary', 'salary', 'float'),
+        ('performance_score', 'performance_score', 'float'),
+        ('hire_date', 'date(hire_date)', 'date')
+    ],
+    'tasks': [
+        ('id', 'id', 'int'),
+        ('project_id', 'project_id', 'int'),
+        ('status', 'status', 'str'),
+        ('estimated_hours', 'estimated_hours', 'float'),
+        ('actual_hours', 'actual_hours', 'float'),
+        ('due_date', 'date(due_date)', 'date'),
+        ('created_date', 'date(created_at)', 'date'),
+        ('completed_date', 'date(completed_at)', 'date')
+    ],
+    'time_entries': [
+        ('id', 'id', 'int'),
+        ('user_id', 'user_id', 'int'),
+        ('project_id', 'project_id', 'int'),
+        ('hours', 'hours', 'float'),
+        ('entry_date', 'date(entry_date)', 'date'),
+        ('billable', 'billable', 'bool')
+    ]
+}
+
+# Tablas en las que la aplicación sólo inserta: se cargan las filas nuevas por id
+APPEND_ONLY = frozenset({'time_entries'})
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+def _number(value) -> Optional[float]:
+    """Escalar NumPy → float de Python redondeado (NaN/inf → None)"""
+    if value is None:
+        return None
+    value = float(value)
+    return round(value, 4) if np.isfinite(value) else None
+
+def _percentiles(values: np.ndarray) -> Optional[Dict[str, float]]:
+    values = values[np.isfinite(values)]
+    if not values.size:
+        return None
+    return {f'p{q}': _number(v) for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+def _histogram(values: np.ndarray, bins: int, value_range: tuple) -> Dict[str, list]:
+    values = values[np.isfinite(values)]
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return {'edges': [_number(edge) for edge in edges], 'counts': counts.tolist()}
+
+def _correlation(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    """Pearson sobre los pares finitos; None si no hay variación suficiente"""
+    mask = np.isfinite(x) & np.isfinite(y)
+    if mask.sum() < 3 or np.std(x[mask]) == 0 or np.std(y[mask]) == 0:
+        return None
+    return _number(np.corrcoef(x[mask], y[mask])[0, 1])
+
+def _counts(values: np.ndarray) -> Dict[str, int]:
+    labels, counts = np.unique(values, return_counts=True)
+    return {str(label): int(count) for label, count in zip(labels, counts)}
+
+def _index_of(ids: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Posición de cada clave en ``ids`` (ordenado) o -1 si no está"""
+    if not ids.size:
+        return np.full(keys.shape, -1)
+    positions = np.searchsorted(ids, keys)
+    positions[positions >= ids.size] = 0
+    return np.where(ids[positions] == keys, positions, -1)
+
+class ColumnSnapshot:
+    """Columnas de una tabla como arrays NumPy, con refresco incremental
+    
+    Sólo se vuelve a leer SQLite si la versión de la tabla en TableVersions
+    cambió o la copia supera ``max_age`` (escrituras de otros procesos). En
+    tablas de sólo inserción se añaden las filas con id mayor que el último
+    cargado; si el recuento no cuadra (borrados) se recarga entera.
+    """
+    
+    def __init__(self, db_manager, table: str, max_age: float = 300):
+        self.db = db_manager
+        self.table = table
+        self.max_age = max_age
+        self.columns = SNAPSHOT_COLUMNS[table]
+        self.append_only = table in APPEND_ONLY
+        self.select = f"SELECT {', '.join(expression for _, expression, _ in self.columns)} FROM {table}"
+        self.arrays: Dict[str, np.ndarray] = {}
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {'full_loads': 0, 'incremental_loads': 0, 'rows_loaded': 0, 'last_load_ms': 0.0}
+    
+    def _to_arrays(self, rows: List[tuple]) -> Dict[str, np.ndarray]:
+        columns = list(zip(*rows)) if rows else [()] * len(self.columns)
+        arrays = {}
+        for (name, _, kind), values in zip(self.columns, columns):
+            if kind == 'int':
+                arrays[name] = np.array([value or 0 for value in values], dtype=np.int64)
+            elif kind == 'float':
+                arrays[name] = np.array(values, dtype=np.float64)
+            elif kind == 'date':
+                arrays[name] = np.array(values, dtype='datetime64[D]')
+            elif kind == 'bool':
+                arrays[name] = np.array(values, dtype=bool)
+            elif kind == 'str':
+                arrays[name] = np.array([value or '' for value in values], dtype=str)
+            else:
+                arrays[name] = np.array(values, dtype=object)
+        return arrays
+    
+    def get(self) -> Dict[str, np.ndarray]:
+        """Arrays actuales (se reemplazan enteros al refrescar: nunca a medias)"""
+        version, _ = self.db.table_versions.snapshot((self.table,))
+        if version == self._version and time.monotonic() - self._loaded_at < self.max_age:
+            return self.arrays
+        
+        with self._lock:
+            if version == self._version and time.monotonic() - self._loaded_at < self.max_age:
+                return self.arrays
+            started = time.perf_counter()
+            self.arrays = self._load()
+            self._version = version
+            self._loaded_at = time.monotonic()
+            self._stats['last_load_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return self.arrays
+    
+    def _load(self) -> Dict[str, np.ndarray]:
+        with self.db.connection() as conn:
+            if self.append_only and self.arrays:
+                last_id = int(self.arrays['id'][-1]) if self.arrays['id'].size else 0
+                rows = conn.execute(f"{self.select} WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+                total = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+                if total == self.arrays['id'].size + len(rows):
+                    self._stats['incremental_loads'] += 1
+                    self._stats['rows_loaded'] += len(rows)
+                    if not rows:
+                        return self.arrays
+                    new = self._to_arrays(rows)
+                    return {name: np.concatenate((self.arrays[name], new[name])) for name in new}
+            
+            rows = conn.execute(f"{self.select} ORDER BY id").fetchall()
+        self._stats['full_loads'] += 1
+        self._stats['rows_loaded'] += len(rows)
+        return self._to_arrays(rows)
+    
+    def stats(self) -> Dict[str, Any]:
+        arrays = self.arrays
+        return {**self._stats, 'rows': int(arrays['id'].size) if arrays else 0,
+                'bytes': int(sum(array.nbytes for array in arrays.values()))}
+
+class AnalyticsEngine:
+    """Informes calculados sobre las instantáneas columnares
+    
+    Cada informe lee las columnas que necesita (refrescándolas si hace
+    falta) y las resume con operaciones vectorizadas: percentiles,
+    histogramas, correlaciones, bincount por clave y proyecciones.
+    """
+    
+    # Por debajo de este progreso la extrapolación lineal no es significativa
+    MIN_PROJECTION_PROGRESS = 5
+    
+    def __init__(self, db_manager, max_age: float = 300):
+        self.snapshots = {table: ColumnSnapshot(db_manager, table, max_age=max_age)
+                          for table in SNAPSHOT_COLUMNS}
+    
+    def frame(self, table: str) -> Dict[str, np.ndarray]:
+        return self.snapshots[table].get()
+    
+    @staticmethod
+    def _today() -> np.datetime64:
+        return np.datetime64(date.today(), 'D')
+    
+    def project_report(self, top: int = 10) -> Dict[str, Any]:
+        """Cartera: estados, progreso, presupuesto, horas y proyección de fin"""
+        p = self.frame('projects')
+        te = self.frame('time_entries')
+        today = self._today()
+        
+        # Horas imputadas por proyecto en una pasada
+        positions = _index_of(p['id'], te['project_id'])
+        logged = positions >= 0
+        hours = np.bincount(positions[logged], weights=te['hours'][logged], minlength=p['id'].size)
+        
+        budget, spent = p['budget'], p['spent_budget']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            utilization = np.where(budget > 0, spent / budget, np.nan)
+        
+        # Proyección lineal: al ritmo actual, ¿cuándo se llega al 100 %?
+        progress = p['progress']
+        started = ((p['status'] == 'active') & ~np.isnat(p['start_date'])
+                   & (progress >= self.MIN_PROJECTION_PROGRESS) & (progress < 100))
+        elapsed = (today - p['start_date'][started]).astype(np.float64)
+        projected_end = p['start_date'][started] + np.ceil(elapsed * 100 / progress[started]).astype('timedelta64[D]')
+        deadline = p['deadline'][started]
+        days_late = (projected_end - deadline).astype(np.float64)
+        late = ~np.isnat(deadline) & (days_late > 0)
+        order = np.argsort(-days_late[late])[:top]
+        late_ids = p['id'][started][late][order]
+        late_names = p['name'][started][late][order]
+        
+        return {
+            'total': int(p['id'].size),
+            'by_status': _counts(p['status']),
+            'progress': {
+                'avg': _number(np.nanmean(progress)) if progress.size else None,
+                'percentiles': _percentiles(progress),
+                'histogram': _histogram(progress, 10, (0, 100))
+            },
+            'budget': {
+                'total': _number(np.nansum(budget)),
+                'spent': _number(np.nansum(spent)),
+                'utilization': _percentiles(utilization),
+                'over_budget': int(np.sum(utilization > 1)),
+                'correlation_budget_progress': _correlation(budget, progress),
+                'correlation_hours_spent': _correlation(hours, spent)
+            },
+            'hours': {
+                'total': _number(hours.sum()),
+                'per_project': _percentiles(hours[hours > 0])
+            },
+            'projection': {
+                'active_with_progress': int(started.sum()),
+                'at_risk': int(late.sum()),
+                'late': [
+                    {'id': int(project_id), 'name': name,
+                     'projected_end': str(end), 'deadline': str(limit), 'days_late': int(days)}
+                    for project_id, name, end, limit, days in zip(
+                        late_ids, late_names, projected_end[late][order],
+                        deadline[late][order], days_late[late][order])
+                ]
+            }
+        }
+    
+    def workforce_report(self, days: int = 30) -> Dict[str, Any]:
+        """Plantilla: departamentos, rendimiento, salarios y horas recientes"""
+        e = self.frame('employees')
+        te = self.frame('time_entries')
+        today = self._today()
+        
+        active = e['status'] == 'active'
+        departments, headcount = np.unique(e['department_id'][active], return_counts=True)
+        performance = e['performance_score'][active]
+        salary = e['salary'][active]
+        
+        recent = te['entry_date'] >= today - np.timedelta64(days, 'D')
+        users, inverse = np.unique(te['user_id'][recent], return_inverse=True)
+        hours_by_user = np.bincount(inverse, weights=te['hours'][recent], minlength=users.size)
+        billable_by_user = np.bincount(inverse, weights=te['hours'][recent] * te['billable'][recent],
+                                       minlength=users.size)
+        total_hours = hours_by_user.sum()
+        
+        # Rendimiento frente a horas recientes de cada empleado activo
+        positions = _index_of(users, e['user_id'][active])
+        employee_hours = np.zeros(positions.size)
+        employee_hours[positions >= 0] = hours_by_user[positions[positions >= 0]]
+        
+        return {
+            'active_employees': int(active.sum()),
+            'by_department': {str(int(department)): int(count)
+                              for department, count in zip(departments, headcount)},
+            'performance': {
+                'avg': _number(np.nanmean(performance)) if performance.size else None,
+                'percentiles': _percentiles(performance),
+                'histogram': _histogram(performance, 10, (0, 5))
+            },
+            'salary': {
+                'total': _number(np.nansum(salary)),
+                'percentiles': _percentiles(salary),
+                'correlation_salary_performance': _correlation(salary, performance)
+            },
+            'hours': {
+                'days': days,
+                'total': _number(total_hours),
+                'billable_ratio': _number(billable_by_user.sum() / total_hours) if total_hours else None,
+                'per_person': _percentiles(hours_by_user),
+                'without_entries': int(np.sum(positions < 0)),
+                'correlation_hours_performance': _correlation(employee_hours, performance)
+            }
+        }
+    
+    def task_report(self, weeks: int = 12) -> Dict[str, Any]:
+        """Tareas: estados, vencidas, precisión de estimaciones y burn-down semanal"""
+        t = self.frame('tasks')
+        today = self._today()
+        
+        completed = t['status'] == 'completed'
+        open_tasks = ~completed
+        overdue = open_tasks & ~np.isnat(t['due_date']) & (t['due_date'] < today)
+        
+        estimated, actual = t['estimated_hours'], t['actual_hours']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            accuracy = np.where(completed & (estimated > 0), actual / estimated, np.nan)
+        
+        # Semanas hacia atrás desde hoy (0 = últimos 7 días)
+        def weekly(dates: np.ndarray) -> np.ndarray:
+            age = (today - dates[~np.isnat(dates)]).astype(np.int64) // 7
+            age = age[(age >= 0) & (age < weeks)]
+            return np.bincount(age, minlength=weeks)[::-1]
+        
+        created_weekly = weekly(t['created_date'])
+        completed_weekly = weekly(t['completed_date'][completed])
+        
+        # Abiertas al final de cada semana: creadas antes menos completadas antes
+        created_sorted = np.sort(t['created_date'][~np.isnat(t['created_date'])])
+        completed_sorted = np.sort(t['completed_date'][completed & ~np.isnat(t['completed_date'])])
+        week_ends = today - np.arange(weeks - 1, -1, -1) * np.timedelta64(7, 'D') + np.timedelta64(1, 'D')
+        remaining = (np.searchsorted(created_sorted, week_ends)
+                     - np.searchsorted(completed_sorted, week_ends))
+        
+        throughput = completed_weekly[-4:].mean() if weeks >= 4 else completed_weekly.mean()
+        backlog = int(open_tasks.sum())
+        
+        return {
+            'total': int(t['id'].size),
+            'by_status': _counts(t['status']),
+            'open': backlog,
+            'overdue': int(overdue.sum()),
+            'estimate_accuracy': _percentiles(accuracy),
+            'weekly': {
+                'week_ending': [str(end - np.timedelta64(1, 'D')) for end in week_ends],
+                'created': created_weekly.tolist(),
+                'completed': completed_weekly.tolist(),
+                'remaining': remaining.tolist()
+            },
+            'throughput_per_week': _number(throughput),
+            'weeks_to_clear_backlog': _number(backlog / throughput) if throughput else None
+        }
+    
+    def overview(self) -> Dict[str, Any]:
+        """Todos los informes sobre las mismas instantáneas"""
+        return {
+            'projects': self.project_report(),
+            'workforce': self.workforce_report(),
+            'tasks': self.task_report()
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        return {table: snapshot.stats() for table, snapshot in self.snapshots.items()}
@@ -4,32 +4,92 @@ API REST empresarial completa con autenticación JWT
 Sistema escalable para gestión empresarial moderna
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
+import csv
+import hashlib
+import io
 import os
 import json
+import math
+import time
+import atexit
 
 # Importar nuestros módulos
-from models import DatabaseManager, User, Employee, Project, CompanyMetrics
-from auth import AuthManager, PermissionManager, AuditLogger, require_auth, require_permission, require_role, validate_input, sanitize_input
+from models import DatabaseManager, NameDirectory, User, Employee, OrgChart, Project, Task, CompanyMetrics, Notification, TimeEntry, SearchIndex, DepartmentAnalytics, PoolTimeoutError, encode_cursor
+from passwords import configure_password_pool, PasswordPoolBusyError
+from cache import create_cache
+from stream import EventHub, DashboardFeed, StreamFullError
+from exports import export_stream, EXPORT_FORMATS
+from analytics import AnalyticsEngine
+from auth import AuthManager, PermissionManager, AuditLogger, RefreshTokenStore, RevokedTokenStore, TokenCache, require_auth, require_permission, require_role, validate_input, sanitize_input
 
 class EnterprisePro:
     """Aplicación principal EnterprisePro"""
     
-    def __init__(self):
+    def __init__(self, preload: bool = False):
+        """``preload=True``: el servidor multiproceso crea la app antes de fork()
+        
+        En ese caso no se arrancan hilos ni quedan conexiones abiertas; cada
+        worker llama a ``start_worker`` tras el fork.
+        """
         self.app = Flask(__name__)
+        self.worker_info = {'pid': os.getpid(), 'worker': None, 'server': 'flask',
+                            'started_at': datetime.now().isoformat()}
+        self._stopped = False
         self.setup_config()
-        self.init_components()
+        self.init_components(preload)
         self.register_routes()
         self.setup_error_handlers()
     
+    def __call__(self, environ, start_response):
+        """Aplicación WSGI (la instancia se puede servir directamente)"""
+        return self.app(environ, start_response)
+    
     def setup_config(self):
         """Configuración de la aplicación"""
+        # Valores base de config.py (raíz del proyecto); el entorno tiene prioridad
+        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.py')
+        self.app.config.from_pyfile(config_path, silent=True)
+        
         self.app.config.update(
             SECRET_KEY=os.environ.get('SECRET_KEY', 'enterprise-pro-secret-key-2024'),
             DEBUG=os.environ.get('FLASK_DEBUG', 'True').lower() == 'true',
-            JSONIFY_PRETTYPRINT_REGULAR=True
+            JSONIFY_PRETTYPRINT_REGULAR=True,
+            DB_POOL_SIZE=int(os.environ.get('DB_POOL_SIZE', self.app.config.get('DB_POOL_SIZE', 10))),
+            DB_MAX_OVERFLOW=int(os.environ.get('DB_MAX_OVERFLOW', self.app.config.get('DB_MAX_OVERFLOW', 20))),
+            DB_POOL_TIMEOUT=float(os.environ.get('DB_POOL_TIMEOUT', self.app.config.get('DB_POOL_TIMEOUT', 30))),
+            DB_PRAGMA_PROFILE=os.environ.get('DB_PRAGMA_PROFILE', self.app.config.get('DB_PRAGMA_PROFILE', 'production')),
+            DB_MAINTENANCE_INTERVAL=float(os.environ.get('DB_MAINTENANCE_INTERVAL', self.app.config.get('DB_MAINTENANCE_INTERVAL', 300))),
+            AUDIT_MODE=os.environ.get('AUDIT_MODE', self.app.config.get('AUDIT_MODE', 'async')),
+            AUDIT_QUEUE_SIZE=int(os.environ.get('AUDIT_QUEUE_SIZE', self.app.config.get('AUDIT_QUEUE_SIZE', 10000))),
+            AUDIT_BATCH_SIZE=int(os.environ.get('AUDIT_BATCH_SIZE', self.app.config.get('AUDIT_BATCH_SIZE', 200))),
+            AUDIT_FLUSH_INTERVAL=float(os.environ.get('AUDIT_FLUSH_INTERVAL', self.app.config.get('AUDIT_FLUSH_INTERVAL', 1.0))),
+            TOKEN_CACHE_SIZE=int(os.environ.get('TOKEN_CACHE_SIZE', self.app.config.get('TOKEN_CACHE_SIZE', 10000))),
+            TOKEN_CACHE_TTL=float(os.environ.get('TOKEN_CACHE_TTL', self.app.config.get('TOKEN_CACHE_TTL', 300))),
+            IDENTITY_CACHE_TTL=float(os.environ.get('IDENTITY_CACHE_TTL', self.app.config.get('IDENTITY_CACHE_TTL', 300))),
+            PASSWORD_HASH_ITERATIONS=int(os.environ.get('PASSWORD_HASH_ITERATIONS', self.app.config.get('PASSWORD_HASH_ITERATIONS', 100000))),
+            PASSWORD_WORKERS=int(os.environ.get('PASSWORD_WORKERS', self.app.config.get('PASSWORD_WORKERS', 2))),
+            PASSWORD_MAX_CONCURRENCY=int(os.environ.get('PASSWORD_MAX_CONCURRENCY', self.app.config.get('PASSWORD_MAX_CONCURRENCY', 8))),
+            PASSWORD_QUEUE_TIMEOUT=float(os.environ.get('PASSWORD_QUEUE_TIMEOUT', self.app.config.get('PASSWORD_QUEUE_TIMEOUT', 2.0))),
+            CACHE_TYPE=os.environ.get('CACHE_TYPE', self.app.config.get('CACHE_TYPE', 'simple')),
+            CACHE_DEFAULT_TIMEOUT=float(os.environ.get('CACHE_DEFAULT_TIMEOUT', self.app.config.get('CACHE_DEFAULT_TIMEOUT', 300))),
+            CACHE_MAX_ENTRIES=int(os.environ.get('CACHE_MAX_ENTRIES', self.app.config.get('CACHE_MAX_ENTRIES', 1000))),
+            STREAM_MAX_SUBSCRIBERS=int(os.environ.get('STREAM_MAX_SUBSCRIBERS', self.app.config.get('STREAM_MAX_SUBSCRIBERS', 100))),
+            STREAM_KEEPALIVE=float(os.environ.get('STREAM_KEEPALIVE', self.app.config.get('STREAM_KEEPALIVE', 15))),
+            STREAM_POLL_INTERVAL=float(os.environ.get('STREAM_POLL_INTERVAL', self.app.config.get('STREAM_POLL_INTERVAL', 5))),
+            EXPORT_BATCH_SIZE=int(os.environ.get('EXPORT_BATCH_SIZE', self.app.config.get('EXPORT_BATCH_SIZE', 500))),
+            IMPORT_CHUNK_SIZE=int(os.environ.get('IMPORT_CHUNK_SIZE', self.app.config.get('IMPORT_CHUNK_SIZE', 500))),
+            IMPORT_MAX_ROWS=int(os.environ.get('IMPORT_MAX_ROWS', self.app.config.get('IMPORT_MAX_ROWS', 10000))),
+            TIMESHEET_MAX_ENTRIES=int(os.environ.get('TIMESHEET_MAX_ENTRIES', self.app.config.get('TIMESHEET_MAX_ENTRIES', 200))),
+            METRICS_INGEST_MAX_POINTS=int(os.environ.get('METRICS_INGEST_MAX_POINTS', self.app.config.get('METRICS_INGEST_MAX_POINTS', 10000))),
+            METRICS_RAW_RETENTION_DAYS=int(os.environ.get('METRICS_RAW_RETENTION_DAYS', self.app.config.get('METRICS_RAW_RETENTION_DAYS', 180))),
+            METRICS_DAILY_RETENTION_DAYS=int(os.environ.get('METRICS_DAILY_RETENTION_DAYS', self.app.config.get('METRICS_DAILY_RETENTION_DAYS', 730))),
+            ANALYTICS_RETENTION_DAYS=int(os.environ.get('ANALYTICS_RETENTION_DAYS', self.app.config.get('ANALYTICS_RETENTION_DAYS', 730))),
+            ANALYTICS_SNAPSHOT_MAX_AGE=float(os.environ.get('ANALYTICS_SNAPSHOT_MAX_AGE', self.app.config.get('ANALYTICS_SNAPSHOT_MAX_AGE', 300))),
+            ASGI_EXECUTOR_THREADS=int(os.environ.get('ASGI_EXECUTOR_THREADS', self.app.config.get('ASGI_EXECUTOR_THREADS', 0))),
+            CACHE_DIR=os.environ.get('CACHE_DIR', self.app.config.get('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')))
         )
         
         # Configurar CORS
@@ -37,28 +97,373 @@ class EnterprisePro:
             r"/api/*": {
                 "origins": ["http://localhost:3000", "http://127.0.0.1:5000"],
                 "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-                "allow_headers": ["Content-Type", "Authorization"]
+                "allow_headers": ["Content-Type", "Authorization", "If-None-Match", "If-Modified-Since"],
+                "expose_headers": ["ETag", "Last-Modified", "X-Cache"]
             }
         })
     
-    def init_components(self):
+    def init_components(self, preload: bool = False):
         """Inicializar componentes del sistema"""
-        self.db_manager = DatabaseManager()
-        self.auth_manager = AuthManager(secret_key=self.app.config['SECRET_KEY'])
-        self.audit_logger = AuditLogger(self.db_manager)
+        self.db_manager = DatabaseManager(
+            pool_size=self.app.config['DB_POOL_SIZE'],
+            max_overflow=self.app.config['DB_MAX_OVERFLOW'],
+            pool_timeout=self.app.config['DB_POOL_TIMEOUT'],
+            pragma_profile=self.app.config['DB_PRAGMA_PROFILE'],
+            pragmas=self.app.config.get('DB_PRAGMAS')
+        )
+        self.report_database_settings()
+        self.password_pool = configure_password_pool(
+            workers=self.app.config['PASSWORD_WORKERS'],
+            max_concurrency=self.app.config['PASSWORD_MAX_CONCURRENCY'],
+            queue_timeout=self.app.config['PASSWORD_QUEUE_TIMEOUT'],
+            iterations=self.app.config['PASSWORD_HASH_ITERATIONS']
+        )
+        self.audit_logger = AuditLogger(
+            self.db_manager,
+            mode=self.app.config['AUDIT_MODE'],
+            queue_size=self.app.config['AUDIT_QUEUE_SIZE'],
+            batch_size=self.app.config['AUDIT_BATCH_SIZE'],
+            flush_interval=self.app.config['AUDIT_FLUSH_INTERVAL'],
+            start=False
+        )
         
-        # Modelos
-        self.user_model = User(self.db_manager)
+        # Caché de respuestas: los modelos invalidan por tabla al escribir
+        self.response_cache = create_cache(
+            self.app.config['CACHE_TYPE'],
+            default_timeout=self.app.config['CACHE_DEFAULT_TIMEOUT'],
+            # Se lee en cada llamada: share_table_versions() sustituye los contadores
+            versions=lambda tags: self.db_manager.table_versions.snapshot(tags)[0],
+            max_entries=self.app.config['CACHE_MAX_ENTRIES'],
+            cache_dir=self.app.config['CACHE_DIR']
+        )
+        self.db_manager.add_write_listener(self.response_cache.invalidate)
+        
+        # Modelos; los listados completan nombres desde un directorio compartido
+        self.directory = NameDirectory(self.db_manager)
+        self.db_manager.add_write_listener(self.directory.on_write)
+        self.user_model = User(self.db_manager, identity_ttl=self.app.config['IDENTITY_CACHE_TTL'],
+                               directory=self.directory)
+        self.db_manager.add_write_listener(self.user_model.identity_cache.on_write)
         self.employee_model = Employee(self.db_manager)
-        self.project_model = Project(self.db_manager)
-        self.metrics_model = CompanyMetrics(self.db_manager)
+        self.org_chart = OrgChart(self.db_manager, directory=self.directory)
+        PermissionManager.configure_hierarchy(self.org_chart.is_in_reporting_line)
+        self.project_model = Project(self.db_manager, directory=self.directory)
+        self.task_model = Task(self.db_manager, self.project_model)
+        self.metrics_model = CompanyMetrics(
+            self.db_manager,
+            raw_retention_days=self.app.config['METRICS_RAW_RETENTION_DAYS'],
+            daily_retention_days=self.app.config['METRICS_DAILY_RETENTION_DAYS']
+        )
+        self.db_manager.add_maintenance_task('metric_retention', self.metrics_model.apply_retention)
+        self.notification_model = Notification(self.db_manager)
+        self.time_entry_model = TimeEntry(self.db_manager)
+        self.search_index = SearchIndex(self.db_manager)
+        
+        # Instantáneas por departamento: refresco incremental en cada ciclo de mantenimiento
+        self.department_analytics = DepartmentAnalytics(self.db_manager, directory=self.directory)
+        self.db_manager.add_maintenance_task('department_snapshots', self.refresh_department_snapshots)
+        self.department_analytics.refresh()
+        
+        # Informes vectorizados sobre instantáneas columnares en memoria
+        self.analytics = AnalyticsEngine(self.db_manager, max_age=self.app.config['ANALYTICS_SNAPSHOT_MAX_AGE'])
+        
+        # Canal SSE: un cálculo por lote de escrituras, compartido por todos los suscriptores
+        self.event_hub = EventHub(max_subscribers=self.app.config['STREAM_MAX_SUBSCRIBERS'])
+        self.dashboard_feed = DashboardFeed(
+            self.event_hub,
+            self.metrics_model.get_dashboard_metrics,
+            self.notification_model,
+            poll_interval=self.app.config['STREAM_POLL_INTERVAL'],
+            sync=self.db_manager.sync_writes
+        )
+        self.db_manager.add_write_listener(self.dashboard_feed.on_write)
+        self.project_model.add_progress_listener(self.dashboard_feed.on_progress)
+        
+        # Autenticación: identidades desde la caché del modelo, refresh tokens y revocaciones en SQLite
+        self.refresh_store = RefreshTokenStore(self.db_manager)
+        self.db_manager.add_maintenance_task('refresh_tokens_purged', self.refresh_store.purge_expired)
+        self.revoked_store = RevokedTokenStore(self.db_manager)
+        self.db_manager.add_maintenance_task('revoked_tokens_purged', self.revoked_store.purge_expired)
+        self.auth_manager = AuthManager(
+            secret_key=self.app.config['SECRET_KEY'],
+            token_cache_size=self.app.config['TOKEN_CACHE_SIZE'],
+            token_cache_ttl=self.app.config['TOKEN_CACHE_TTL'],
+            user_loader=self.user_model.get_identity,
+            refresh_store=self.refresh_store,
+            revoked_store=self.revoked_store
+        )
+        self.db_manager.add_write_listener(self.auth_manager.on_write)
+        self.db_manager.add_write_listener(self.close_revoked_streams)
         
         # Hacer disponible el auth_manager en la app
         self.app.auth_manager = self.auth_manager
+        
+        if preload:
+            # Versiones por tabla compartidas por los workers; ninguna conexión cruza el fork
+            self.db_manager.share_table_versions()
+            self.db_manager.pool.dispose()
+        else:
+            self.start_background()
+            atexit.register(self.shutdown)
+    
+    def start_background(self):
+        """Hilos de fondo: mantenimiento, escritor de auditoría y canal SSE"""
+        self.db_manager.start_maintenance(self.app.config['DB_MAINTENANCE_INTERVAL'])
+        self.audit_logger.start()
+        self.dashboard_feed.start()
+    
+    def start_worker(self, worker_id=None, server: str = 'gunicorn'):
+        """Arranque dentro de un worker tras el fork del servidor con preload"""
+        self.worker_info = {'pid': os.getpid(), 'worker': worker_id, 'server': server,
+                            'started_at': datetime.now().isoformat()}
+        self.start_background()
+    
+    def shutdown(self):
+        """Vacía la auditoría pendiente y cierra la base de datos"""
+        if self._stopped:
+            return
+        self._stopped = True
+        self.dashboard_feed.stop()
+        self.event_hub.close()
+        self.audit_logger.close()
+        self.password_pool.shutdown()
+        self.db_manager.close()
+    
+    def report_database_settings(self):
+        """Muestra al arrancar la configuración efectiva de SQLite"""
+        pragmas = self.db_manager.effective_pragmas()
+        pool = self.db_manager.pool_status()
+        print(f"💾 SQLite ({self.app.config['DB_PRAGMA_PROFILE']}): "
+              + ", ".join(f"{name}={value}" for name, value in pragmas.items()))
+        print(f"🔌 Pool de conexiones: size={pool['pool_size']}, "
+              f"overflow={pool['max_overflow']}, timeout={self.db_manager.pool.timeout}s")
+    
+    def cache_key(self) -> str:
+        """Clave de la petición actual: ruta, rol del usuario y parámetros de la query"""
+        return self.response_cache.make_key(
+            request.path,
+            request.current_user['role'],
+            request.args.items(multi=True)
+        )
+    
+    def cached(self, tags: tuple, loader) -> tuple:
+        """(payload, hit) desde la caché de respuestas
+        
+        ``tags`` son las tablas cuyas escrituras invalidan la entrada.
+        """
+        return self.response_cache.get_or_set(self.cache_key(), loader, tags)
+    
+    def validators(self, tags: tuple) -> tuple:
+        """(ETag, Last-Modified) de la petición actual según las versiones de ``tags``
+        
+        Se toman antes de leer los datos: si una escritura llega entretanto,
+        el ETag enviado ya no coincidirá en la siguiente petición.
+        """
+        versions = self.db_manager.table_versions
+        numbers, modified = versions.snapshot(tags)
+        etag = hashlib.sha256(
+            f"{self.cache_key()}|{versions.epoch}|{numbers}".encode('utf-8')
+        ).hexdigest()[:32]
+        return etag, datetime.fromtimestamp(modified, timezone.utc)
+    
+    @staticmethod
+    def set_validators(response, etag: str, last_modified: datetime, weak: bool = False):
+        """ETag + Last-Modified; el cliente debe revalidar siempre (no-cache)"""
+        response.set_etag(etag, weak=weak)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    def not_modified(self, etag: str, last_modified: datetime, weak: bool = False):
+        """Respuesta 304 si los validadores del cliente siguen vigentes, si no None
+        
+        If-None-Match tiene prioridad; If-Modified-Since sólo se usa sin él y
+        nunca para un Last-Modified del segundo en curso, en el que aún puede
+        llegar otra escritura con la misma fecha.
+        """
+        if request.if_none_match:
+            fresh = request.if_none_match.contains_weak(etag)
+        elif request.if_modified_since:
+            fresh = (request.if_modified_since >= last_modified
+                     and last_modified.timestamp() < int(time.time()))
+        else:
+            fresh = False
+        
+        if not fresh:
+            return None
+        return self.set_validators(Response(status=304), etag, last_modified, weak)
+    
+    def cached_response(self, tags: tuple, loader, not_found: str = None):
+        """Respuesta JSON cacheada con validadores y cabecera X-Cache
+        
+        Devuelve 304 sin tocar SQLite si el cliente ya tiene la versión actual
+        y 404 con ``not_found`` si el payload es None.
+        """
+        etag, last_modified = self.validators(tags)
+        response = self.not_modified(etag, last_modified)
+        if response is not None:
+            return response
+        
+        payload, hit = self.cached(tags, loader)
+        if payload is None and not_found:
+            return jsonify({'error': not_found}), 404
+        
+        response = self.set_validators(jsonify(payload), etag, last_modified)
+        response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response, 200
+    
+    def refresh_department_snapshots(self) -> dict:
+        """Tarea de mantenimiento: instantánea del día y purga por retención"""
+        result = self.department_analytics.refresh()
+        result['purged'] = self.department_analytics.purge(self.app.config['ANALYTICS_RETENTION_DAYS'])
+        return result
+    
+    @staticmethod
+    def stream_session(token: str, payload: dict) -> dict:
+        """Datos de sesión de un suscriptor SSE: rol, ``exp`` y digest del token"""
+        return {'role': payload['role'], 'expires_at': payload['exp'],
+                'token_digest': TokenCache.digest(token)}
+    
+    def close_revoked_streams(self, tables):
+        """Listener de escrituras: cierra los canales SSE cuya sesión ya no es válida
+        
+        Logout (``revoked_tokens``) en cualquier worker, o usuario desactivado
+        o con otro rol (``users``); el cliente reconecta y se autentica de nuevo.
+        """
+        if 'revoked_tokens' not in tables and 'users' not in tables:
+            return
+        subscribers = self.event_hub.subscribers()
+        if not subscribers:
+            return
+        if 'revoked_tokens' in tables:
+            revoked = self.revoked_store.revoked({s.token_digest for s in subscribers if s.token_digest})
+            if revoked:
+                self.event_hub.disconnect(lambda subscriber: subscriber.token_digest in revoked)
+        if 'users' in tables:
+            roles = self.user_model.active_roles({s.user_id for s in subscribers})
+            self.event_hub.disconnect(lambda subscriber: roles.get(subscriber.user_id) != subscriber.role)
+    
+    @staticmethod
+    def date_arg(name: str) -> date:
+        """Parámetro de query YYYY-MM-DD (ValueError si el formato no es válido)"""
+        value = request.args.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError(f'Formato de fecha inválido para {name}. Use YYYY-MM-DD')
+    
+    def import_rows(self):
+        """Filas de una importación: (rows, None) o (None, mensaje de error)"""
+        upload = request.files.get('file')
+        if upload is not None or request.mimetype == 'text/csv':
+            raw = upload.read() if upload is not None else request.get_data()
+            try:
+                text = raw.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                return None, 'El CSV debe estar en UTF-8'
+            reader = csv.DictReader(io.StringIO(text))
+            if not reader.fieldnames or 'email' not in reader.fieldnames:
+                return None, 'El CSV necesita cabecera con al menos email, password, first_name y last_name'
+            return list(reader), None
+        
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('users')
+        if not isinstance(data, list):
+            return None, 'Se esperaba un array JSON de usuarios o un CSV'
+        return data, None
+    
+    def export_batches(self, resource: str, batch_size: int):
+        """Lotes de filas del recurso con los mismos filtros y permisos que su listado
+        
+        Devuelve (batches, None) o (None, (mensaje, status)) si no está permitido.
+        """
+        user = request.current_user
+        can = lambda permission: PermissionManager.has_permission(user['role'], permission)
+        args = request.args
+        
+        if resource == 'projects':
+            if not can('project.read'):
+                return None, ('Permisos insuficientes', 403)
+            return self.project_model.iter_projects(
+                status=args.get('status'),
+                department_id=args.get('department_id', type=int),
+                batch_size=batch_size
+            ), None
+        
+        if resource == 'employees':
+            if not can('employee.read'):
+                return None, ('Permisos insuficientes', 403)
+            # Como can_access_user_data: los managers sólo exportan su línea de reporte
+            return self.employee_model.iter_employees(
+                department_id=args.get('department_id', type=int),
+                status=args.get('status'),
+                batch_size=batch_size,
+                manager_user_id=None if user['role'] == 'admin' else user['id'],
+                include_compensation=can('reports.read')
+            ), None
+        
+        if resource == 'time_entries':
+            # Sin reports.read cada empleado sólo exporta sus propias horas
+            if can('reports.read'):
+                user_id = args.get('user_id', type=int)
+            elif can('timesheet.read_own'):
+                user_id = user['id']
+            else:
+                return None, ('Permisos insuficientes', 403)
+            return self.time_entry_model.iter_entries(
+                user_id=user_id,
+                project_id=args.get('project_id', type=int),
+                date_from=self.date_arg('date_from'),
+                date_to=self.date_arg('date_to'),
+                batch_size=batch_size
+            ), None
+        
+        if resource == 'audit_logs':
+            if not can('audit.read'):
+                return None, ('Permisos insuficientes', 403)
+            self.audit_logger.flush()
+            return self.audit_logger.iter_logs(
+                user_id=args.get('user_id', type=int),
+                action=args.get('action'),
+                table_name=args.get('table_name'),
+                date_from=self.date_arg('date_from'),
+                date_to=self.date_arg('date_to'),
+                batch_size=batch_size
+            ), None
+        
+        return None, ('Recurso de exportación no encontrado', 404)
+    
+    @staticmethod
+    def paginate(rows: list, per_page: int, page: int, cursor: str = None) -> tuple:
+        """Recorta la fila extra (per_page + 1) y construye el bloque de paginación
+        
+        ``next_cursor`` se devuelve siempre; ``page`` sólo en modo offset
+        (cuando no se envió ``cursor``).
+        """
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        
+        pagination = {
+            'per_page': per_page,
+            'has_more': has_more,
+            'next_cursor': encode_cursor(rows[-1]) if has_more and rows else None
+        }
+        if cursor is None:
+            pagination['page'] = page
+        
+        return rows, pagination
     
     def register_routes(self):
         """Registrar todas las rutas de la API"""
         
+        @self.app.before_request
+        def sync_remote_writes():
+            """Con varios workers: invalida lo que otros procesos hayan escrito"""
+            self.db_manager.sync_writes()
+        
         # ============================================
         # 🔐 AUTENTICACIÓN
         # ============================================
@@ -120,7 +525,7 @@ class EnterprisePro:
         @self.app.route('/api/auth/refresh', methods=['POST'])
         def refresh_token():
             """Renovar token de acceso"""
-            data = request.get_json()
+            data = request.get_json(silent=True) or {}
             refresh_token = data.get('refresh_token')
             
             if not refresh_token:
@@ -132,6 +537,26 @@ class EnterprisePro:
             
             return jsonify(new_tokens), 200
         
+        @self.app.route('/api/auth/logout', methods=['POST'])
+        @require_auth
+        def logout():
+            """Cerrar sesión invalidando el token de acceso"""
+            token = request.headers.get('Authorization').split(' ')[1]
+            self.auth_manager.revoke_token(token)
+            
+            # Revocar también la familia del refresh token, si se envía
+            data = request.get_json(silent=True) or {}
+            if data.get('refresh_token'):
+                self.auth_manager.revoke_refresh_token(data['refresh_token'])
+            
+            self.audit_logger.log_action(
+                request.current_user['id'], 'logout',
+                ip_address=request.remote_addr,
+                user_agent=request.headers.get('User-Agent')
+            )
+            
+            return jsonify({'message': 'Sesión cerrada exitosamente'}), 200
+        
         @self.app.route('/api/auth/profile', methods=['GET'])
         @require_auth
         def get_profile():
@@ -164,23 +589,24 @@ class EnterprisePro:
             page = request.args.get('page', 1, type=int)
             per_page = min(request.args.get('per_page', 20, type=int), 100)
             role = request.args.get('role')
+            cursor = request.args.get('cursor')
             
             offset = (page - 1) * per_page
             
-            users = self.user_model.get_all_users(
-                limit=per_page,
-                offset=offset,
-                role=role
-            )
+            def load():
+                users = self.user_model.get_all_users(
+                    limit=per_page + 1,
+                    offset=offset,
+                    role=role,
+                    cursor=cursor or None
+                )
+                users, pagination = self.paginate(users, per_page, page, cursor)
+                return {'users': users, 'pagination': pagination}
             
-            return jsonify({
-                'users': users,
-                'pagination': {
-                    'page': page,
-                    'per_page': per_page,
-                    'has_more': len(users) == per_page
-                }
-            }), 200
+            try:
+                return self.cached_response(('users', 'employees', 'departments'), load)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
         @self.app.route('/api/users', methods=['POST'])
         @require_auth
@@ -228,6 +654,94 @@ class EnterprisePro:
                 'user_id': user_id
             }), 201
         
+        @self.app.route('/api/users/import', methods=['POST'])
+        @require_auth
+        @require_permission('user.create')
+        def import_users():
+            """Alta masiva desde un array JSON o un CSV (campo ``file`` o cuerpo text/csv)
+            
+            Cada bloque de ``IMPORT_CHUNK_SIZE`` filas se inserta en una transacción
+            y deja un único registro de auditoría; las filas inválidas se informan
+            con su número sin detener la importación.
+            """
+            rows, error = self.import_rows()
+            if error:
+                return jsonify({'error': error}), 400
+            
+            max_rows = self.app.config['IMPORT_MAX_ROWS']
+            if len(rows) > max_rows:
+                return jsonify({'error': f'Máximo {max_rows} filas por importación'}), 400
+            
+            required_fields = ['email', 'password', 'first_name', 'last_name']
+            valid_rows, errors = [], []
+            for number, data in enumerate(rows, start=1):
+                if not isinstance(data, dict):
+                    errors.append({'row': number, 'error': 'Fila con formato inválido'})
+                    continue
+                valid, error = validate_input(data, required_fields)
+                role = data.get('role') or 'employee'
+                if valid and '@' not in str(data['email']):
+                    valid, error = False, 'Email inválido'
+                if valid and role not in PermissionManager.ROLE_PERMISSIONS:
+                    valid, error = False, f'Rol desconocido: {role}'
+                if not valid:
+                    errors.append({'row': number, 'email': data.get('email'), 'error': error})
+                    continue
+                
+                valid_rows.append((number, {
+                    'email': sanitize_input(str(data['email']).strip()),
+                    'password': str(data['password']),
+                    'first_name': sanitize_input(str(data['first_name'])),
+                    'last_name': sanitize_input(str(data['last_name'])),
+                    'role': role,
+                    'phone': sanitize_input(str(data.get('phone') or '')),
+                    'address': sanitize_input(str(data.get('address') or ''))
+                }))
+            
+            chunk_size = max(1, self.app.config['IMPORT_CHUNK_SIZE'])
+            created = []
+            for start in range(0, len(valid_rows), chunk_size):
+                chunk = valid_rows[start:start + chunk_size]
+                try:
+                    result = self.user_model.create_users([user for _, user in chunk])
+                except PasswordPoolBusyError:
+                    # Lo ya confirmado se queda; el resto se puede reenviar
+                    errors.extend({'row': number, 'email': user['email'],
+                                   'error': 'No procesada: servicio de hash ocupado, reintentar'}
+                                  for number, user in valid_rows[start:])
+                    break
+                
+                chunk_created = [{'row': chunk[item['index']][0], 'id': item['id'],
+                                  'email': item['email']} for item in result['created']]
+                chunk_errors = [{'row': chunk[item['index']][0], 'email': item['email'],
+                                 'error': item['error']} for item in result['errors']]
+                created.extend(chunk_created)
+                errors.extend(chunk_errors)
+                
+                self.audit_logger.log_action(
+                    request.current_user['id'],
+                    'users_imported',
+                    'users',
+                    None,
+                    new_values={
+                        'rows': [chunk[0][0], chunk[-1][0]],
+                        'created': len(chunk_created),
+                        'failed': len(chunk_errors),
+                        'user_ids': [user['id'] for user in chunk_created]
+                    },
+                    ip_address=request.remote_addr
+                )
+            
+            errors.sort(key=lambda item: item['row'])
+            return jsonify({
+                'message': f'{len(created)} usuarios importados, {len(errors)} con errores',
+                'total': len(rows),
+                'created': len(created),
+                'failed': len(errors),
+                'users': created,
+                'errors': errors
+            }), 201 if created else 400
+        
         @self.app.route('/api/users/<int:user_id>', methods=['PUT'])
         @require_auth
         @require_permission('user.update')
@@ -271,6 +785,96 @@ class EnterprisePro:
             
             return jsonify({'message': 'Usuario actualizado exitosamente'}), 200
         
+        # ============================================
+        # 🌳 ORGANIZACIÓN
+        # ============================================
+        
+        def can_view_org(user_id: int) -> bool:
+            user = request.current_user
+            return PermissionManager.can_access_user_data(user['role'], user_id, user['id'])
+        
+        @self.app.route('/api/org/<int:user_id>/team', methods=['GET'])
+        @require_auth
+        @require_permission('employee.read')
+        def get_org_team(user_id):
+            """Subárbol de reporte: ?depth=1 sólo subordinados directos"""
+            if not can_view_org(user_id):
+                return jsonify({'error': 'No tienes permisos para ver este equipo'}), 403
+            depth = request.args.get('depth', type=int)
+            
+            def load():
+                team = self.org_chart.get_team(user_id, max_depth=depth)
+                return None if team is None else {'user_id': user_id, 'team': team, 'headcount': len(team)}
+            
+            return self.cached_response(('employees', 'users', 'departments'), load,
+                                        not_found='Empleado no encontrado')
+        
+        @self.app.route('/api/org/<int:user_id>/chain', methods=['GET'])
+        @require_auth
+        @require_permission('employee.read')
+        def get_org_chain(user_id):
+            """Cadena de mando, del superior directo hacia arriba"""
+            if not can_view_org(user_id):
+                return jsonify({'error': 'No tienes permisos para ver este empleado'}), 403
+            
+            def load():
+                chain = self.org_chart.get_chain(user_id)
+                return None if chain is None else {'user_id': user_id, 'chain': chain}
+            
+            return self.cached_response(('employees', 'users', 'departments'), load,
+                                        not_found='Empleado no encontrado')
+        
+        @self.app.route('/api/org/<int:user_id>/rollup', methods=['GET'])
+        @require_auth
+        @require_permission('reports.read')
+        def get_org_rollup(user_id):
+            """Plantilla y masa salarial del subárbol, total y por rama"""
+            if not can_view_org(user_id):
+                return jsonify({'error': 'No tienes permisos para ver este equipo'}), 403
+            
+            return self.cached_response(('employees', 'users', 'departments'),
+                                        lambda: self.org_chart.get_rollup(user_id),
+                                        not_found='Empleado no encontrado')
+        
+        @self.app.route('/api/org/<int:user_id>/manager', methods=['PUT'])
+        @require_auth
+        @require_permission('employee.update')
+        def set_org_manager(user_id):
+            """Cambiar superior: {"manager_user_id": 4} o null; mueve todo el subárbol"""
+            data = request.get_json() or {}
+            if 'manager_user_id' not in data:
+                return jsonify({'error': 'manager_user_id requerido'}), 400
+            manager_user_id = data['manager_user_id']
+            current_user = request.current_user
+            
+            # Dejar a alguien sin superior o cambiar el propio saca a un subárbol
+            # de la línea de reporte de quien lo hace: sólo administradores
+            if current_user['role'] != 'admin' and (manager_user_id is None or user_id == current_user['id']):
+                return jsonify({'error': 'Sólo un administrador puede quitar o cambiar este superior'}), 403
+            
+            # Un manager sólo reorganiza dentro de su propio subárbol
+            if not can_view_org(user_id) or (manager_user_id is not None and not can_view_org(manager_user_id)):
+                return jsonify({'error': 'No tienes permisos para reorganizar este equipo'}), 403
+            
+            try:
+                updated = self.org_chart.set_manager(user_id, manager_user_id)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 409
+            
+            if not updated:
+                return jsonify({'error': 'Empleado no encontrado'}), 404
+            
+            self.audit_logger.log_action(
+                request.current_user['id'],
+                'employee_manager_changed',
+                'employees',
+                user_id,
+                new_values={'manager_user_id': manager_user_id},
+                ip_address=request.remote_addr
+            )
+            
+            return jsonify({'message': 'Superior actualizado exitosamente'}), 200
+        
         # ============================================
         # 📋 GESTIÓN DE PROYECTOS
         # ============================================
@@ -284,24 +888,25 @@ class EnterprisePro:
             per_page = min(request.args.get('per_page', 20, type=int), 100)
             status = request.args.get('status')
             department_id = request.args.get('department_id', type=int)
+            cursor = request.args.get('cursor')
             
             offset = (page - 1) * per_page
             
-            projects = self.project_model.get_projects(
-                status=status,
-                department_id=department_id,
-                limit=per_page,
-                offset=offset
-            )
+            def load():
+                projects = self.project_model.get_projects(
+                    status=status,
+                    department_id=department_id,
+                    limit=per_page + 1,
+                    offset=offset,
+                    cursor=cursor or None
+                )
+                projects, pagination = self.paginate(projects, per_page, page, cursor)
+                return {'projects': projects, 'pagination': pagination}
             
-            return jsonify({
-                'projects': projects,
-                'pagination': {
-                    'page': page,
-                    'per_page': per_page,
-                    'has_more': len(projects) == per_page
-                }
-            }), 200
+            try:
+                return self.cached_response(('projects', 'users', 'departments'), load)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
         @self.app.route('/api/projects', methods=['POST'])
         @require_auth
@@ -323,7 +928,8 @@ class EnterprisePro:
                 'budget': data.get('budget', 0),
                 'department_id': data.get('department_id'),
                 'assigned_to': data.get('assigned_to'),
-                'client_name': sanitize_input(data.get('client_name', ''))
+                'client_name': sanitize_input(data.get('client_name', '')),
+                'auto_progress': bool(data.get('auto_progress', False))
             }
             
             # Parsear fechas si existen
@@ -363,19 +969,37 @@ class EnterprisePro:
         @require_permission('project.read')
         def get_project(project_id):
             """Obtener detalles de proyecto"""
-            project = self.project_model.get_project_by_id(project_id)
-            
-            if not project:
-                return jsonify({'error': 'Proyecto no encontrado'}), 404
-            
-            return jsonify(project), 200
+            return self.cached_response(
+                ('projects', 'users', 'departments', 'tasks'),
+                lambda: self.project_model.get_project_by_id(project_id),
+                not_found='Proyecto no encontrado'
+            )
         
         @self.app.route('/api/projects/<int:project_id>/progress', methods=['PUT'])
         @require_auth
         @require_permission('project.update')
         def update_project_progress(project_id):
-            """Actualizar progreso del proyecto"""
+            """Actualizar progreso del proyecto
+            
+            ``{"progress": 40}`` fija el valor a mano; ``{"auto_progress": true}``
+            lo deriva de las tareas completadas a partir de ese momento.
+            """
             data = request.get_json()
+            
+            if data.get('auto_progress'):
+                progress = self.project_model.enable_auto_progress(project_id)
+                if progress is None:
+                    return jsonify({'error': 'Proyecto no encontrado'}), 404
+                self.audit_logger.log_action(
+                    request.current_user['id'],
+                    'project_progress_updated',
+                    'projects',
+                    project_id,
+                    new_values={'auto_progress': True, 'progress': progress},
+                    ip_address=request.remote_addr
+                )
+                return jsonify({'message': 'Progreso automático activado', 'progress': progress}), 200
+            
             progress = data.get('progress')
             
             if progress is None or not (0 <= progress <= 100):
@@ -398,6 +1022,615 @@ class EnterprisePro:
             
             return jsonify({'message': 'Progreso actualizado exitosamente'}), 200
         
+        # ============================================
+        # ✅ GESTIÓN DE TAREAS
+        # ============================================
+        
+        def task_fields(data: dict) -> tuple:
+            """Campos de tarea saneados y validados: (campos, error)"""
+            fields = {}
+            for field in ('title', 'description'):
+                if field in data:
+                    fields[field] = sanitize_input(str(data[field] or ''))
+            
+            if 'priority' in data:
+                if data['priority'] not in Task.PRIORITIES:
+                    return None, f"Prioridad inválida. Usa {', '.join(Task.PRIORITIES)}"
+                fields['priority'] = data['priority']
+            
+            for field in ('estimated_hours', 'actual_hours'):
+                if data.get(field) is not None:
+                    try:
+                        fields[field] = float(data[field])
+                    except (TypeError, ValueError):
+                        return None, f'{field} debe ser numérico'
+            
+            for field in ('start_date', 'due_date'):
+                if field in data:
+                    if not data[field]:
+                        fields[field] = None
+                        continue
+                    try:
+                        fields[field] = datetime.strptime(data[field], '%Y-%m-%d').date()
+                    except (TypeError, ValueError):
+                        return None, f'Formato de fecha inválido para {field}. Use YYYY-MM-DD'
+            return fields, None
+        
+        def active_user_exists(user_id: int) -> bool:
+            return self.user_model.get_identity(user_id) is not None
+        
+        @self.app.route('/api/projects/<int:project_id>/tasks', methods=['GET'])
+        @require_auth
+        @require_permission('task.read')
+        def get_project_tasks(project_id):
+            """Tareas del proyecto: ?status=&assigned_to="""
+            status = request.args.get('status')
+            if status and status not in Task.STATUSES:
+                return jsonify({'error': f"Estado inválido. Usa {', '.join(Task.STATUSES)}"}), 400
+            
+            return self.cached_response(('tasks', 'users'), lambda: {
+                'project_id': project_id,
+                'tasks': self.task_model.get_tasks(
+                    project_id,
+                    status=status,
+                    assigned_to=request.args.get('assigned_to', type=int)
+                )
+            })
+        
+        @self.app.route('/api/projects/<int:project_id>/tasks', methods=['POST'])
+        @require_auth
+        @require_permission('task.create')
+        def create_task(project_id):
+            """Crear tarea en un proyecto"""
+            data = request.get_json()
+            
+            valid, error = validate_input(data, ['title'])
+            if not valid:
+                return jsonify({'error': error}), 400
+            
+            task_data, error = task_fields(data)
+            if error:
+                return jsonify({'error': error}), 400
+            
+            status = data.get('status', 'pending')
+            if status not in Task.STATUSES:
+                return jsonify({'error': f"Estado inválido. Usa {', '.join(Task.STATUSES)}"}), 400
+            task_data['status'] = status
+            
+            if data.get('assigned_to'):
+                if not active_user_exists(data['assigned_to']):
+                    return jsonify({'error': 'Usuario asignado no encontrado'}), 400
+                task_data['assigned_to'] = data['assigned_to']
+            
+            task_id = self.task_model.create_task(
+                project_id,
+                created_by=request.current_user['id'],
+                **task_data
+            )
+            
+            if not task_id:
+                return jsonify({'error': 'Proyecto no encontrado'}), 404
+            
+            self.audit_logger.log_action(
+                request.current_user['id'],
+                'task_created',
+                'tasks',
+                task_id,
+                new_values={**task_data, 'project_id': project_id},
+                ip_address=request.remote_addr
+            )
+            
+            return jsonify({
+                'message': 'Tarea creada exitosamente',
+                'task_id': task_id
+            }), 201
+        
+        @self.app.route('/api/tasks/<int:task_id>', methods=['GET'])
+        @require_auth
+        @require_permission('task.read')
+        def get_task(task_id):
+            """Obtener tarea"""
+            return self.cached_response(
+                ('tasks', 'users'),
+                lambda: self.task_model.get_task(task_id),
+                not_found='Tarea no encontrada'
+            )
+        
+        @self.app.route('/api/tasks/<int:task_id>', methods=['PUT'])
+        @require_auth
+        @require_permission('task.update')
+        def update_task(task_id):
+            """Actualizar título, descripción, prioridad, estimación y fechas"""
+            update_data, error = task_fields(request.get_json() or {})
+            if error:
+                return jsonify({'error': error}), 400
+            if not update_data:
+                return jsonify({'error': 'No hay campos para actualizar'}), 400
+            
+            if not self.task_model.update_task(task_id, **update_data):
+                return jsonify({'error': 'Tarea no encontrada'}), 404
+            
+            self.audit_logger.log_action(
+                request.current_user['id'],
+                'task_updated',
+                'tasks',
+                task_id,
+                new_values=update_data,
+                ip_address=request.remote_addr
+            )
+            
+            return jsonify({'message': 'Tarea actualizada exitosamente'}), 200
+        
+        @self.app.route('/api/tasks/<int:task_id>/status', methods=['PUT'])
+        @require_auth
+        def update_task_status(task_id):
+            """Cambiar estado (task.update, o task.update_own si es el asignado)"""
+            data = request.get_json() or {}
+            status = data.get('status')
+            if status not in Task.STATUSES:
+                return jsonify({'error': f"Estado inválido. Usa {', '.join(Task.STATUSES)}"}), 400
+            
+            user = request.current_user
+            if not PermissionManager.has_permission(user['role'], 'task.update'):
+                if not PermissionManager.has_permission(user['role'], 'task.update_own'):
+                    return jsonify({'error': 'Permisos insuficientes'}), 403
+                task = self.task_model.get_task(task_id)
+                if not task:
+                    return jsonify({'error': 'Tarea no encontrada'}), 404
+                if task['assigned_to'] != user['id']:
+                    return jsonify({'error': 'Sólo puedes cambiar el estado de tus tareas'}), 403
+            
+            if not self.task_model.set_status(task_id, status):
+                return jsonify({'error': 'Tarea no encontrada'}), 404
+            
+            self.audit_logger.log_action(
+                user['id'],
+                'task_status_changed',
+                'tasks',
+                task_id,
+                new_values={'status': status},
+                ip_address=request.remote_addr
+            )
+            
+            return jsonify({'message': 'Estado actualizado exitosamente', 'status': status}), 200
+        
+        @self.app.route('/api/tasks/<int:task_id>/assign', methods=['PUT'])
+        @require_auth
+        @require_permission('task.update')
+        def assign_task(task_id):
+            """Asignar tarea: {"user_id": 7} o {"user_id": null} para desasignar"""
+            data = request.get_json() or {}
+            user_id = data.get('user_id')
+            if user_id is not None and not active_user_exists(user_id):
+                return jsonify({'error': 'Usuario no encontrado'}), 400
+            
+            if not self.task_model.assign(task_id, user_id):
+                return jsonify({'error': 'Tarea no encontrada'}), 404
+            
+            self.audit_logger.log_action(
+                request.current_user['id'],
+                'task_assigned',
+                'tasks',
+                task_id,
+                new_values={'assigned_to': user_id},
+                ip_address=request.remote_addr
+            )
+            
+            return jsonify({'message': 'Tarea asignada exitosamente'}), 200
+        
+        @self.app.route('/api/tasks/move', methods=['POST'])
+        @require_auth
+        @require_permission('task.update')
+        def move_tasks():
+            """Mover varias tareas a otro proyecto: {"task_ids": [...], "project_id": 3}"""
+            data = request.get_json() or {}
+            task_ids = data.get('task_ids')
+            project_id = data.get('project_id')
+            
+            if (not isinstance(task_ids, list) or not task_ids
+                    or not all(isinstance(task_id, int) for task_id in task_ids)):
+                return jsonify({'error': 'task_ids debe ser una lista de ids'}), 400
+            if len(task_ids) > 500:
+                return jsonify({'error': 'Máximo 500 tareas por operación'}), 400
+            if not isinstance(project_id, int):
+                return jsonify({'error': 'project_id requerido'}), 400
+            
+            moved = self.task_model.move_tasks(task_ids, project_id)
+            if moved is None:
+                return jsonify({'error': 'Proyecto no encontrado'}), 404
+            
+            self.audit_logger.log_action(
+                request.current_user['id'],
+                'tasks_moved',
+                'tasks',
+                new_values={'project_id': project_id, 'task_ids': moved},
+                ip_address=request.remote_addr
+            )
+            
+            return jsonify({
+                'message': f'{len(moved)} tareas movidas',
+                'moved': moved
+            }), 200
+        
+        @self.app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+        @require_auth
+        @require_permission('task.delete')
+        def delete_task(task_id):
+            """Eliminar tarea"""
+            try:
+                deleted = self.task_model.delete_task(task_id)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 409
+            
+            if not deleted:
+                return jsonify({'error': 'Tarea no encontrada'}), 404
+            
+            self.audit_logger.log_action(
+                request.current_user['id'],
+                'task_deleted',
+                'tasks',
+                task_id,
+                ip_address=request.remote_addr
+            )
+            
+            return jsonify({'message': 'Tarea eliminada exitosamente'}), 200
+        
+        # ============================================
+        # ⏱️ HOJAS DE HORAS
+        # ============================================
+        
+        @self.app.route('/api/timesheets', methods=['POST'])
+        @require_auth
+        @require_permission('timesheet.create')
+        def submit_timesheet():
+            """Registrar las horas de una semana en una petición
+            
+            Body: ``{"week_start": "YYYY-MM-DD", "entries": [...]}``; todas las
+            entradas deben caer en la misma semana. Si alguna es inválida no se
+            registra ninguna y se devuelven los errores por posición.
+            """
+            data = request.get_json(silent=True)
+            if isinstance(data, list):
+                data = {'entries': data}
+            if not isinstance(data, dict) or not isinstance(data.get('entries'), list) or not data['entries']:
+                return jsonify({'error': 'Se esperaba una lista de entradas en entries'}), 400
+            
+            max_entries = self.app.config['TIMESHEET_MAX_ENTRIES']
+            if len(data['entries']) > max_entries:
+                return jsonify({'error': f'Máximo {max_entries} entradas por envío'}), 400
+            
+            week_start = None
+            if data.get('week_start'):
+                try:
+                    week_start = datetime.strptime(str(data['week_start']), '%Y-%m-%d').date()
+                except ValueError:
+                    return jsonify({'error': 'Formato de fecha inválido para week_start. Use YYYY-MM-DD'}), 400
+                week_start = TimeEntry.week_start(week_start)
+            
+            entries, errors = [], []
+            for index, item in enumerate(data['entries']):
+                if not isinstance(item, dict):
+                    errors.append({'index': index, 'error': 'Entrada con formato inválido'})
+                    continue
+                valid, error = validate_input(item, ['entry_date', 'hours'])
+                if not valid:
+                    errors.append({'index': index, 'error': error})
+                    continue
+                try:
+                    entry_date = datetime.strptime(str(item['entry_date']), '%Y-%m-%d').date()
+                except ValueError:
+                    errors.append({'index': index, 'error': 'Formato de fecha inválido. Use YYYY-MM-DD'})
+                    continue
+                try:
+                    hours = float(item['hours'])
+                except (TypeError, ValueError):
+                    hours = None
+                if hours is None or not 0 < hours <= TimeEntry.MAX_DAILY_HOURS:
+                    errors.append({'index': index, 'error': f'Horas fuera de rango (0, {TimeEntry.MAX_DAILY_HOURS}]'})
+                    continue
+                
+                week_start = week_start or TimeEntry.week_start(entry_date)
+                if TimeEntry.week_start(entry_date) != week_start:
+                    errors.append({'index': index,
+                                   'error': f'La fecha {entry_date} no pertenece a la semana del {week_start}'})
+                    continue
+                
+                try:
+                    entries.append({
+                        'entry_date': entry_date,
+                        'hours': round(hours, 2),
+                        'project_id': int(item['project_id']) if item.get('project_id') else None,
+                        'task_id': int(item['task_id']) if item.get('task_id') else None,
+                        'description': sanitize_input(str(item.get('description') or '')),
+                        'billable': bool(item.get('billable'))
+                    })
+                except (TypeError, ValueError):
+                    errors.append({'index': index, 'error': 'project_id y task_id deben ser enteros'})
+            
+            if not errors:
+                entry_ids, errors = self.time_entry_model.submit_entries(
+                    request.current_user['id'], entries
+                )
+            if errors:
+                return jsonify({'error': 'Hoja de horas inválida', 'errors': errors}), 400
+            
+            total_hours = round(sum(entry['hours'] for entry in entries), 2)
+            self.audit_logger.log_action(
+                request.current_user['id'],
+                'timesheet_submitted',
+                'time_entries',
+                new_values={'week_start': week_start, 'entries': len(entry_ids), 'hours': total_hours},
+                ip_address=request.remote_addr
+            )
+            
+            return jsonify({
+                'message': 'Horas registradas exitosamente',
+                'week_start': week_start.isoformat(),
+                'entry_ids': entry_ids,
+                'total_hours': total_hours
+            }), 201
+        
+        def timesheet_user(requested_user_id: int):
+            """Usuario cuyas horas se consultan: sin reports.read, sólo el propio"""
+            user = request.current_user
+            if requested_user_id and requested_user_id != user['id']:
+                if not PermissionManager.has_permission(user['role'], 'reports.read'):
+                    return None
+                return requested_user_id
+            return user['id']
+        
+        @self.app.route('/api/timesheets', methods=['GET'])
+        @require_auth
+        @require_permission('timesheet.read_own')
+        def get_timesheet():
+            """Registros de una semana: ?week=YYYY-MM-DD&user_id="""
+            try:
+                week = self.date_arg('week') or date.today()
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            user_id = timesheet_user(request.args.get('user_id', type=int))
+            if user_id is None:
+                return jsonify({'error': 'No tienes permisos para ver estas horas'}), 403
+            
+            week_start = TimeEntry.week_start(week)
+            entries = self.time_entry_model.get_week(user_id, week_start)
+            return jsonify({
+                'user_id': user_id,
+                'week_start': week_start.isoformat(),
+                'entries': entries,
+                'total_hours': round(sum(entry['hours'] for entry in entries), 2)
+            }), 200
+        
+        @self.app.route('/api/reports/timesheets', methods=['GET'])
+        @require_auth
+        @require_permission('timesheet.read_own')
+        def timesheet_report():
+            """Totales de horas desde los acumulados semanales
+            
+            ?group_by=week|project|user&user_id=&project_id=&date_from=&date_to=
+            Sin reports.read el informe se limita a las horas propias.
+            """
+            group_by = request.args.get('group_by', 'week')
+            if group_by not in TimeEntry.ROLLUP_GROUPS:
+                return jsonify({'error': f"group_by debe ser uno de: {', '.join(TimeEntry.ROLLUP_GROUPS)}"}), 400
+            
+            requested_user_id = request.args.get('user_id', type=int)
+            if PermissionManager.has_permission(request.current_user['role'], 'reports.read'):
+                user_id = requested_user_id
+            else:
+                user_id = timesheet_user(requested_user_id)
+                if user_id is None:
+                    return jsonify({'error': 'No tienes permisos para ver estas horas'}), 403
+            
+            try:
+                rows = self.time_entry_model.get_rollup(
+                    group_by=group_by,
+                    user_id=user_id,
+                    project_id=request.args.get('project_id', type=int),
+                    date_from=self.date_arg('date_from'),
+                    date_to=self.date_arg('date_to')
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'group_by': group_by,
+                'user_id': user_id,
+                'rows': rows,
+                'total_hours': round(sum(row['hours'] for row in rows), 2),
+                'billable_hours': round(sum(row['billable_hours'] for row in rows), 2)
+            }), 200
+        
+        # ============================================
+        # 🏢 ANALÍTICA DE DEPARTAMENTOS
+        # ============================================
+        
+        @self.app.route('/api/reports/departments', methods=['GET'])
+        @require_auth
+        @require_permission('reports.read')
+        def department_report():
+            """Último estado de cada departamento desde las instantáneas (?department_id=)"""
+            department_id = request.args.get('department_id', type=int)
+            
+            def load():
+                departments = self.department_analytics.get_latest(department_id)
+                return {
+                    'departments': departments,
+                    'snapshot_date': max((row['snapshot_date'] for row in departments), default=None)
+                }
+            
+            return self.cached_response(('department_snapshots', 'departments'), load)
+        
+        @self.app.route('/api/reports/departments/trend', methods=['GET'])
+        @require_auth
+        @require_permission('reports.read')
+        def department_trend():
+            """Serie histórica: ?department_id=&interval=day|week|month&date_from=&date_to=
+            
+            Sin department_id se devuelven los totales de la empresa.
+            """
+            department_id = request.args.get('department_id', type=int)
+            interval = request.args.get('interval', 'day')
+            try:
+                date_from = self.date_arg('date_from')
+                date_to = self.date_arg('date_to')
+                if interval not in DepartmentAnalytics.TREND_INTERVALS:
+                    raise ValueError(f"interval debe ser uno de: {', '.join(DepartmentAnalytics.TREND_INTERVALS)}")
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            def load():
+                return {
+                    'department_id': department_id,
+                    'interval': interval,
+                    'series': self.department_analytics.get_trend(
+                        department_id, interval=interval, date_from=date_from, date_to=date_to
+                    )
+                }
+            
+            return self.cached_response(('department_snapshots',), load)
+        
+        @self.app.route('/api/reports/departments/refresh', methods=['POST'])
+        @require_auth
+        @require_permission('department.update')
+        def refresh_department_report():
+            """Refresco bajo demanda de la instantánea de hoy ({"full": true} recalcula todos)"""
+            data = request.get_json(silent=True) or {}
+            result = self.department_analytics.refresh(full=bool(data.get('full')))
+            
+            self.audit_logger.log_action(
+                request.current_user['id'],
+                'department_snapshots_refreshed',
+                'department_snapshots',
+                None,
+                new_values=result,
+                ip_address=request.remote_addr
+            )
+            
+            return jsonify(result), 200
+        
+        # ============================================
+        # 🧮 INFORMES VECTORIZADOS
+        # ============================================
+        
+        # Informe → (tablas de las que depende, cálculo)
+        analytics_reports = {
+            'projects': (('projects', 'time_entries'), self.analytics.project_report),
+            'workforce': (('employees', 'time_entries'), self.analytics.workforce_report),
+            'tasks': (('tasks',), self.analytics.task_report),
+            'overview': (('projects', 'employees', 'tasks', 'time_entries'), self.analytics.overview)
+        }
+        
+        @self.app.route('/api/reports/<any(projects, workforce, tasks, overview):report>', methods=['GET'])
+        @require_auth
+        @require_permission('reports.read')
+        def analytics_report(report):
+            """Informe completo calculado en NumPy sobre las instantáneas columnares"""
+            tables, compute = analytics_reports[report]
+            
+            def load():
+                return {'report': report, 'generated_at': datetime.now().isoformat(), **compute()}
+            
+            return self.cached_response(tables, load)
+        
+        # ============================================
+        # 🔎 BÚSQUEDA
+        # ============================================
+        
+        # Permiso necesario para ver cada tipo de resultado
+        search_permissions = {
+            'projects': 'project.read',
+            'users': 'user.read',
+            'tasks': 'task.read',
+            'comments': None  # según la entidad comentada
+        }
+        comment_permissions = {
+            'project': 'project.read',
+            'task': 'task.read',
+            'employee': 'employee.read'
+        }
+        
+        @self.app.route('/api/search', methods=['GET'])
+        @require_auth
+        def search():
+            """Búsqueda de texto completo: ?q=texto&type=projects,tasks&page=1"""
+            query = request.args.get('q', '').strip()
+            if not query:
+                return jsonify({'error': 'Parámetro q requerido'}), 400
+            
+            page = max(request.args.get('page', 1, type=int), 1)
+            per_page = min(request.args.get('per_page', 20, type=int), 50)
+            
+            requested = [t for t in request.args.get('type', '').split(',') if t]
+            unknown = [t for t in requested if t not in search_permissions]
+            if unknown:
+                return jsonify({'error': f"Tipo de búsqueda desconocido: {', '.join(unknown)}"}), 400
+            
+            role = request.current_user['role']
+            can = lambda permission: permission is None or PermissionManager.has_permission(role, permission)
+            types = [t for t, permission in search_permissions.items()
+                     if can(permission) and (not requested or t in requested)]
+            comment_entities = [entity for entity, permission in comment_permissions.items()
+                                if can(permission)]
+            
+            try:
+                results = self.search_index.search(
+                    query, types,
+                    limit=per_page + 1,
+                    offset=(page - 1) * per_page,
+                    comment_entities=comment_entities
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'query': query,
+                'results': results[:per_page],
+                'pagination': {
+                    'page': page,
+                    'per_page': per_page,
+                    'has_more': len(results) > per_page
+                }
+            }), 200
+        
+        # ============================================
+        # 📤 EXPORTACIÓN
+        # ============================================
+        
+        @self.app.route('/api/export/<resource>', methods=['GET'])
+        @require_auth
+        def export_data(resource):
+            """Exportación completa en streaming: ?format=csv|ndjson&gzip=1"""
+            fmt = request.args.get('format', 'csv')
+            if fmt not in EXPORT_FORMATS:
+                return jsonify({'error': f"Formato no soportado. Usa {', '.join(EXPORT_FORMATS)}"}), 400
+            use_gzip = request.args.get('gzip', 'false').lower() in ('1', 'true', 'yes')
+            
+            try:
+                batches, error = self.export_batches(resource, self.app.config['EXPORT_BATCH_SIZE'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if error:
+                return jsonify({'error': error[0]}), error[1]
+            
+            chunks, mimetype, extension = export_stream(batches, fmt, use_gzip)
+            
+            self.audit_logger.log_action(
+                request.current_user['id'],
+                'data_exported',
+                resource,
+                new_values={'format': extension, 'filters': request.args.to_dict()},
+                ip_address=request.remote_addr
+            )
+            
+            filename = f"{resource}-{date.today().strftime('%Y%m%d')}.{extension}"
+            response = Response(chunks, mimetype=mimetype)
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+            response.headers['Cache-Control'] = 'no-store'
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+        
         # ============================================
         # 📊 DASHBOARD Y MÉTRICAS
         # ============================================
@@ -407,7 +1640,15 @@ class EnterprisePro:
         @require_permission('metrics.read')
         def get_dashboard_metrics():
             """Obtener métricas principales para dashboard"""
-            metrics = self.metrics_model.get_dashboard_metrics()
+            tags = ('projects', 'employees', 'tasks', 'company_metrics')
+            
+            # ETag débil: system_info cambia en cada respuesta aunque los datos no
+            etag, last_modified = self.validators(tags)
+            response = self.not_modified(etag, last_modified, weak=True)
+            if response is not None:
+                return response
+            
+            metrics, hit = self.cached(tags, self.metrics_model.get_dashboard_metrics)
             
             # Añadir métricas calculadas en tiempo real
             current_time = datetime.now()
@@ -426,7 +1667,142 @@ class EnterprisePro:
                 }
             }
             
-            return jsonify(enhanced_metrics), 200
+            response = self.set_validators(jsonify(enhanced_metrics), etag, last_modified, weak=True)
+            response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+            return response, 200
+        
+        @self.app.route('/api/metrics', methods=['GET'])
+        @require_auth
+        @require_permission('metrics.read')
+        def list_metrics():
+            """Métricas disponibles con su rango y último valor"""
+            return self.cached_response(('metric_rollups', 'company_metrics'),
+                                        lambda: {'metrics': self.metrics_model.list_metrics()})
+        
+        @self.app.route('/api/metrics', methods=['POST'])
+        @require_auth
+        @require_permission('metrics.write')
+        def ingest_metrics():
+            """Ingesta por lotes: ``[{"metric_name", "metric_value", "recorded_date", ...}]``
+            
+            También acepta ``{"points": [...]}``. Los puntos válidos se insertan en
+            una transacción y los inválidos se devuelven por posición.
+            """
+            data = request.get_json(silent=True)
+            if isinstance(data, dict):
+                data = data.get('points')
+            if not isinstance(data, list) or not data:
+                return jsonify({'error': 'Se esperaba una lista de puntos'}), 400
+            
+            max_points = self.app.config['METRICS_INGEST_MAX_POINTS']
+            if len(data) > max_points:
+                return jsonify({'error': f'Máximo {max_points} puntos por petición'}), 400
+            
+            points, errors = [], []
+            for index, item in enumerate(data):
+                if not isinstance(item, dict):
+                    errors.append({'index': index, 'error': 'Punto con formato inválido'})
+                    continue
+                # metric_value puede ser 0: sólo se exige que esté presente
+                valid, error = validate_input(item, ['metric_name', 'recorded_date'])
+                if valid and item.get('metric_value') is None:
+                    valid, error = False, 'Campos requeridos faltantes: metric_value'
+                if not valid:
+                    errors.append({'index': index, 'error': error})
+                    continue
+                metric_name = sanitize_input(str(item['metric_name']))[:100]
+                try:
+                    recorded_date = datetime.strptime(str(item['recorded_date']), '%Y-%m-%d').date()
+                except ValueError:
+                    errors.append({'index': index, 'error': 'Formato de fecha inválido. Use YYYY-MM-DD'})
+                    continue
+                try:
+                    metric_value = float(item['metric_value'])
+                except (TypeError, ValueError):
+                    metric_value = None
+                if metric_value is None or not math.isfinite(metric_value):
+                    errors.append({'index': index, 'error': 'metric_value debe ser numérico'})
+                    continue
+                
+                points.append({
+                    'metric_name': metric_name,
+                    'metric_value': metric_value,
+                    'recorded_date': recorded_date,
+                    'metric_type': sanitize_input(str(item['metric_type']))[:50] if item.get('metric_type') else None,
+                    'period': sanitize_input(str(item['period']))[:20] if item.get('period') else None
+                })
+            
+            inserted = self.metrics_model.add_metrics(points)
+            if inserted:
+                self.audit_logger.log_action(
+                    request.current_user['id'],
+                    'metrics_ingested',
+                    'company_metrics',
+                    None,
+                    new_values={'points': inserted,
+                                'metrics': sorted({point['metric_name'] for point in points})},
+                    ip_address=request.remote_addr
+                )
+            
+            return jsonify({'inserted': inserted, 'errors': errors}), 201 if inserted else 400
+        
+        @self.app.route('/api/metrics/<metric_name>/series', methods=['GET'])
+        @require_auth
+        @require_permission('metrics.read')
+        def get_metric_series(metric_name):
+            """Serie de una métrica: ?date_from=&date_to=&resolution=auto|raw|day|week|month&max_points=
+            
+            Por defecto el último año con la resolución más fina que quepa en max_points.
+            """
+            try:
+                date_to = self.date_arg('date_to') or date.today()
+                date_from = self.date_arg('date_from') or date_to - timedelta(days=365)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if date_from > date_to:
+                return jsonify({'error': 'date_from no puede ser posterior a date_to'}), 400
+            
+            resolution = request.args.get('resolution', 'auto')
+            if resolution != 'auto' and resolution not in CompanyMetrics.RESOLUTIONS:
+                return jsonify({'error': f"resolution debe ser una de: auto, {', '.join(CompanyMetrics.RESOLUTIONS)}"}), 400
+            max_points = min(max(request.args.get('max_points', 500, type=int), 10), 5000)
+            
+            return self.cached_response(
+                ('metric_rollups', 'company_metrics'),
+                lambda: self.metrics_model.get_series(metric_name, date_from, date_to,
+                                                      resolution=resolution, max_points=max_points)
+            )
+        
+        @self.app.route('/api/stream', methods=['GET'])
+        @require_auth
+        def event_stream():
+            """Canal SSE: deltas de métricas, progreso de proyectos y notificaciones"""
+            role = request.current_user['role']
+            token = request.headers['Authorization'].split(' ')[1]
+            payload = self.auth_manager.verify_access_token(token)
+            if not payload:
+                return jsonify({'error': 'Token inválido o expirado'}), 401
+            subscriber = self.event_hub.subscribe(
+                request.current_user['id'],
+                lambda permission: PermissionManager.has_permission(role, permission),
+                last_event_id=request.headers.get('Last-Event-ID', type=int),
+                **self.stream_session(token, payload)
+            )
+            
+            try:
+                if PermissionManager.has_permission(role, 'metrics.read'):
+                    self.event_hub.send(subscriber, 'snapshot', self.dashboard_feed.snapshot())
+            except BaseException:
+                self.event_hub.unsubscribe(subscriber)
+                raise
+            
+            response = Response(
+                self.event_hub.listen(subscriber, self.app.config['STREAM_KEEPALIVE']),
+                mimetype='text/event-stream'
+            )
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
         
         # ============================================
         # 📁 ARCHIVOS ESTÁTICOS Y FRONTEND
@@ -448,12 +1824,30 @@ class EnterprisePro:
         
         @self.app.route('/api/health', methods=['GET'])
         def health_check():
-            """Health check del sistema"""
+            """Health check público (balanceadores, HEALTHCHECK de Docker): sólo el estado"""
+            return jsonify({'status': 'healthy'}), 200
+        
+        @self.app.route('/api/health/details', methods=['GET'])
+        @require_auth
+        @require_permission('system.config')
+        def health_details():
+            """Diagnóstico del worker: pools, colas, cachés, versiones por tabla y SSE"""
             return jsonify({
                 'status': 'healthy',
                 'timestamp': datetime.now().isoformat(),
                 'version': '1.0.0',
-                'database': 'connected'
+                'database': 'connected',
+                'worker': self.worker_info,
+                'pool': self.db_manager.pool_status(),
+                'audit': self.audit_logger.stats(),
+                'passwords': self.password_pool.stats(),
+                'token_cache': self.auth_manager.token_cache.stats(),
+                'identity_cache': self.user_model.identity_cache.stats(),
+                'name_directory': self.directory.stats(),
+                'analytics': self.analytics.stats(),
+                'response_cache': self.response_cache.stats(),
+                'table_versions': self.db_manager.table_versions.stats(),
+                'stream': {**self.event_hub.stats(), **self.dashboard_feed.stats()}
             }), 200
         
         @self.app.route('/api/permissions', methods=['GET'])
@@ -461,12 +1855,13 @@ class EnterprisePro:
         def get_user_permissions():
             """Obtener permisos del usuario actual"""
             role = request.current_user['role']
-            permissions = PermissionManager.get_user_permissions(role)
+            payload, etag = PermissionManager.get_permissions_payload(role)
             
-            return jsonify({
-                'role': role,
-                'permissions': permissions
-            }), 200
+            response = jsonify(payload)
+            response.headers['Cache-Control'] = 'private, max-age=300'
+            if etag:
+                response.set_etag(etag)
+            return response.make_conditional(request)
     
     def setup_error_handlers(self):
         """Configurar manejadores de errores"""
@@ -482,6 +1877,22 @@ class EnterprisePro:
         @self.app.errorhandler(400)
         def bad_request(error):
             return jsonify({'error': 'Solicitud inválida'}), 400
+        
+        @self.app.errorhandler(PoolTimeoutError)
+        def pool_exhausted(error):
+            return jsonify({'error': 'Servicio saturado, intenta de nuevo'}), 503
+        
+        @self.app.errorhandler(StreamFullError)
+        def stream_full(error):
+            response = jsonify({'error': 'Demasiadas conexiones en tiempo real, intenta de nuevo'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        
+        @self.app.errorhandler(PasswordPoolBusyError)
+        def password_pool_busy(error):
+            response = jsonify({'error': 'Demasiados inicios de sesión simultáneos, intenta de nuevo'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
     
     def run(self, host='127.0.0.1', port=5000, debug=None):
         """Ejecutar la aplicación"""
@@ -495,9 +1906,9 @@ class EnterprisePro:
         self.app.run(host=host, port=port, debug=debug)
 
 # Función para crear la aplicación
-def create_app():
+def create_app(preload: bool = False):
     """Factory function para crear la aplicación"""
-    return EnterprisePro()
+    return EnterprisePro(preload=preload)
 
 if __name__ == '__main__':
     # Ejecutar aplicación
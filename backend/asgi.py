@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+⚡ EnterprisePro - Punto de entrada ASGI
+
+Sirve las mismas rutas y modelos que la aplicación Flask desde un bucle de
+eventos (ASGI 3, sin framework adicional):
+
+- ``/api/stream`` se atiende de forma nativa: cada conexión SSE es una
+  corrutina que duerme hasta que el hub publica algo, así que miles de
+  dashboards ociosos no ocupan un hilo cada uno. El token se verifica en el
+  bucle (caché de tokens) y la firma, si hace falta, en el executor.
+- El resto de rutas se ejecutan en la app Flask dentro de un executor
+  dedicado a SQLite (``ASGI_EXECUTOR_THREADS``, por defecto tantos hilos
+  como conexiones admite el pool). Las respuestas sin longitud conocida
+  (exportaciones) se generan en un hilo propio por respuesta, que recorre
+  y cierra el iterable (la conexión prestada del pool es por hilo) y entrega
+  los trozos al bucle por una cola acotada.
+
+Un proceso por instancia: los contadores de versión compartidos sólo se
+heredan con fork (ver ``server.py`` para el servidor multiproceso WSGI).
+
+Uso:
+    python3 asgi.py                                   # uvicorn en 0.0.0.0:5000
+    python3 asgi.py --host 127.0.0.1 --port 8000
+    uvicorn --factory asgi:create_asgi_app --port 5000
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import Optional, Dict, Any
+
+from auth import PermissionManager
+from stream import StreamFullError
+
+# Trozos en vuelo por respuesta en streaming antes de frenar al hilo productor
+STREAM_QUEUE_SIZE = 8
+
+def wsgi_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """Environ WSGI equivalente a una petición HTTP de ASGI"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'content-length':
+            continue
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def request_header(scope: Dict[str, Any], name: bytes) -> Optional[str]:
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+async def wait_disconnect(receive):
+    """Termina cuando el cliente cierra la conexión"""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+class AsyncEnterprise:
+    """Aplicación ASGI sobre una instancia de EnterprisePro"""
+    
+    def __init__(self, enterprise, executor_threads: int = 0):
+        self.enterprise = enterprise
+        config = enterprise.app.config
+        threads = (executor_threads or config['ASGI_EXECUTOR_THREADS']
+                   or config['DB_POOL_SIZE'] + config['DB_MAX_OVERFLOW'])
+        # Los hilos se crean bajo demanda: ninguno existe antes de arrancar
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi-sqlite')
+        self.max_body = config.get('MAX_CONTENT_LENGTH')
+        self.keepalive = config['STREAM_KEEPALIVE']
+        self.routes = {('GET', '/api/stream'): self.event_stream}
+        self._started = False
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            self.start_worker()
+            handler = self.routes.get((scope['method'], scope['path']), self.call_wsgi)
+            await handler(scope, receive, send)
+    
+    def start_worker(self, worker_id=None):
+        """Hilos de fondo de la aplicación (una vez, al primer evento del servidor)"""
+        if not self._started:
+            self._started = True
+            self.enterprise.start_worker(worker_id, server='asgi')
+    
+    def shutdown(self):
+        self.enterprise.shutdown()
+        self.executor.shutdown(wait=False)
+    
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start_worker()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.run(self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def run(self, function, *args):
+        """Ejecuta ``function`` en el executor de SQLite"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+    
+    @staticmethod
+    async def send_json(send, status: int, payload: Dict, headers=()):
+        body = json.dumps(payload).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(body)).encode('latin-1')),
+                                *headers]})
+        await send({'type': 'http.response.body', 'body': body})
+    
+    async def read_body(self, receive) -> Optional[bytes]:
+        """Cuerpo completo de la petición; None si supera MAX_CONTENT_LENGTH"""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if self.max_body and size > self.max_body:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+    
+    # ============================================
+    # 🌉 RUTAS FLASK (executor)
+    # ============================================
+    
+    def start_wsgi(self, environ: Dict[str, Any]) -> tuple:
+        """(status, headers, cuerpo, iterable) desde la app Flask
+        
+        Con Content-Length el cuerpo se lee en la misma llamada al executor;
+        sin él (respuestas en streaming) se devuelve el iterable pendiente.
+        """
+        started = {}
+        
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                  for name, value in headers]
+        
+        iterable = self.enterprise.app(environ, start_response)
+        if any(name == b'content-length' for name, _ in started['headers']):
+            try:
+                body = b''.join(iterable)
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+            return started['status'], started['headers'], body, None
+        return started['status'], started['headers'], b'', iterable
+    
+    async def call_wsgi(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            await self.send_json(send, 413, {'error': 'Solicitud demasiado grande'})
+            return
+        
+        status, headers, body, iterable = await self.run(self.start_wsgi, wsgi_environ(scope, body))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        if iterable is None:
+            await send({'type': 'http.response.body', 'body': body})
+            return
+        
+        # Streaming: next() y close() en un mismo hilo, como en un servidor WSGI
+        # (el iterable puede depender de estado por hilo)
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        stop = threading.Event()
+        threading.Thread(target=self.pump_wsgi, args=(iterable, chunks, loop, stop),
+                         name='asgi-stream', daemon=True).start()
+        disconnected = asyncio.ensure_future(wait_disconnect(receive))
+        finished = False
+        try:
+            while True:
+                chunk = asyncio.ensure_future(chunks.get())
+                await asyncio.wait({chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not chunk.done():
+                    chunk.cancel()
+                    with suppress(asyncio.CancelledError):
+                        await chunk
+                    break
+                chunk = chunk.result()
+                if chunk is None:
+                    finished = True
+                    await send({'type': 'http.response.body', 'body': b''})
+                    break
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            disconnected.cancel()
+            stop.set()
+            # Libera al hilo si espera hueco en la cola y aguarda a que cierre el iterable
+            while not finished:
+                finished = await chunks.get() is None
+    
+    @staticmethod
+    def pump_wsgi(iterable, chunks: asyncio.Queue, loop, stop: threading.Event):
+        """Recorre el iterable WSGI en un hilo propio y entrega los trozos al bucle
+        
+        Termina siempre con None en la cola (tras cerrar el iterable); un
+        error durante la iteración se entrega como la propia excepción.
+        """
+        def put(item):
+            asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+        
+        try:
+            for chunk in iterable:
+                put(chunk)
+                if stop.is_set():
+                    break
+        except Exception as e:
+            with suppress(RuntimeError):
+                put(e)
+        finally:
+            try:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+            finally:
+                with suppress(RuntimeError):
+                    put(None)
+    
+    # ============================================
+    # 📡 CANAL SSE NATIVO
+    # ============================================
+    
+    async def authenticate(self, scope) -> tuple:
+        """(usuario, None) o (None, mensaje de error) como ``require_auth``
+        
+        El usuario lleva además ``session``: los datos de sesión del token
+        para ``EventHub.subscribe``.
+        """
+        auth_header = request_header(scope, b'authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return None, 'Token de acceso requerido'
+        
+        token = auth_header.split(' ')[1]
+        payload = await self.enterprise.auth_manager.verify_access_token_async(token, self.executor)
+        if not payload:
+            return None, 'Token inválido o expirado'
+        return {'id': payload['user_id'], 'email': payload['email'], 'role': payload['role'],
+                'session': self.enterprise.stream_session(token, payload)}, None
+    
+    async def event_stream(self, scope, receive, send):
+        """/api/stream sin hilo por conexión (misma semántica que la ruta Flask)"""
+        user, error = await self.authenticate(scope)
+        if error:
+            await self.send_json(send, 401, {'error': error})
+            return
+        
+        last_event_id = request_header(scope, b'last-event-id')
+        hub = self.enterprise.event_hub
+        role = user['role']
+        try:
+            subscriber = hub.subscribe(
+                user['id'],
+                lambda permission: PermissionManager.has_permission(role, permission),
+                last_event_id=int(last_event_id) if last_event_id and last_event_id.isdigit() else None,
+                **user['session']
+            )
+        except StreamFullError:
+            await self.send_json(send, 503, {'error': 'Demasiadas conexiones en tiempo real, intenta de nuevo'},
+                                 headers=[(b'retry-after', b'5')])
+            return
+        
+        listener = hub.listen_async(subscriber, self.keepalive)
+        disconnected = asyncio.ensure_future(wait_disconnect(receive))
+        try:
+            if PermissionManager.has_permission(role, 'metrics.read'):
+                hub.send(subscriber, 'snapshot', await self.run(self.enterprise.dashboard_feed.snapshot))
+            
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                                    (b'cache-control', b'no-cache'),
+                                    (b'x-accel-buffering', b'no')]})
+            while True:
+                frame = asyncio.ensure_future(listener.__anext__())
+                await asyncio.wait({frame, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not frame.done():
+                    frame.cancel()
+                    with suppress(asyncio.CancelledError, StopAsyncIteration):
+                        await frame
+                    break
+                try:
+                    chunk = frame.result()
+                except StopAsyncIteration:
+                    await send({'type': 'http.response.body', 'body': b''})
+                    break
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            disconnected.cancel()
+            await listener.aclose()
+            hub.unsubscribe(subscriber)
+
+def create_asgi_app(executor_threads: int = 0) -> AsyncEnterprise:
+    """Factory para servidores ASGI (``uvicorn --factory asgi:create_asgi_app``)"""
+    from app import create_app
+    os.environ.setdefault('FLASK_DEBUG', 'False')
+    return AsyncEnterprise(create_app(preload=True), executor_threads=executor_threads)
+
+def main():
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description="Servidor ASGI de EnterprisePro (uvicorn)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=0, help="Hilos del executor de SQLite")
+    args = parser.parse_args()
+    
+    application = create_asgi_app(args.threads)
+    config = application.enterprise.app.config
+    uvicorn.run(application, host=args.host, port=args.port, lifespan='on',
+                timeout_keep_alive=int(config.get('SERVER_KEEPALIVE', 5)),
+                backlog=int(config.get('SERVER_BACKLOG', 2048)),
+                access_log=False)
+
+if __name__ == '__main__':
+    main()
@@ -3,52 +3,290 @@
 Manejo seguro de autenticación, autorización y sesiones
 """
 
+import asyncio
 from functools import wraps
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 import jwt
 import hashlib
 import secrets
 from typing import Optional, Dict, Any
 import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import passwords
+
+class TokenCache:
+    """Caché LRU/TTL de payloads de tokens ya verificados
+    
+    La clave es el SHA-256 del token (nunca el token en claro) y cada entrada
+    caduca a los ``ttl`` segundos o al ``exp`` del token, lo que ocurra antes.
+    Los tokens revocados se recuerdan hasta su ``exp`` para rechazarlos aunque
+    su firma siga siendo válida.
+    """
+    
+    def __init__(self, max_size: int = 10000, ttl: float = 300):
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+    
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    def get(self, token: str) -> Optional[Dict]:
+        """Payload cacheado o None si no está o ha caducado"""
+        key = self.digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return payload
+                del self._entries[key]
+            self._stats['misses'] += 1
+            return None
+    
+    def put(self, token: str, payload: Dict):
+        """Guarda un payload verificado"""
+        now = time.time()
+        expires_at = min(now + self.ttl, payload.get('exp', now + self.ttl))
+        if expires_at <= now:
+            return
+        
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+    
+    def revoke(self, token: str, expires_at: float):
+        """Invalida un token concreto hasta su expiración"""
+        key = self.digest(token)
+        now = time.time()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._revoked[key] = expires_at
+            self._stats['invalidations'] += 1
+            # Purga de revocaciones ya caducadas
+            for revoked_key in [k for k, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[revoked_key]
+    
+    def is_revoked(self, token: str) -> bool:
+        if not self._revoked:
+            return False
+        key = self.digest(token)
+        with self._lock:
+            expires_at = self._revoked.get(key)
+            return expires_at is not None and expires_at > time.time()
+    
+    def clear(self):
+        """Vacía la caché (p. ej. tras rotar la clave secreta)"""
+        with self._lock:
+            self._stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+            stats['revoked'] = len(self._revoked)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['max_size'] = self.max_size
+        return stats
+
+class RefreshTokenStore:
+    """Refresh tokens emitidos, con rotación y revocación en SQLite
+    
+    Cada refresh sólo es válido una vez: al usarse se marca como revocado y se
+    registra su sustituto. Presentar de nuevo un token ya rotado (fuera de un
+    pequeño margen para peticiones concurrentes) revoca toda su familia.
+    """
+    
+    ROTATED = 'rotated'
+    REUSED = 'reused'
+    INVALID = 'invalid'
+    
+    REUSE_GRACE_SECONDS = 10
+    
+    def __init__(self, db_manager):
+        self.db = db_manager
+    
+    @staticmethod
+    def _timestamp(value: datetime) -> str:
+        """Mismo formato que CURRENT_TIMESTAMP para comparar en SQL"""
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    
+    def issue(self, jti: str, user_id: int, family_id: str, expires_at: datetime):
+        """Registra un refresh token recién emitido"""
+        with self.db.connection() as conn:
+            conn.execute("""
+                INSERT INTO refresh_tokens (jti, user_id, family_id, expires_at)
+                VALUES (?, ?, ?, ?)
+            """, (jti, user_id, family_id, self._timestamp(expires_at)))
+            conn.commit()
+    
+    def rotate(self, jti: str, new_jti: str, user_id: int, family_id: str,
+               expires_at: datetime) -> str:
+        """Consume ``jti`` y registra ``new_jti`` en la misma transacción"""
+        now = self._timestamp(datetime.utcnow())
+        
+        with self.db.connection() as conn:
+            cursor = conn.execute("""
+                UPDATE refresh_tokens
+                SET revoked_at = ?, replaced_by = ?
+                WHERE jti = ? AND user_id = ? AND revoked_at IS NULL AND expires_at > ?
+            """, (now, new_jti, jti, user_id, now))
+            
+            if cursor.rowcount == 1:
+                conn.execute("""
+                    INSERT INTO refresh_tokens (jti, user_id, family_id, expires_at)
+                    VALUES (?, ?, ?, ?)
+                """, (new_jti, user_id, family_id, self._timestamp(expires_at)))
+                conn.commit()
+                return self.ROTATED
+            
+            row = conn.execute("""
+                SELECT family_id, revoked_at, replaced_by,
+                       revoked_at > datetime('now', ?) AS within_grace
+                FROM refresh_tokens WHERE jti = ?
+            """, (f'-{self.REUSE_GRACE_SECONDS} seconds', jti)).fetchone()
+            
+            if row and row['revoked_at'] and not (row['replaced_by'] and row['within_grace']):
+                conn.execute("""
+                    UPDATE refresh_tokens SET revoked_at = ?
+                    WHERE family_id = ? AND revoked_at IS NULL
+                """, (now, row['family_id']))
+                conn.commit()
+                return self.REUSED
+        
+        return self.INVALID
+    
+    def revoke_family(self, family_id: str) -> int:
+        """Revoca todos los tokens vigentes de una familia"""
+        with self.db.connection() as conn:
+            cursor = conn.execute("""
+                UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP
+                WHERE family_id = ? AND revoked_at IS NULL
+            """, (family_id,))
+            conn.commit()
+        return cursor.rowcount
+    
+    def revoke_user(self, user_id: int) -> int:
+        """Revoca todas las sesiones de un usuario"""
+        with self.db.connection() as conn:
+            cursor = conn.execute("""
+                UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP
+                WHERE user_id = ? AND revoked_at IS NULL
+            """, (user_id,))
+            conn.commit()
+        return cursor.rowcount
+    
+    def purge_expired(self) -> int:
+        """Elimina registros caducados (tarea de mantenimiento)"""
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM refresh_tokens WHERE expires_at <= CURRENT_TIMESTAMP"
+            )
+            conn.commit()
+        return cursor.rowcount
+
+class RevokedTokenStore:
+    """Tokens de acceso revocados en SQLite, compartidos entre workers
+    
+    ``TokenCache`` sólo conoce las revocaciones de su proceso: cada logout
+    se guarda también aquí (SHA-256 del token hasta su ``exp``) y se
+    consulta al verificar un token que no estaba en caché. La escritura se
+    notifica como ``revoked_tokens`` para que los demás workers vacíen su
+    caché de tokens al sincronizarse.
+    """
+    
+    def __init__(self, db_manager):
+        self.db = db_manager
+    
+    def add(self, digest: str, expires_at: float):
+        with self.db.connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO revoked_tokens (token_digest, expires_at)
+                VALUES (?, ?)
+            """, (digest, RefreshTokenStore._timestamp(datetime.utcfromtimestamp(expires_at))))
+            conn.commit()
+        self.db.notify_write('revoked_tokens')
+    
+    def is_revoked(self, digest: str) -> bool:
+        with self.db.connection() as conn:
+            row = conn.execute("""
+                SELECT 1 FROM revoked_tokens
+                WHERE token_digest = ? AND expires_at > CURRENT_TIMESTAMP
+            """, (digest,)).fetchone()
+        return row is not None
+    
+    def revoked(self, digests) -> set:
+        """Subconjunto de ``digests`` revocados y aún vigentes (en bloques de 900 variables)"""
+        digests = list(digests)
+        found = set()
+        with self.db.connection() as conn:
+            for start in range(0, len(digests), 900):
+                chunk = digests[start:start + 900]
+                found.update(row[0] for row in conn.execute(f"""
+                    SELECT token_digest FROM revoked_tokens
+                    WHERE token_digest IN ({','.join('?' * len(chunk))})
+                      AND expires_at > CURRENT_TIMESTAMP
+                """, chunk))
+        return found
+    
+    def purge_expired(self) -> int:
+        """Elimina revocaciones de tokens ya caducados (tarea de mantenimiento)"""
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM revoked_tokens WHERE expires_at <= CURRENT_TIMESTAMP"
+            )
+            conn.commit()
+        return cursor.rowcount
 
 class AuthManager:
     """Gestor de autenticación con JWT y seguridad avanzada"""
     
-    def __init__(self, secret_key: str = None, algorithm: str = 'HS256'):
+    def __init__(self, secret_key: str = None, algorithm: str = 'HS256',
+                 token_cache_size: int = 10000, token_cache_ttl: float = 300,
+                 user_loader=None, refresh_store: 'RefreshTokenStore' = None,
+                 revoked_store: 'RevokedTokenStore' = None):
         self.secret_key = secret_key or self._generate_secret_key()
         self.algorithm = algorithm
         self.token_expiration = timedelta(hours=8)  # 8 horas de sesión
         self.refresh_expiration = timedelta(days=7)  # 7 días para refresh
+        self.token_cache = TokenCache(token_cache_size, token_cache_ttl)
+        # user_loader(user_id) -> {'id', 'email', 'role'} o None si no está activo
+        self.user_loader = user_loader
+        self.refresh_store = refresh_store
+        self.revoked_store = revoked_store
     
     def _generate_secret_key(self) -> str:
         """Genera clave secreta segura"""
         return secrets.token_urlsafe(32)
     
     def hash_password(self, password: str) -> str:
-        """Hash seguro de contraseña usando PBKDF2"""
-        salt = secrets.token_hex(32)
-        pwdhash = hashlib.pbkdf2_hmac('sha256', 
-                                     password.encode('utf-8'), 
-                                     salt.encode('utf-8'), 
-                                     100000)
-        return f"{salt}${pwdhash.hex()}"
+        """Hash seguro de contraseña usando PBKDF2 (pool de procesos)"""
+        return passwords.hash_password(password)
     
     def verify_password(self, password: str, password_hash: str) -> bool:
-        """Verifica contraseña contra hash"""
-        try:
-            salt, stored_hash = password_hash.split('$')
-            pwdhash = hashlib.pbkdf2_hmac('sha256',
-                                         password.encode('utf-8'),
-                                         salt.encode('utf-8'),
-                                         100000)
-            return pwdhash.hex() == stored_hash
-        except:
-            return False
+        """Verifica contraseña contra hash (pool de procesos)"""
+        return passwords.verify_password(password, password_hash)
     
-    def generate_tokens(self, user_data: Dict) -> Dict[str, str]:
-        """Genera tokens de acceso y refresh"""
-        now = datetime.utcnow()
-        
+    def _build_tokens(self, user_data: Dict, jti: str, family_id: str,
+                      now: datetime) -> Dict[str, str]:
+        """Firma el par de tokens para un refresh token ya registrado"""
         # Token de acceso
         access_payload = {
             'user_id': user_data['id'],
@@ -64,7 +302,9 @@ class AuthManager:
             'user_id': user_data['id'],
             'exp': now + self.refresh_expiration,
             'iat': now,
-            'type': 'refresh'
+            'type': 'refresh',
+            'jti': jti,
+            'fam': family_id
         }
         
         access_token = jwt.encode(access_payload, self.secret_key, algorithm=self.algorithm)
@@ -77,6 +317,17 @@ class AuthManager:
             'expires_in': int(self.token_expiration.total_seconds())
         }
     
+    def generate_tokens(self, user_data: Dict) -> Dict[str, str]:
+        """Genera tokens de acceso y refresh (inicia una nueva familia de refresh)"""
+        now = datetime.utcnow()
+        jti, family_id = secrets.token_hex(16), secrets.token_hex(16)
+        
+        if self.refresh_store:
+            self.refresh_store.issue(jti, user_data['id'], family_id,
+                                     now + self.refresh_expiration)
+        
+        return self._build_tokens(user_data, jti, family_id, now)
+    
     def verify_token(self, token: str) -> Optional[Dict]:
         """Verifica y decodifica token"""
         try:
@@ -87,6 +338,67 @@ class AuthManager:
         except jwt.InvalidTokenError:
             return None
     
+    def verify_access_token(self, token: str) -> Optional[Dict]:
+        """Verifica token de acceso usando la caché de tokens verificados"""
+        if self.token_cache.is_revoked(token):
+            return None
+        
+        payload = self.token_cache.get(token)
+        if payload is not None:
+            return payload
+        return self._verify_and_cache(token)
+    
+    async def verify_access_token_async(self, token: str, executor=None) -> Optional[Dict]:
+        """verify_access_token para el servidor ASGI
+        
+        Revocaciones y caché se consultan en el propio bucle (sólo memoria);
+        la verificación de la firma, si hace falta, va al ``executor``.
+        """
+        if self.token_cache.is_revoked(token):
+            return None
+        
+        payload = self.token_cache.get(token)
+        if payload is not None:
+            return payload
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, self._verify_and_cache, token
+        )
+    
+    def _verify_and_cache(self, token: str) -> Optional[Dict]:
+        payload = self.verify_token(token)
+        if not payload or payload.get('type') != 'access':
+            return None
+        # Revocado en otro worker (o antes de reiniciar): se recuerda en este proceso
+        if self.revoked_store and self.revoked_store.is_revoked(TokenCache.digest(token)):
+            self.token_cache.revoke(token, payload['exp'])
+            return None
+        self.token_cache.put(token, payload)
+        return payload
+    
+    def revoke_token(self, token: str) -> bool:
+        """Revoca un token (logout) hasta su expiración"""
+        payload = self.verify_token(token)
+        if not payload:
+            return False
+        self.token_cache.revoke(token, payload['exp'])
+        if self.revoked_store:
+            self.revoked_store.add(TokenCache.digest(token), payload['exp'])
+        return True
+    
+    def on_write(self, tables):
+        """Listener de DatabaseManager.notify_write / sync_writes
+        
+        Una revocación en otro worker vacía la caché de tokens verificados:
+        la siguiente petición de cada token vuelve a consultar revoked_tokens.
+        """
+        if 'revoked_tokens' in tables:
+            self.token_cache.clear()
+    
+    def rotate_secret(self, new_secret_key: str):
+        """Cambia la clave de firma; los tokens cacheados dejan de ser válidos"""
+        self.secret_key = new_secret_key
+        self.token_cache.clear()
+    
     def refresh_access_token(self, refresh_token: str) -> Optional[Dict[str, str]]:
         """Genera nuevo token de acceso usando refresh token"""
         payload = self.verify_token(refresh_token)
@@ -94,14 +406,33 @@ class AuthManager:
         if not payload or payload.get('type') != 'refresh':
             return None
         
-        # Simular obtención de datos del usuario (en app real vendría de DB)
-        user_data = {
-            'id': payload['user_id'],
-            'email': 'user@example.com',  # Obtener de DB
-            'role': 'employee'  # Obtener de DB
-        }
+        # Los refresh tokens anteriores a la rotación no tienen jti: nuevo login
+        if not payload.get('jti') or not self.user_loader or not self.refresh_store:
+            return None
+        
+        # Datos reales del usuario desde la caché de identidades
+        user_data = self.user_loader(payload['user_id'])
+        if not user_data:
+            self.refresh_store.revoke_family(payload['fam'])
+            return None
+        
+        now = datetime.utcnow()
+        new_jti = secrets.token_hex(16)
+        status = self.refresh_store.rotate(payload['jti'], new_jti, user_data['id'],
+                                           payload['fam'], now + self.refresh_expiration)
+        if status != RefreshTokenStore.ROTATED:
+            return None
         
-        return self.generate_tokens(user_data)
+        return self._build_tokens(user_data, new_jti, payload['fam'], now)
+    
+    def revoke_refresh_token(self, refresh_token: str) -> bool:
+        """Revoca la familia completa de un refresh token (logout)"""
+        payload = self.verify_token(refresh_token)
+        if not payload or payload.get('type') != 'refresh' or not payload.get('fam'):
+            return False
+        if self.refresh_store:
+            self.refresh_store.revoke_family(payload['fam'])
+        return True
     
     def create_session(self, user_data: Dict, ip_address: str = None, 
                       user_agent: str = None) -> Dict:
@@ -131,7 +462,7 @@ class PermissionManager:
             'project.create', 'project.read', 'project.update', 'project.delete',
             'task.create', 'task.read', 'task.update', 'task.delete',
             'department.create', 'department.read', 'department.update', 'department.delete',
-            'metrics.read', 'reports.read', 'audit.read',
+            'metrics.read', 'metrics.write', 'reports.read', 'audit.read',
             'system.config', 'system.backup'
         ],
         'manager': [
@@ -149,26 +480,147 @@ class PermissionManager:
         ]
     }
     
+    # Herencia de roles: cada rol recibe además los permisos de los listados
+    ROLE_INHERITS = {
+        'admin': ['manager'],
+        'manager': ['employee'],
+        'employee': []
+    }
+    
+    # Tablas compiladas por compile(): bit por permiso y máscara por rol
+    _permission_bits: Dict[str, int] = {}
+    _role_masks: Dict[str, int] = {}
+    _role_wildcards: Dict[str, frozenset] = {}
+    _role_bits: Dict[str, int] = {}
+    _role_closure_masks: Dict[str, int] = {}
+    _role_payloads: Dict[str, Dict] = {}
+    
+    @classmethod
+    def _role_closure(cls, role: str, seen: tuple = ()) -> list:
+        """Rol y todos los que hereda, en orden (detecta ciclos)"""
+        if role in seen:
+            raise ValueError(f"Herencia de roles cíclica: {' -> '.join(seen + (role,))}")
+        closure = [role]
+        for parent in cls.ROLE_INHERITS.get(role, []):
+            for inherited in cls._role_closure(parent, seen + (role,)):
+                if inherited not in closure:
+                    closure.append(inherited)
+        return closure
+    
+    @classmethod
+    def compile(cls):
+        """Compila roles y permisos a máscaras de bits (se ejecuta al importar)
+        
+        Los comodines como ``task.*`` se expanden sobre los permisos conocidos y
+        además se conservan como prefijo para permisos que no aparecen en la tabla.
+        """
+        concrete = []
+        for permissions in cls.ROLE_PERMISSIONS.values():
+            for permission in permissions:
+                if not permission.endswith('*') and permission not in concrete:
+                    concrete.append(permission)
+        bits = {permission: 1 << index for index, permission in enumerate(concrete)}
+        
+        roles = list(dict.fromkeys(list(cls.ROLE_PERMISSIONS) + list(cls.ROLE_INHERITS)))
+        role_bits = {role: 1 << index for index, role in enumerate(roles)}
+        
+        masks, wildcards, closure_masks, payloads = {}, {}, {}, {}
+        for role in roles:
+            closure = cls._role_closure(role)
+            mask, prefixes, granted = 0, set(), []
+            
+            for member in closure:
+                for permission in cls.ROLE_PERMISSIONS.get(member, []):
+                    if permission.endswith('*'):
+                        prefix = permission[:-1]
+                        prefixes.add(prefix)
+                        expanded = [p for p in concrete if p.startswith(prefix)]
+                    else:
+                        expanded = [permission]
+                    for granted_permission in [permission] + expanded:
+                        if granted_permission not in granted:
+                            granted.append(granted_permission)
+                    for concrete_permission in expanded:
+                        mask |= bits[concrete_permission]
+            
+            masks[role] = mask
+            wildcards[role] = frozenset(prefixes)
+            closure_masks[role] = sum(role_bits[member] for member in closure)
+            
+            payload = {'role': role, 'inherits': closure[1:], 'permissions': granted}
+            etag_source = json.dumps(payload, sort_keys=True).encode('utf-8')
+            payloads[role] = {
+                'payload': payload,
+                'etag': hashlib.sha256(etag_source).hexdigest()[:32]
+            }
+        
+        cls._permission_bits = bits
+        cls._role_masks = masks
+        cls._role_wildcards = wildcards
+        cls._role_bits = role_bits
+        cls._role_closure_masks = closure_masks
+        cls._role_payloads = payloads
+    
     @classmethod
     def has_permission(cls, role: str, permission: str) -> bool:
-        """Verifica si un rol tiene un permiso específico"""
-        return permission in cls.ROLE_PERMISSIONS.get(role, [])
+        """Verifica si un rol tiene un permiso específico (O(1))"""
+        bit = cls._permission_bits.get(permission)
+        if bit is not None:
+            return bool(cls._role_masks.get(role, 0) & bit)
+        
+        # Permiso fuera de la tabla: solo puede concederlo un comodín
+        prefixes = cls._role_wildcards.get(role)
+        if not prefixes:
+            return False
+        return any(permission.startswith(prefix) for prefix in prefixes)
+    
+    @classmethod
+    def roles_mask(cls, roles) -> int:
+        """Máscara de bits para un conjunto de roles"""
+        return sum(cls._role_bits.get(role, 0) for role in set(roles))
+    
+    @classmethod
+    def has_any_role(cls, role: str, required_mask: int) -> bool:
+        """Verifica si un rol (o alguno que herede) está en la máscara requerida"""
+        return bool(cls._role_closure_masks.get(role, 0) & required_mask)
     
     @classmethod
     def get_user_permissions(cls, role: str) -> list:
-        """Obtiene todos los permisos de un rol"""
-        return cls.ROLE_PERMISSIONS.get(role, [])
+        """Obtiene todos los permisos efectivos de un rol (incluidos los heredados)"""
+        compiled = cls._role_payloads.get(role)
+        return compiled['payload']['permissions'] if compiled else []
+    
+    @classmethod
+    def get_permissions_payload(cls, role: str) -> tuple:
+        """Payload precalculado de /api/permissions y su ETag"""
+        compiled = cls._role_payloads.get(role)
+        if not compiled:
+            return {'role': role, 'inherits': [], 'permissions': []}, None
+        return compiled['payload'], compiled['etag']
+    
+    # Comprobación de línea de reporte (manager_user_id, user_id) -> bool; la
+    # configura la aplicación con OrgChart.is_in_reporting_line
+    _reporting_line = None
+    
+    @classmethod
+    def configure_hierarchy(cls, reporting_line) -> None:
+        """Registra la función que decide si un usuario depende de otro"""
+        cls._reporting_line = reporting_line
     
     @classmethod
     def can_access_user_data(cls, user_role: str, target_user_id: int, 
                            current_user_id: int) -> bool:
-        """Verifica si puede acceder a datos de otro usuario"""
+        """Verifica si puede acceder a datos de otro usuario
+        
+        Los managers acceden a su propio usuario y a todo su subárbol de reporte.
+        """
         if user_role == 'admin':
             return True
-        elif user_role == 'manager':
-            return True  # Los managers pueden ver su equipo (simplificado)
-        else:
-            return target_user_id == current_user_id
+        if target_user_id == current_user_id:
+            return True
+        if user_role == 'manager' and cls._reporting_line is not None:
+            return cls._reporting_line(current_user_id, target_user_id)
+        return False
     
     @classmethod
     def can_modify_project(cls, user_role: str, user_id: int, 
@@ -181,6 +633,8 @@ class PermissionManager:
         else:
             return user_id == project_assigned_id
 
+PermissionManager.compile()
+
 def require_auth(f):
     """Decorador para endpoints que requieren autenticación"""
     @wraps(f)
@@ -198,7 +652,7 @@ def require_auth(f):
         if not auth_manager:
             return jsonify({'error': 'Configuración de autenticación no encontrada'}), 500
         
-        payload = auth_manager.verify_token(token)
+        payload = auth_manager.verify_access_token(token)
         if not payload:
             return jsonify({'error': 'Token inválido o expirado'}), 401
         
@@ -237,6 +691,7 @@ def require_role(required_roles):
     """Decorador para endpoints que requieren roles específicos"""
     if isinstance(required_roles, str):
         required_roles = [required_roles]
+    required_mask = PermissionManager.roles_mask(required_roles)
     
     def decorator(f):
         @wraps(f)
@@ -248,7 +703,7 @@ def require_role(required_roles):
             
             user_role = request.current_user['role']
             
-            if user_role not in required_roles:
+            if not PermissionManager.has_any_role(user_role, required_mask):
                 return jsonify({
                     'error': f'Rol requerido: {", ".join(required_roles)}. Tu rol: {user_role}'
                 }), 403
@@ -258,46 +713,244 @@ def require_role(required_roles):
         return decorated_function
     return decorator
 
+class _AuditFlush:
+    """Marcador en la cola: el escritor lo señala al alcanzar ese punto"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+
 class AuditLogger:
-    """Sistema de auditoría para acciones críticas"""
+    """Sistema de auditoría para acciones críticas
     
-    def __init__(self, db_manager):
+    En modo ``async`` los registros se encolan y un hilo escritor los inserta
+    en lotes (por tamaño o por tiempo) en una única transacción. Si la cola
+    está llena, el llamador espera hasta ``put_timeout`` y, si sigue llena,
+    escribe de forma síncrona: nunca se pierde un registro. En modo ``sync``
+    cada acción se inserta y confirma dentro de la petición.
+    """
+    
+    INSERT_SQL = """
+        INSERT INTO audit_logs (user_id, action, table_name, record_id,
+                               old_values, new_values, ip_address, user_agent, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    def __init__(self, db_manager, mode: str = 'sync', queue_size: int = 10000,
+                 batch_size: int = 200, flush_interval: float = 1.0,
+                 put_timeout: float = 0.5, start: bool = True):
+        if mode not in ('sync', 'async'):
+            raise ValueError(f"Modo de auditoría desconocido: {mode}")
+        
         self.db = db_manager
+        self.mode = mode
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._stats = {'queued': 0, 'written': 0, 'batches': 0,
+                       'sync_writes': 0, 'backpressure_waits': 0, 'errors': 0}
+        
+        if start:
+            self.start()
+    
+    def start(self):
+        """Arranca el hilo escritor (modo async); con ``start=False`` se difiere
+        
+        El servidor con preload crea la aplicación antes del fork y arranca el
+        hilo ya dentro de cada worker: los hilos no sobreviven a fork().
+        """
+        if self.mode == 'async' and self._writer is None:
+            self._writer = threading.Thread(target=self._writer_loop,
+                                            name='audit-writer', daemon=True)
+            self._writer.start()
+    
+    def iter_logs(self, user_id: int = None, action: str = None, table_name: str = None,
+                  date_from: date = None, date_to: date = None, batch_size: int = 500):
+        """Exportación de auditoría en lotes (ver DatabaseManager.stream_query)
+        
+        Sólo incluye lo ya escrito; llama antes a ``flush()`` para incluir la cola.
+        """
+        query = """
+            SELECT id, user_id, action, table_name, record_id, old_values,
+                   new_values, ip_address, user_agent, created_at
+            FROM audit_logs
+            WHERE 1=1
+        """
+        params = []
+        
+        for column, value in (('user_id', user_id), ('action', action), ('table_name', table_name)):
+            if value:
+                query += f" AND {column} = ?"
+                params.append(value)
+        
+        if date_from:
+            query += " AND created_at >= ?"
+            params.append(date_from.isoformat())
+        
+        if date_to:
+            # Incluye todo el día final
+            query += " AND created_at < date(?, '+1 day')"
+            params.append(date_to.isoformat())
+        
+        query += " ORDER BY id"
+        return self.db.stream_query(query, params, batch_size)
+    
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
     
     def log_action(self, user_id: int, action: str, table_name: str = None,
                   record_id: int = None, old_values: Dict = None, 
                   new_values: Dict = None, ip_address: str = None,
                   user_agent: str = None):
         """Registra acción en log de auditoría"""
-        conn = self.db.get_connection()
+        row = (user_id, action, table_name, record_id,
+               json.dumps(old_values, default=str) if old_values else None,
+               json.dumps(new_values, default=str) if new_values else None,
+               ip_address, user_agent,
+               # Misma forma que CURRENT_TIMESTAMP: hora del evento, no del flush
+               datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
         
-        try:
-            conn.execute("""
-                INSERT INTO audit_logs (user_id, action, table_name, record_id,
-                                       old_values, new_values, ip_address, user_agent)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (user_id, action, table_name, record_id,
-                 json.dumps(old_values) if old_values else None,
-                 json.dumps(new_values) if new_values else None,
-                 ip_address, user_agent))
-            
+        # Sin hilo escritor vivo la cola no se vaciaría: se escribe en la petición
+        if self.mode == 'async' and not self._closed and self._writer is not None and self._writer.is_alive():
+            try:
+                self._queue.put_nowait(row)
+                self._count('queued')
+                return
+            except queue.Full:
+                self._count('backpressure_waits')
+            try:
+                self._queue.put(row, timeout=self.put_timeout)
+                self._count('queued')
+                return
+            except queue.Full:
+                pass
+        
+        self._write_rows([row])
+        self._count('sync_writes')
+    
+    def _write_rows(self, rows: list):
+        """Inserta un lote de registros en una sola transacción"""
+        with self.db.connection() as conn:
+            conn.executemany(self.INSERT_SQL, rows)
             conn.commit()
-        finally:
-            conn.close()
+        self._count('written', len(rows))
+        self._count('batches')
+    
+    def _writer_loop(self):
+        """Hilo escritor: agrupa registros y los vuelca por tamaño o tiempo"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            
+            batch, markers = [], []
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            
+            while True:
+                if isinstance(item, _AuditFlush):
+                    markers.append(item)
+                elif item is None:
+                    stop = True
+                    break
+                else:
+                    batch.append(item)
+                
+                if markers or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            
+            try:
+                if batch:
+                    self._flush_batch(batch)
+            finally:
+                for marker in markers:
+                    marker.done.set()
+            if stop:
+                break
+    
+    def _flush_batch(self, batch: list):
+        """Escribe un lote con reintentos ante bloqueos transitorios
+        
+        Cualquier error (también ``PoolTimeoutError``) se cuenta y se descarta
+        el lote: el hilo escritor nunca debe terminar por una excepción.
+        """
+        for attempt in range(3):
+            try:
+                self._write_rows(batch)
+                return
+            except Exception as e:
+                error = e
+                time.sleep(0.1 * (attempt + 1))
+        
+        self._count('errors', len(batch))
+        print(f"❌ Auditoría: no se pudieron escribir {len(batch)} registros: {error}")
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Espera a que se escriban los registros encolados hasta este momento"""
+        if self.mode != 'async' or not self._writer or not self._writer.is_alive():
+            return True
+        
+        marker = _AuditFlush()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+    
+    def close(self, timeout: float = 10.0):
+        """Vacía la cola y detiene el hilo escritor"""
+        if self._closed:
+            return
+        self._closed = True
+        
+        if self._writer and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout)
+        
+        # Lo que quede (p. ej. si el escritor no terminó a tiempo) se escribe aquí
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _AuditFlush):
+                item.done.set()
+            elif item is not None:
+                leftover.append(item)
+        if leftover:
+            self._write_rows(leftover)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del pipeline de auditoría"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({'mode': self.mode, 'pending': self._queue.qsize()})
+        return stats
     
     def get_user_activity(self, user_id: int, limit: int = 50) -> list:
         """Obtiene actividad reciente del usuario"""
-        conn = self.db.get_connection()
-        
-        activities = conn.execute("""
-            SELECT action, table_name, record_id, created_at
-            FROM audit_logs
-            WHERE user_id = ?
-            ORDER BY created_at DESC
-            LIMIT ?
-        """, (user_id, limit)).fetchall()
+        self.flush()
         
-        conn.close()
+        with self.db.connection() as conn:
+            activities = conn.execute("""
+                SELECT action, table_name, record_id, created_at
+                FROM audit_logs
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            """, (user_id, limit)).fetchall()
         
         return [dict(activity) for activity in activities]
 
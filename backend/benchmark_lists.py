@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del listado de proyectos: JOIN por fila frente a directorio de nombres
+
+Crea una base de datos temporal con N proyectos y compara la consulta anterior
+(dos JOIN a users y uno a departments por fila) con la lectura de una sola
+tabla más el relleno de nombres por lote desde NameDirectory.
+
+Uso:
+    python3 benchmark_lists.py                    # 100.000 proyectos
+    python3 benchmark_lists.py --projects 20000 --users 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from models import DatabaseManager, NameDirectory, Project, encode_cursor
+
+# Consulta de listado anterior a NameDirectory
+JOIN_QUERY = """
+    SELECT p.*,
+           u1.first_name as created_by_name, u1.last_name as created_by_lastname,
+           u2.first_name as assigned_to_name, u2.last_name as assigned_to_lastname,
+           d.name as department_name
+    FROM projects p
+    LEFT JOIN users u1 ON p.created_by = u1.id
+    LEFT JOIN users u2 ON p.assigned_to = u2.id
+    LEFT JOIN departments d ON p.department_id = d.id
+    WHERE 1=1
+"""
+
+def seed(db_manager: DatabaseManager, projects: int, users: int):
+    """Usuarios, departamentos y proyectos sintéticos en lotes"""
+    with db_manager.connection() as conn:
+        conn.executemany(
+            "INSERT INTO departments (name, description) VALUES (?, '')",
+            [(f"Departamento {i}",) for i in range(50)]
+        )
+        conn.executemany(
+            "INSERT INTO users (email, password_hash, first_name, last_name) VALUES (?, 'x', ?, ?)",
+            [(f"bench{i}@example.com", f"Nombre{i}", f"Apellido{i}") for i in range(users)]
+        )
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+        department_ids = [row[0] for row in conn.execute("SELECT id FROM departments")]
+        statuses = ('planning', 'active', 'completed', 'cancelled')
+        
+        for start in range(0, projects, 10000):
+            conn.executemany("""
+                INSERT INTO projects (name, description, status, created_by, assigned_to,
+                                      department_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, datetime('2020-01-01', ? || ' minutes'))
+            """, [(f"Proyecto {i}", 'Descripción de prueba', random.choice(statuses),
+                   random.choice(user_ids), random.choice(user_ids + [None]),
+                   random.choice(department_ids), i)
+                  for i in range(start, min(start + 10000, projects))])
+        conn.commit()
+        conn.execute("ANALYZE")
+
+def timed(fn, repeat: int) -> float:
+    """Mediana en ms de ``repeat`` ejecuciones"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def join_page(db_manager: DatabaseManager, status: str = None, offset: int = 0,
+              cursor: tuple = None, per_page: int = 20):
+    query, params = JOIN_QUERY, []
+    if status:
+        query += " AND p.status = ?"
+        params.append(status)
+    if cursor:
+        query += " AND (p.created_at, p.id) < (?, ?)"
+        params.extend(cursor)
+        offset = 0
+    query += " ORDER BY p.created_at DESC, p.id DESC LIMIT ? OFFSET ?"
+    params.extend([per_page + 1, offset])
+    with db_manager.connection() as conn:
+        return [dict(row) for row in conn.execute(query, params)]
+
+def walk(page_fn, pages: int):
+    """Recorre ``pages`` páginas por cursor"""
+    rows = page_fn(None)
+    for _ in range(pages - 1):
+        rows = page_fn(rows[-2])
+
+def run(projects: int, users: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        print(f"⏳ Generando {projects} proyectos y {users} usuarios...")
+        seed(db_manager, projects, users)
+        
+        directory = NameDirectory(db_manager)
+        project_model = Project(db_manager, directory=directory)
+        
+        cases = [
+            ('página 1', lambda: join_page(db_manager),
+             lambda: project_model.get_projects(limit=21)),
+            ('página 1, status=active', lambda: join_page(db_manager, status='active'),
+             lambda: project_model.get_projects(status='active', limit=21)),
+            ('OFFSET 20.000', lambda: join_page(db_manager, offset=20000),
+             lambda: project_model.get_projects(limit=21, offset=20000)),
+            ('50 páginas por cursor',
+             lambda: walk(lambda last: join_page(
+                 db_manager, cursor=(last['created_at'], last['id']) if last else None), 50),
+             lambda: walk(lambda last: project_model.get_projects(
+                 limit=21, cursor=encode_cursor(last) if last else None), 50)),
+        ]
+        
+        # Directorio en frío: primera página tras arrancar o tras invalidar
+        directory.clear()
+        cold = timed(lambda: (directory.clear(), project_model.get_projects(limit=21)), repeat)
+        
+        print(f"\n{'caso':<28}{'JOIN (ms)':>12}{'directorio (ms)':>18}{'ratio':>8}")
+        for name, join_fn, directory_fn in cases:
+            join_ms = timed(join_fn, repeat)
+            directory_ms = timed(directory_fn, repeat)
+            print(f"{name:<28}{join_ms:>12.2f}{directory_ms:>18.2f}{join_ms / directory_ms:>7.1f}x")
+        print(f"{'página 1, directorio frío':<28}{'':>12}{cold:>18.2f}")
+        print(f"\n📇 Directorio: {directory.stats()}")
+        
+        db_manager.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--projects', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    run(args.projects, args.users, args.repeat)
@@ -0,0 +1,329 @@
+"""
+🗃️ EnterprisePro - Caché de Respuestas
+Payloads JSON de los endpoints de lectura, con claves por rol y query
+Invalidación por etiquetas (tablas) cuando los modelos confirman escrituras
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Iterable, Callable, Tuple
+
+class MemoryCacheBackend:
+    """LRU en proceso acotado por número de entradas
+    
+    Cada proceso tiene su propia copia: con varios workers conviene el
+    backend en disco para que la invalidación sea compartida.
+    """
+    
+    name = 'simple'
+    
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: 'OrderedDict[str, Tuple[bytes, float, tuple]]' = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+    
+    def _remove(self, key: str):
+        value, _, tags = self._entries.pop(key)
+        self._bytes -= len(value)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+    
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+    
+    def set(self, key: str, value: bytes, timeout: float, tags: Iterable[str]):
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + timeout, tags)
+            self._bytes += len(value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+    
+    def delete_tags(self, tags: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+        return removed
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'memory_bytes': self._bytes,
+                'evictions': self._evictions
+            }
+
+class DiskCacheBackend:
+    """Caché en un fichero SQLite propio, compartido entre procesos
+    
+    Las etiquetas se guardan en una tabla indexada, así que invalidar una
+    tabla es un único DELETE aunque la caché la usen varios workers.
+    """
+    
+    name = 'filesystem'
+    
+    def __init__(self, cache_dir: str, max_entries: int = 10000):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, 'response_cache.db')
+        self.max_entries = max(1, int(max_entries))
+        self._local = threading.local()
+        self._sets = 0
+        self._evictions = 0
+        
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS cache_tags (
+                tag TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (tag, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_expires ON cache_entries(expires_at);
+        """)
+    
+    def _conn(self) -> sqlite3.Connection:
+        """Una conexión por hilo; el contenido es desechable, así que sin fsync"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")
+            self._local.conn = conn
+        return conn
+    
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+    
+    def set(self, key: str, value: bytes, timeout: float, tags: Iterable[str]):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, sqlite3.Binary(value), time.time() + timeout)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)",
+                [(tag, key) for tag in tags]
+            )
+        
+        self._sets += 1
+        if self._sets % 100 == 0:
+            self._prune()
+    
+    def _prune(self):
+        """Elimina caducadas y, si sobra, las que caducan antes"""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+            excess = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("""
+                    DELETE FROM cache_entries WHERE key IN (
+                        SELECT key FROM cache_entries ORDER BY expires_at LIMIT ?
+                    )
+                """, (excess,))
+                self._evictions += excess
+            conn.execute("DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)")
+    
+    def delete_tags(self, tags: Iterable[str]) -> int:
+        tags = list(tags)
+        marks = ','.join('?' * len(tags))
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute(f"""
+                DELETE FROM cache_entries WHERE key IN (
+                    SELECT key FROM cache_tags WHERE tag IN ({marks})
+                )
+            """, tags).rowcount
+            conn.execute(f"DELETE FROM cache_tags WHERE tag IN ({marks})", tags)
+        return removed
+    
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache_entries")
+            conn.execute("DELETE FROM cache_tags")
+    
+    def stats(self) -> Dict[str, Any]:
+        entries, size = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache_entries"
+        ).fetchone()
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'disk_bytes': size,
+            'evictions': self._evictions,
+            'path': self.path
+        }
+
+class NullCacheBackend:
+    """Caché desactivada: nunca guarda nada"""
+    
+    name = 'null'
+    
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+    
+    def set(self, key: str, value: bytes, timeout: float, tags: Iterable[str]):
+        pass
+    
+    def delete_tags(self, tags: Iterable[str]) -> int:
+        return 0
+    
+    def clear(self):
+        pass
+    
+    def stats(self) -> Dict[str, Any]:
+        return {'entries': 0}
+
+class ResponseCache:
+    """Caché de payloads JSON con claves por rol/query y etiquetas por tabla
+    
+    Los valores se guardan serializados: el tamaño medido es el real y
+    quien lee una entrada nunca puede modificar la copia cacheada.
+    
+    Una generación por etiqueta (y, si se pasa ``versions``, los contadores
+    de versión por tabla compartidos entre workers) detecta las escrituras
+    ocurridas mientras ``loader`` leía: ese payload se devuelve pero no se
+    guarda.
+    """
+    
+    def __init__(self, backend, default_timeout: float = 300,
+                 versions: Callable[[tuple], tuple] = None):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        self.versions = versions
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Serializa comprobar-y-guardar frente a invalidate()
+        self._write_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'stale_skips': 0}
+    
+    @staticmethod
+    def make_key(endpoint: str, role: str, args: Iterable[Tuple[str, str]] = ()) -> str:
+        """Clave estable: mismo endpoint, rol y parámetros (en cualquier orden)"""
+        query = '&'.join(f"{name}={value}" for name, value in sorted(args))
+        return hashlib.sha256(f"{endpoint}|{role}|{query}".encode('utf-8')).hexdigest()
+    
+    def get_or_set(self, key: str, loader: Callable[[], Any], tags: Iterable[str],
+                   timeout: float = None) -> Tuple[Any, bool]:
+        """Devuelve (payload, hit); si falta, llama a ``loader`` y lo guarda"""
+        value = self.backend.get(key)
+        if value is not None:
+            with self._lock:
+                self._stats['hits'] += 1
+            return json.loads(value), True
+        
+        tags = tuple(tags)
+        with self._lock:
+            self._stats['misses'] += 1
+        before = self._snapshot(tags)
+        payload = loader()
+        value = json.dumps(payload, default=str).encode('utf-8')
+        
+        with self._write_lock:
+            # Si alguna tabla cambió mientras se leía, no se guarda una copia quizá vieja
+            fresh = self._snapshot(tags) == before
+            if fresh:
+                self.backend.set(key, value, self.default_timeout if timeout is None else timeout, tags)
+        if not fresh:
+            with self._lock:
+                self._stats['stale_skips'] += 1
+        return payload, False
+    
+    def _snapshot(self, tags: tuple) -> tuple:
+        """Generaciones locales y versiones compartidas de ``tags``"""
+        with self._lock:
+            generations = tuple(self._generations.get(tag, 0) for tag in tags)
+        return generations, self.versions(tags) if self.versions else None
+    
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Elimina todas las entradas etiquetadas con alguna de ``tags``"""
+        tags = tuple(tags)
+        with self._write_lock:
+            with self._lock:
+                for tag in tags:
+                    self._generations[tag] = self._generations.get(tag, 0) + 1
+            removed = self.backend.delete_tags(tags)
+        with self._lock:
+            self._stats['invalidations'] += removed
+        return removed
+    
+    def clear(self):
+        self.backend.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Ratio de aciertos y ocupación del backend"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['backend'] = self.backend.name
+        stats['default_timeout'] = self.default_timeout
+        stats.update(self.backend.stats())
+        return stats
+
+CACHE_BACKENDS = {
+    'simple': lambda options: MemoryCacheBackend(options.get('max_entries', 1000)),
+    'filesystem': lambda options: DiskCacheBackend(options['cache_dir'], options.get('max_entries', 10000)),
+    'null': lambda options: NullCacheBackend()
+}
+
+def create_cache(cache_type: str = 'simple', default_timeout: float = 300,
+                 versions: Callable[[tuple], tuple] = None, **options) -> ResponseCache:
+    """Construye la caché según CACHE_TYPE ('simple', 'filesystem' o 'null')"""
+    try:
+        factory = CACHE_BACKENDS[cache_type]
+    except KeyError:
+        raise ValueError(
+            f"CACHE_TYPE desconocido '{cache_type}'. Disponibles: {', '.join(sorted(CACHE_BACKENDS))}"
+        )
+    return ResponseCache(factory(options), default_timeout, versions)
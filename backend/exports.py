@@ -0,0 +1,65 @@
+"""
+📤 EnterprisePro - Exportación de Datos
+Codificadores en streaming (CSV, NDJSON y gzip) sobre DatabaseManager.stream_query
+La memoria usada depende del tamaño de lote, no del número de filas
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Iterator, Iterable
+
+def iter_csv(columns: tuple, batches: Iterator) -> Iterator[bytes]:
+    """Cabecera y un bloque de bytes por lote de filas"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    
+    # Cabecera sola si no hubo filas
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def iter_ndjson(columns: tuple, batches: Iterator) -> Iterator[bytes]:
+    """Un objeto JSON por línea; un bloque de bytes por lote"""
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+def iter_gzip(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Comprime en streaming (formato gzip) sin acumular la salida"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson')
+}
+
+def export_stream(batches: Iterator, fmt: str = 'csv', gzip: bool = False) -> tuple:
+    """(generador de bytes, mimetype, extensión) para el formato pedido
+    
+    La consulta se ejecuta aquí (primer ``next``): los errores y la espera
+    del pool ocurren antes de empezar a enviar la respuesta.
+    """
+    try:
+        encoder, mimetype = EXPORT_FORMATS[fmt]
+    except KeyError:
+        raise ValueError(f"Formato no soportado: {fmt}. Usa {', '.join(EXPORT_FORMATS)}")
+    
+    chunks = encoder(next(batches), batches)
+    if gzip:
+        return iter_gzip(chunks), 'application/gzip', f"{fmt}.gz"
+    return chunks, mimetype, fmt
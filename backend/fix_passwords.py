@@ -3,17 +3,8 @@
 Fix passwords in database
 """
 import sqlite3
-import hashlib
-import secrets
 
-def hash_password(password):
-    """Hash seguro de contraseña usando PBKDF2"""
-    salt = secrets.token_hex(32)
-    pwdhash = hashlib.pbkdf2_hmac('sha256', 
-                                 password.encode('utf-8'), 
-                                 salt.encode('utf-8'), 
-                                 100000)
-    return f"{salt}${pwdhash.hex()}"
+from passwords import hash_password
 
 def fix_passwords():
     conn = sqlite3.connect("enterprise.db")
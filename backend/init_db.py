@@ -6,6 +6,8 @@ EnterprisePro - Inicializador de Base de Datos Simple
 import sqlite3
 import os
 
+from models import apply_migrations
+
 def init_database():
     """Inicializar base de datos con esquemas y datos"""
     try:
@@ -17,8 +19,12 @@ def init_database():
         # Eliminar todas las tablas existentes primero
         cursor = conn.cursor()
         
-        # Obtener todos los nombres de las tablas
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        # Obtener todos los nombres de las tablas; las virtuales (FTS5) primero,
+        # porque al eliminarlas se eliminan también sus tablas internas (*_data, *_idx...)
+        cursor.execute("""
+            SELECT name FROM sqlite_master WHERE type='table'
+            ORDER BY sql LIKE 'CREATE VIRTUAL TABLE%' DESC
+        """)
         tables = cursor.fetchall()
         
                 # Drop all tables except sqlite_sequence
@@ -43,6 +49,10 @@ def init_database():
         conn.executescript(data_sql)
         print("✅ Datos de ejemplo insertados")
         
+        # Aplicar migraciones posteriores al esquema base
+        for version in apply_migrations(conn, '../database/migrations'):
+            print(f"🧱 Migración aplicada: {version}")
+        
         # Confirmar y cerrar
         conn.commit()
         conn.close()
@@ -7,18 +7,451 @@ Modelos optimizados para rendimiento empresarial
 
 import sqlite3
 import os
-from datetime import datetime, date
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
 import json
+import base64
+import html
+import math
+import multiprocessing
+import secrets
 # import bcrypt  # Se usa el hash personalizado en auth.py
 from typing import Optional, List, Dict, Any
-import hashlib
-import secrets
+import re
+
+import passwords
+
+# Perfiles de PRAGMA aplicados una vez por conexión física del pool.
+# 'production' evita que las escrituras (p. ej. auditoría) bloqueen a los lectores.
+PRAGMA_PROFILES = {
+    'production': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,   # 256MB
+        'cache_size': -65536,     # 64MB (negativo = KiB)
+        'temp_store': 'MEMORY'
+    },
+    'strict': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'temp_store': 'MEMORY'
+    },
+    'legacy': {}
+}
+
+_PRAGMA_NAMES = {'busy_timeout', 'journal_mode', 'synchronous', 'mmap_size',
+                 'cache_size', 'temp_store', 'wal_autocheckpoint', 'journal_size_limit'}
+_PRAGMA_VALUE = re.compile(r'^-?\d+$|^[A-Za-z_]+$')
+
+def resolve_pragmas(profile: str = 'production', overrides: Dict = None) -> Dict[str, Any]:
+    """Combina un perfil de PRAGMA con overrides y valida nombres y valores"""
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f"Perfil de PRAGMA desconocido: {profile}")
+    
+    pragmas = dict(PRAGMA_PROFILES[profile])
+    pragmas.update(overrides or {})
+    
+    for name, value in pragmas.items():
+        if name not in _PRAGMA_NAMES:
+            raise ValueError(f"PRAGMA no soportado: {name}")
+        if not _PRAGMA_VALUE.match(str(value)):
+            raise ValueError(f"Valor inválido para PRAGMA {name}: {value}")
+    
+    return pragmas
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'database', 'migrations')
+
+def apply_migrations(conn, migrations_dir: str = MIGRATIONS_DIR) -> List[str]:
+    """Aplica en orden los scripts de database/migrations aún no registrados
+    
+    Cada script y su fila en ``schema_migrations`` van en una sola
+    transacción (el DDL de SQLite es transaccional): si una sentencia falla
+    no queda nada aplicado a medias y el script se reintenta entero en el
+    siguiente arranque. Así un script no necesita ser idempotente (p. ej.
+    ``ALTER TABLE ... ADD COLUMN``); ``schema_migrations`` garantiza que se
+    ejecuta una sola vez por base de datos. Los scripts no deben abrir ni
+    cerrar transacciones propias.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(100) PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    applied = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+    
+    if not os.path.isdir(migrations_dir):
+        return []
+    
+    newly_applied = []
+    for filename in sorted(os.listdir(migrations_dir)):
+        version = filename[:-4]
+        if not filename.endswith('.sql') or version in applied:
+            continue
+        
+        with open(os.path.join(migrations_dir, filename), 'r', encoding='utf-8') as f:
+            script = f.read()
+        # executescript confirma lo pendiente antes de empezar; BEGIN deja
+        # abierta la transacción del script hasta el INSERT de su versión
+        try:
+            conn.executescript(f"BEGIN;\n{script}\n;")
+            conn.execute("INSERT INTO schema_migrations (version) VALUES (?)", (version,))
+            conn.commit()
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        newly_applied.append(version)
+    
+    return newly_applied
+
+def encode_cursor(row: Dict) -> str:
+    """Cursor opaco de paginación a partir de (created_at, id) de la última fila"""
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decodifica un cursor de encode_cursor(); ValueError si no es válido"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
+    if not isinstance(row_id, int):
+        raise ValueError("Cursor de paginación inválido")
+    return created_at, row_id
+
+# Recalcula el resumen materializado del dashboard (ver migración 003)
+DASHBOARD_SUMMARY_REBUILD_SQL = """
+    BEGIN;
+    DELETE FROM dashboard_department_counts;
+    INSERT INTO dashboard_department_counts (department_id, active_employees)
+    SELECT department_id, COUNT(*) FROM employees
+    WHERE status = 'active' AND department_id IS NOT NULL
+    GROUP BY department_id;
+    
+    DELETE FROM dashboard_task_completions;
+    INSERT INTO dashboard_task_completions (day, completed)
+    SELECT date(completed_at), COUNT(*) FROM tasks
+    WHERE status = 'completed' AND date(completed_at) IS NOT NULL
+    GROUP BY date(completed_at);
+    
+    INSERT OR REPLACE INTO dashboard_summary (
+        id, total_projects, active_projects, completed_projects, progress_sum, progress_count,
+        total_employees, performance_sum, performance_count, active_departments,
+        latest_financial_date, updated_at
+    )
+    SELECT 1,
+        (SELECT COUNT(*) FROM projects),
+        (SELECT COUNT(*) FROM projects WHERE status = 'active'),
+        (SELECT COUNT(*) FROM projects WHERE status = 'completed'),
+        (SELECT COALESCE(SUM(progress), 0) FROM projects),
+        (SELECT COUNT(progress) FROM projects),
+        (SELECT COUNT(*) FROM employees WHERE status = 'active'),
+        (SELECT COALESCE(SUM(performance_score), 0) FROM employees WHERE status = 'active'),
+        (SELECT COUNT(performance_score) FROM employees WHERE status = 'active'),
+        (SELECT COUNT(*) FROM dashboard_department_counts WHERE active_employees > 0),
+        (SELECT MAX(recorded_date) FROM company_metrics WHERE metric_type = 'financial'),
+        CURRENT_TIMESTAMP;
+    COMMIT;
+"""
+
+class PoolTimeoutError(Exception):
+    """No hay conexiones disponibles en el pool dentro del tiempo de espera"""
+
+class _PoolEntry:
+    """Conexión física del pool con metadatos de uso"""
+    
+    __slots__ = ('conn', 'created_at', 'last_used', 'depth')
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.depth = 0
+
+class PooledConnection:
+    """Proxy de conexión: close() devuelve la conexión al pool en lugar de cerrarla"""
+    
+    def __init__(self, pool: 'ConnectionPool', entry: _PoolEntry):
+        self._pool = pool
+        self._entry = entry
+        self._released = False
+    
+    def __getattr__(self, name):
+        return getattr(self._entry.conn, name)
+    
+    def close(self):
+        """Libera la conexión al pool (idempotente)"""
+        if not self._released:
+            self._released = True
+            self._pool.release(self._entry)
+
+class ConnectionPool:
+    """Pool acotado de conexiones SQLite con checkout por hilo y health checks
+    
+    - ``pool_size`` conexiones se mantienen abiertas y se reutilizan.
+    - Hasta ``max_overflow`` conexiones adicionales se abren bajo picos y se
+      cierran al liberarse.
+    - Si no hay hueco en ``timeout`` segundos se lanza ``PoolTimeoutError``.
+    - Un mismo hilo que vuelve a pedir conexión recibe la que ya tiene, de modo
+      que las llamadas anidadas (modelo + auditoría) no consumen dos huecos.
+    - Con ``bind=False`` la conexión no se asocia al hilo: la usan los
+      generadores, que pueden avanzar y cerrarse desde otro hilo.
+    """
+    
+    def __init__(self, db_path: str, pool_size: int = 10, max_overflow: int = 20,
+                 timeout: float = 30, recycle: float = 3600, ping_interval: float = 30,
+                 pragmas: Dict[str, Any] = None):
+        self.db_path = db_path
+        self.pragmas = pragmas or {}
+        self.pool_size = max(1, int(pool_size))
+        self.max_overflow = max(0, int(max_overflow))
+        self.timeout = float(timeout)
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        
+        self._idle = queue.LifoQueue(maxsize=self.pool_size)
+        self._slots = threading.BoundedSemaphore(self.pool_size + self.max_overflow)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'created': 0, 'discarded': 0, 'checkouts': 0,
+                       'reused': 0, 'timeouts': 0, 'in_use': 0}
+    
+    def _connect(self) -> _PoolEntry:
+        """Abre una conexión física nueva con la configuración base"""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
+        conn.execute("PRAGMA foreign_keys = ON")  # Habilita claves foráneas
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._lock:
+            self._stats['created'] += 1
+        return _PoolEntry(conn)
+    
+    def _discard(self, entry: _PoolEntry):
+        """Cierra definitivamente una conexión física"""
+        try:
+            entry.conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._stats['discarded'] += 1
+    
+    def _is_healthy(self, entry: _PoolEntry) -> bool:
+        """Descarta conexiones caducadas y hace ping a las que llevan tiempo ociosas"""
+        now = time.monotonic()
+        if self.recycle and now - entry.created_at > self.recycle:
+            return False
+        if now - entry.last_used > self.ping_interval:
+            try:
+                entry.conn.execute("SELECT 1").fetchone()
+            except sqlite3.Error:
+                return False
+        return True
+    
+    def _checkout_idle(self) -> Optional[_PoolEntry]:
+        """Obtiene una conexión ociosa sana, si existe"""
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if self._is_healthy(entry):
+                return entry
+            self._discard(entry)
+    
+    def acquire(self, bind: bool = True) -> _PoolEntry:
+        """Reserva una conexión para el hilo actual (o suelta, con bind=False)"""
+        entry = getattr(self._local, 'entry', None) if bind else None
+        if entry is not None:
+            entry.depth += 1
+            return entry
+        
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeoutError(
+                f"Sin conexiones disponibles tras {self.timeout}s "
+                f"(pool_size={self.pool_size}, max_overflow={self.max_overflow})"
+            )
+        
+        try:
+            entry = self._checkout_idle()
+            reused = entry is not None
+            if entry is None:
+                entry = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+        
+        entry.depth = 1
+        if bind:
+            self._local.entry = entry
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            if reused:
+                self._stats['reused'] += 1
+        return entry
+    
+    def release(self, entry: _PoolEntry):
+        """Devuelve la conexión al pool cuando el hilo termina de usarla"""
+        entry.depth -= 1
+        if entry.depth > 0:
+            return
+        
+        if getattr(self._local, 'entry', None) is entry:
+            self._local.entry = None
+        try:
+            # Nunca devolver al pool una transacción a medias
+            if entry.conn.in_transaction:
+                entry.conn.rollback()
+            entry.last_used = time.monotonic()
+            self._idle.put_nowait(entry)
+        except (queue.Full, sqlite3.Error):
+            self._discard(entry)
+        finally:
+            with self._lock:
+                self._stats['in_use'] -= 1
+            self._slots.release()
+    
+    def dispose(self):
+        """Cierra todas las conexiones ociosas"""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+    
+    def status(self) -> Dict[str, Any]:
+        """Estado y contadores del pool"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'pool_size': self.pool_size,
+            'max_overflow': self.max_overflow,
+            'idle': self._idle.qsize()
+        })
+        return stats
+
+class TableVersions:
+    """Contadores de versión y fecha de modificación por tabla
+    
+    ``DatabaseManager.notify_write`` los incrementa tras cada escritura de los
+    modelos, así que los validadores HTTP (ETag / Last-Modified) se calculan
+    sin consultar SQLite. Los contadores viven en el proceso: el ``epoch``
+    aleatorio hace que un reinicio nunca reutilice ETags antiguos.
+    """
+    
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self._started = int(time.time())
+        self._versions: Dict[str, int] = {}
+        self._modified: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def bump(self, tables) -> None:
+        """Nueva versión para cada tabla; Last-Modified pasa a ser el segundo actual
+        
+        Nunca se adelanta al reloj (Last-Modified no puede ser posterior a
+        Date): dos escrituras en el mismo segundo comparten Last-Modified y
+        las distingue el ETag, que depende de la versión.
+        """
+        now = int(time.time())
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self._modified[table] = max(now, self._modified.get(table, self._started))
+    
+    def snapshot(self, tables) -> tuple:
+        """(versiones, último Last-Modified en epoch) para un conjunto de tablas"""
+        with self._lock:
+            versions = tuple(self._versions.get(table, 0) for table in tables)
+            modified = max((self._modified.get(table, self._started) for table in tables),
+                           default=self._started)
+        return versions, modified
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._versions)
+
+class SharedTableVersions:
+    """TableVersions en memoria compartida entre los workers del servidor
+    
+    Se crea en el proceso maestro antes de fork() con una ranura por tabla
+    conocida (las que no existían caen en una ranura común), así que todos
+    los workers ven los mismos contadores y el mismo ``epoch``: un ETag
+    emitido por un worker sigue siendo válido en otro, y una escritura en
+    cualquiera de ellos lo invalida en todos sin consultar SQLite.
+    """
+    
+    OTHER = '*'
+    
+    def __init__(self, tables):
+        self.epoch = secrets.token_hex(4)
+        self._started = int(time.time())
+        self.tables = [table for table in dict.fromkeys(tables) if table != self.OTHER] + [self.OTHER]
+        self._slots = {table: index for index, table in enumerate(self.tables)}
+        context = multiprocessing.get_context('fork')
+        # [versión, Last-Modified] por ranura
+        self._values = context.RawArray('q', 2 * len(self.tables))
+        self._lock = context.Lock()
+    
+    def slot(self, table: str) -> int:
+        return self._slots.get(table, self._slots[self.OTHER])
+    
+    def bump(self, tables) -> List[int]:
+        """Igual que TableVersions.bump; devuelve la versión nueva de cada tabla"""
+        now = int(time.time())
+        numbers = []
+        with self._lock:
+            for table in tables:
+                index = 2 * self.slot(table)
+                self._values[index] += 1
+                self._values[index + 1] = max(now, self._values[index + 1] or self._started)
+                numbers.append(self._values[index])
+        return numbers
+    
+    def snapshot(self, tables) -> tuple:
+        """(versiones, último Last-Modified en epoch) para un conjunto de tablas"""
+        with self._lock:
+            slots = [2 * self.slot(table) for table in tables]
+            versions = tuple(self._values[index] for index in slots)
+            modified = max((self._values[index + 1] or self._started for index in slots),
+                           default=self._started)
+        return versions, modified
+    
+    def numbers(self) -> List[int]:
+        """Versión de todas las ranuras, en el orden de ``tables``"""
+        with self._lock:
+            return self._values[0::2]
+    
+    def stats(self) -> Dict[str, int]:
+        return {table: version for table, version in zip(self.tables, self.numbers()) if version}
 
 class DatabaseManager:
     """Gestor principal de base de datos con operaciones optimizadas"""
     
-    def __init__(self, db_path: str = "enterprise.db"):
+    def __init__(self, db_path: str = "enterprise.db", pool_size: int = 10,
+                 max_overflow: int = 20, pool_timeout: float = 30,
+                 pragma_profile: str = 'production', pragmas: Dict = None):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, pool_size=pool_size,
+                                   max_overflow=max_overflow, timeout=pool_timeout,
+                                   pragmas=resolve_pragmas(pragma_profile, pragmas))
+        self._maintenance_thread = None
+        self._maintenance_stop = threading.Event()
+        self._maintenance_tasks = []
+        self._write_listeners = []
+        self.table_versions = TableVersions()
+        self._seen_versions = None
+        self._seen_lock = threading.Lock()
         self.init_database()
     
     def init_database(self):
@@ -26,13 +459,174 @@ class DatabaseManager:
         if not os.path.exists(self.db_path):
             self.create_tables()
             self.insert_sample_data()
+        self.migrate()
     
-    def get_connection(self):
-        """Obtiene conexión a la base de datos con configuración optimizada"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
-        conn.execute("PRAGMA foreign_keys = ON")  # Habilita claves foráneas
-        return conn
+    def migrate(self) -> List[str]:
+        """Aplica las migraciones pendientes de database/migrations"""
+        with self.connection() as conn:
+            applied = apply_migrations(conn)
+        for version in applied:
+            print(f"🧱 Migración aplicada: {version}")
+        return applied
+    
+    def get_connection(self, bind: bool = True) -> PooledConnection:
+        """Obtiene conexión del pool; close() la devuelve al pool"""
+        return PooledConnection(self.pool, self.pool.acquire(bind))
+    
+    @contextmanager
+    def connection(self, bind: bool = True):
+        """Context manager que toma una conexión del pool y la libera al salir
+        
+        Las transacciones no confirmadas se descartan al devolverla al pool.
+        Con ``bind=False`` la conexión no se comparte con el hilo actual.
+        """
+        conn = self.get_connection(bind)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def stream_query(self, query: str, params=(), batch_size: int = 500):
+        """Generador para exportaciones grandes con memoria constante
+        
+        Primero produce la tupla de nombres de columna y después lotes de
+        ``batch_size`` filas leídos con ``fetchmany``. La conexión del pool se
+        mantiene mientras se consume y se libera al agotar o cerrar el generador.
+        No queda asociada al hilo: el servidor puede avanzar y cerrar el
+        generador desde un hilo distinto del que ejecutó la vista.
+        """
+        with self.connection(bind=False) as conn:
+            cursor = conn.execute(query, params)
+            yield tuple(column[0] for column in cursor.description)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+    
+    def add_write_listener(self, callback):
+        """Registra un callback(tables) que se invoca tras cada escritura confirmada"""
+        self._write_listeners.append(callback)
+    
+    def notify_write(self, *tables: str):
+        """Los modelos lo llaman tras confirmar escrituras en ``tables``"""
+        numbers = self.table_versions.bump(tables)
+        if self._seen_versions is not None:
+            # Sólo se da por vista la versión propia si nadie más escribió entretanto
+            with self._seen_lock:
+                for table, number in zip(tables, numbers):
+                    slot = self.table_versions.slot(table)
+                    if self._seen_versions[slot] == number - 1:
+                        self._seen_versions[slot] = number
+        for callback in self._write_listeners:
+            callback(tables)
+    
+    def share_table_versions(self):
+        """Pasa los contadores de versión a memoria compartida (antes de fork)
+        
+        Cada worker llama después a ``sync_writes`` para enterarse de las
+        escrituras de los demás procesos y avisar a sus propios listeners
+        (caché de respuestas, directorio de nombres, canal SSE).
+        """
+        with self.connection() as conn:
+            tables = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"
+            )]
+        self.table_versions = SharedTableVersions(tables)
+        self._seen_versions = self.table_versions.numbers()
+    
+    def sync_writes(self) -> tuple:
+        """Notifica a los listeners las tablas que otros procesos han modificado
+        
+        Sin versiones compartidas no hace nada. El coste es leer un contador
+        por tabla, así que se puede llamar al principio de cada petición.
+        """
+        if self._seen_versions is None:
+            return ()
+        
+        numbers = self.table_versions.numbers()
+        with self._seen_lock:
+            changed = [slot for slot, number in enumerate(numbers) if number != self._seen_versions[slot]]
+            if not changed:
+                return ()
+            for slot in changed:
+                self._seen_versions[slot] = numbers[slot]
+        
+        tables = tuple(self.table_versions.tables[slot] for slot in changed)
+        for callback in self._write_listeners:
+            callback(tables)
+        return tables
+    
+    def pool_status(self) -> Dict[str, Any]:
+        """Estado del pool de conexiones"""
+        return self.pool.status()
+    
+    def effective_pragmas(self) -> Dict[str, Any]:
+        """Lee de SQLite los valores efectivos de los PRAGMA configurados"""
+        labels = {
+            'synchronous': {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'},
+            'temp_store': {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'}
+        }
+        names = ['foreign_keys'] + list(self.pool.pragmas)
+        
+        with self.connection() as conn:
+            values = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in names}
+        
+        for name, mapping in labels.items():
+            if name in values:
+                values[name] = mapping.get(values[name], values[name])
+        return values
+    
+    def run_maintenance(self, checkpoint_mode: str = 'PASSIVE') -> Dict[str, Any]:
+        """Checkpoint del WAL y PRAGMA optimize"""
+        with self.connection() as conn:
+            busy, wal_pages, checkpointed = conn.execute(
+                f"PRAGMA wal_checkpoint({checkpoint_mode})"
+            ).fetchone()
+            conn.execute("PRAGMA optimize")
+        
+        result = {'busy': busy, 'wal_pages': wal_pages, 'checkpointed': checkpointed}
+        for name, task in self._maintenance_tasks:
+            result[name] = task()
+        return result
+    
+    def add_maintenance_task(self, name: str, task):
+        """Registra una tarea periódica adicional (p. ej. purga de datos caducados)"""
+        self._maintenance_tasks.append((name, task))
+    
+    def start_maintenance(self, interval: float = 300):
+        """Lanza un hilo que ejecuta run_maintenance() cada ``interval`` segundos"""
+        if self._maintenance_thread or not interval or interval <= 0:
+            return
+        
+        def loop():
+            while not self._maintenance_stop.wait(interval):
+                try:
+                    self.run_maintenance()
+                except Exception as e:
+                    print(f"⚠️ Error en mantenimiento de base de datos: {e}")
+        
+        self._maintenance_stop.clear()
+        self._maintenance_thread = threading.Thread(
+            target=loop, name='db-maintenance', daemon=True
+        )
+        self._maintenance_thread.start()
+    
+    def stop_maintenance(self):
+        """Detiene el hilo de mantenimiento"""
+        if self._maintenance_thread:
+            self._maintenance_stop.set()
+            self._maintenance_thread.join(timeout=5)
+            self._maintenance_thread = None
+    
+    def close(self):
+        """Detiene el mantenimiento, trunca el WAL y cierra las conexiones ociosas"""
+        self.stop_maintenance()
+        try:
+            self.run_maintenance('TRUNCATE')
+        except (sqlite3.Error, PoolTimeoutError):
+            pass
+        self.pool.dispose()
     
     def create_tables(self):
         """Crea todas las tablas del esquema"""
@@ -42,10 +636,9 @@ class DatabaseManager:
             with open(schema_path, 'r', encoding='utf-8') as f:
                 schema_sql = f.read()
             
-            conn = self.get_connection()
-            conn.executescript(schema_sql)
-            conn.commit()
-            conn.close()
+            with self.connection() as conn:
+                conn.executescript(schema_sql)
+                conn.commit()
             print("✅ Base de datos creada exitosamente")
         else:
             print("❌ No se encontró el archivo schema.sql")
@@ -58,103 +651,387 @@ class DatabaseManager:
             with open(sample_path, 'r', encoding='utf-8') as f:
                 sample_sql = f.read()
             
-            conn = self.get_connection()
-            conn.executescript(sample_sql)
-            conn.commit()
-            conn.close()
+            with self.connection() as conn:
+                conn.executescript(sample_sql)
+                conn.commit()
             print("✅ Datos de ejemplo insertados exitosamente")
 
+class IdentityCache:
+    """Caché TTL en proceso de identidades (id → email, rol, estado)
+    
+    Evita ir a la base de datos en cada refresh de token; User invalida la
+    entrada cuando el usuario cambia y cualquier escritura en ``users``
+    (también la de otro worker, vía ``sync_writes``) la vacía entera.
+    """
+    
+    def __init__(self, loader, ttl: float = 300, max_size: int = 10000):
+        self._loader = loader
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: Dict[int, tuple] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+    
+    def get(self, user_id: int) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+            generation = self._generation
+        
+        identity = self._loader(user_id)
+        with self._lock:
+            # Si alguien invalidó mientras se leía, no se guarda una copia quizá vieja
+            if generation == self._generation:
+                if len(self._entries) >= self.max_size:
+                    self._entries.clear()
+                self._entries[user_id] = (now + self.ttl, identity)
+        return identity
+    
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generation += 1
+            self._stats['invalidations'] += 1
+    
+    def on_write(self, tables):
+        """Listener de DatabaseManager.notify_write"""
+        if 'users' in tables:
+            self.clear()
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._stats['invalidations'] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'size': len(self._entries)}
+
+class NameDirectory:
+    """Directorio en proceso de nombres para mostrar (usuarios y departamentos)
+    
+    Los listados leen una sola tabla y completan los nombres aquí en una
+    pasada por página: los usuarios que faltan se cargan con una consulta
+    ``IN`` y los departamentos, que son pocos, se cargan enteros la primera
+    vez. User invalida por id al modificar un usuario; una escritura en
+    ``users`` o ``departments`` (también de otro worker, vía ``sync_writes``)
+    descarta el mapa correspondiente.
+    """
+    
+    # Límite de variables por consulta en SQLite antiguos
+    MAX_VARIABLES = 900
+    
+    def __init__(self, db_manager: 'DatabaseManager', max_users: int = 100000):
+        self.db = db_manager
+        self.max_users = max_users
+        self._users: Dict[int, tuple] = {}
+        self._departments: Optional[Dict[int, str]] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'loads': 0, 'invalidations': 0}
+    
+    def users(self, user_ids) -> Dict[int, tuple]:
+        """{id: (first_name, last_name)} para los ids dados (None se ignora)"""
+        wanted = {user_id for user_id in user_ids if user_id is not None}
+        with self._lock:
+            found = {user_id: self._users[user_id] for user_id in wanted if user_id in self._users}
+            missing = list(wanted - found.keys())
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += len(missing)
+            generation = self._generation
+        
+        if not missing:
+            return found
+        
+        loaded = {}
+        with self.db.connection() as conn:
+            for start in range(0, len(missing), self.MAX_VARIABLES):
+                chunk = missing[start:start + self.MAX_VARIABLES]
+                for row in conn.execute(
+                    f"SELECT id, first_name, last_name FROM users WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ):
+                    loaded[row['id']] = (row['first_name'], row['last_name'])
+        
+        with self._lock:
+            self._stats['loads'] += 1
+            # Si alguien invalidó mientras se leía, no se guarda una copia quizá vieja
+            if generation == self._generation:
+                if len(self._users) + len(loaded) > self.max_users:
+                    self._users.clear()
+                self._users.update(loaded)
+        found.update(loaded)
+        return found
+    
+    def departments(self) -> Dict[int, str]:
+        """{id: nombre} de todos los departamentos"""
+        with self._lock:
+            departments = self._departments
+            generation = self._generation
+        if departments is not None:
+            return departments
+        
+        with self.db.connection() as conn:
+            departments = {row['id']: row['name'] for row in conn.execute("SELECT id, name FROM departments")}
+        with self._lock:
+            self._stats['loads'] += 1
+            # Igual que users(): una invalidación durante la lectura descarta el mapa leído
+            if generation == self._generation:
+                self._departments = departments
+        return departments
+    
+    def invalidate_user(self, user_id: int):
+        """Listener de User: el usuario cambió"""
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._generation += 1
+            self._stats['invalidations'] += 1
+    
+    def on_write(self, tables):
+        """Listener de DatabaseManager.notify_write"""
+        if 'users' in tables:
+            with self._lock:
+                self._users.clear()
+                self._generation += 1
+                self._stats['invalidations'] += 1
+        if 'departments' in tables:
+            with self._lock:
+                self._departments = None
+                self._generation += 1
+                self._stats['invalidations'] += 1
+    
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._departments = None
+            self._generation += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'users': len(self._users),
+                    'departments': len(self._departments or ())}
+
 class User:
     """Modelo para gestión de usuarios"""
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, identity_ttl: float = 300,
+                 directory: NameDirectory = None):
         self.db = db_manager
+        self._change_listeners = []
+        self.identity_cache = IdentityCache(self._load_identity, ttl=identity_ttl)
+        self.add_change_listener(self.identity_cache.invalidate)
+        self.directory = directory or NameDirectory(db_manager)
+        self.add_change_listener(self.directory.invalidate_user)
+    
+    def add_change_listener(self, callback):
+        """Registra un callback(user_id) que se invoca tras crear o modificar un usuario"""
+        self._change_listeners.append(callback)
+    
+    def _notify_change(self, *user_ids: int):
+        for user_id in user_ids:
+            for callback in self._change_listeners:
+                callback(user_id)
+        self.db.notify_write('users')
+    
+    def _load_identity(self, user_id: int) -> Optional[Dict]:
+        """Datos mínimos para emitir tokens (una búsqueda por PK)"""
+        with self.db.connection() as conn:
+            row = conn.execute(
+                "SELECT id, email, role FROM users WHERE id = ? AND is_active = 1",
+                (user_id,)
+            ).fetchone()
+        return dict(row) if row else None
+    
+    def get_identity(self, user_id: int) -> Optional[Dict]:
+        """Identidad activa del usuario desde la caché"""
+        return self.identity_cache.get(user_id)
+    
+    def active_roles(self, user_ids) -> Dict[int, str]:
+        """{id: rol} de los usuarios activos entre ``user_ids`` (sin caché)"""
+        user_ids = list(user_ids)
+        roles = {}
+        with self.db.connection() as conn:
+            for start in range(0, len(user_ids), NameDirectory.MAX_VARIABLES):
+                chunk = user_ids[start:start + NameDirectory.MAX_VARIABLES]
+                roles.update(conn.execute(f"""
+                    SELECT id, role FROM users
+                    WHERE id IN ({','.join('?' * len(chunk))}) AND is_active = 1
+                """, chunk).fetchall())
+        return roles
     
     def _hash_password(self, password: str) -> str:
-        """Hash seguro de contraseña usando PBKDF2"""
-        salt = secrets.token_hex(32)
-        pwdhash = hashlib.pbkdf2_hmac('sha256', 
-                                     password.encode('utf-8'), 
-                                     salt.encode('utf-8'), 
-                                     100000)
-        return f"{salt}${pwdhash.hex()}"
+        """Hash seguro de contraseña usando PBKDF2 (pool de procesos)"""
+        return passwords.hash_password(password)
     
     def _verify_password(self, password: str, password_hash: str) -> bool:
-        """Verifica contraseña contra hash"""
-        try:
-            salt, stored_hash = password_hash.split('$')
-            pwdhash = hashlib.pbkdf2_hmac('sha256',
-                                         password.encode('utf-8'),
-                                         salt.encode('utf-8'),
-                                         100000)
-            return pwdhash.hex() == stored_hash
-        except:
-            return False
+        """Verifica contraseña contra hash (pool de procesos)"""
+        return passwords.verify_password(password, password_hash)
     
     def create_user(self, email: str, password: str, first_name: str, 
                    last_name: str, role: str = 'employee', **kwargs) -> Optional[int]:
         """Crea un nuevo usuario con contraseña encriptada"""
         password_hash = self._hash_password(password)
         
-        conn = self.db.get_connection()
-        try:
-            cursor = conn.execute("""
-                INSERT INTO users (email, password_hash, first_name, last_name, role, 
-                                 phone, address, profile_image)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (email, password_hash, first_name, last_name, role,
-                 kwargs.get('phone'), kwargs.get('address'), kwargs.get('profile_image')))
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.execute("""
+                    INSERT INTO users (email, password_hash, first_name, last_name, role, 
+                                     phone, address, profile_image)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (email, password_hash, first_name, last_name, role,
+                     kwargs.get('phone'), kwargs.get('address'), kwargs.get('profile_image')))
+                
+                conn.commit()
+            except sqlite3.IntegrityError:
+                return None
+        
+        self._notify_change(cursor.lastrowid)
+        return cursor.lastrowid
+    
+    INSERT_USER_SQL = """
+        INSERT INTO users (email, password_hash, first_name, last_name, role,
+                           phone, address, profile_image)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    def create_users(self, users: List[Dict]) -> Dict[str, List[Dict]]:
+        """Alta de un lote de usuarios en una sola transacción
+        
+        Los emails ya registrados (o repetidos en el lote) se descartan antes
+        de calcular ningún hash; el resto se hashea en paralelo y se inserta
+        con ``executemany``. Devuelve ``created`` y ``errors`` con la posición
+        de cada usuario dentro de ``users``.
+        """
+        created, errors = [], []
+        if not users:
+            return {'created': created, 'errors': errors}
+        
+        marks = ','.join('?' * len(users))
+        with self.db.connection() as conn:
+            existing = {row['email'] for row in conn.execute(
+                f"SELECT email FROM users WHERE email IN ({marks})",
+                [user['email'] for user in users]
+            )}
+        
+        pending, seen = [], set()
+        for index, user in enumerate(users):
+            if user['email'] in existing or user['email'] in seen:
+                errors.append({'index': index, 'email': user['email'],
+                               'error': 'El email ya está registrado'})
+                continue
+            seen.add(user['email'])
+            pending.append((index, user))
+        
+        if not pending:
+            return {'created': created, 'errors': errors}
+        
+        hashes = passwords.hash_passwords([user['password'] for _, user in pending])
+        rows = [(user['email'], password_hash, user['first_name'], user['last_name'],
+                 user.get('role', 'employee'), user.get('phone'), user.get('address'),
+                 user.get('profile_image'))
+                for (_, user), password_hash in zip(pending, hashes)]
+        
+        with self.db.connection() as conn:
+            try:
+                conn.executemany(self.INSERT_USER_SQL, rows)
+            except sqlite3.IntegrityError:
+                # Otra petición registró alguno de los emails entre medias (u otra
+                # restricción rechaza una fila): se repite fila a fila para
+                # señalar sólo las que chocan, cada una con su motivo
+                conn.rollback()
+                inserted = []
+                for (index, user), row in zip(pending, rows):
+                    try:
+                        conn.execute(self.INSERT_USER_SQL, row)
+                        inserted.append((index, user))
+                    except sqlite3.IntegrityError as e:
+                        if str(e) == 'UNIQUE constraint failed: users.email':
+                            message = 'El email ya está registrado'
+                        else:
+                            message = f'Fila rechazada por la base de datos: {e}'
+                        errors.append({'index': index, 'email': user['email'], 'error': message})
+                pending = inserted
             
+            ids = {}
+            if pending:
+                ids = {row['email']: row['id'] for row in conn.execute(
+                    f"SELECT id, email FROM users WHERE email IN ({','.join('?' * len(pending))})",
+                    [user['email'] for _, user in pending]
+                )}
             conn.commit()
-            return cursor.lastrowid
-        except sqlite3.IntegrityError:
-            return None
-        finally:
-            conn.close()
+        
+        for index, user in pending:
+            created.append({'index': index, 'id': ids[user['email']], 'email': user['email']})
+        errors.sort(key=lambda error: error['index'])
+        
+        if created:
+            self._notify_change(*(user['id'] for user in created))
+        return {'created': created, 'errors': errors}
     
     def authenticate(self, email: str, password: str) -> Optional[Dict]:
         """Autentica usuario y actualiza last_login"""
-        conn = self.db.get_connection()
-        
-        user = conn.execute(
-            "SELECT * FROM users WHERE email = ? AND is_active = 1", 
-            (email,)
-        ).fetchone()
+        with self.db.connection() as conn:
+            user = conn.execute(
+                "SELECT * FROM users WHERE email = ? AND is_active = 1", 
+                (email,)
+            ).fetchone()
         
+        # La verificación PBKDF2 se hace sin retener la conexión del pool
         if user and self._verify_password(password, user['password_hash']):
+            password_hash = user['password_hash']
+            
+            # Migrar de forma transparente hashes con formato o coste antiguos
+            if passwords.needs_rehash(password_hash):
+                password_hash = self._hash_password(password)
+            
             # Actualizar último login
-            conn.execute(
-                "UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?",
-                (user['id'],)
-            )
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                conn.execute(
+                    "UPDATE users SET last_login = CURRENT_TIMESTAMP, password_hash = ? WHERE id = ?",
+                    (password_hash, user['id'])
+                )
+                conn.commit()
             
-            return dict(user)
+            user = dict(user)
+            user['password_hash'] = password_hash
+            return user
         
-        conn.close()
         return None
     
     def get_by_id(self, user_id: int) -> Optional[Dict]:
         """Obtiene usuario por ID"""
-        conn = self.db.get_connection()
-        user = conn.execute(
-            "SELECT * FROM users WHERE id = ? AND is_active = 1",
-            (user_id,)
-        ).fetchone()
-        conn.close()
+        with self.db.connection() as conn:
+            user = conn.execute(
+                "SELECT * FROM users WHERE id = ? AND is_active = 1",
+                (user_id,)
+            ).fetchone()
         
         return dict(user) if user else None
     
-    def get_all_users(self, limit: int = 50, offset: int = 0, role: str = None) -> List[Dict]:
-        """Obtiene lista de usuarios con filtros y paginación"""
-        conn = self.db.get_connection()
+    # Columnas de los listados (nunca password_hash)
+    LIST_COLUMNS = """
+        u.id, u.email, u.first_name, u.last_name, u.role, u.is_active, u.created_at,
+        u.updated_at, u.last_login, u.profile_image, u.phone, u.address
+    """
+    
+    def get_all_users(self, limit: int = 50, offset: int = 0, role: str = None,
+                      cursor: str = None) -> List[Dict]:
+        """Obtiene lista de usuarios con filtros y paginación
         
-        query = """
-            SELECT u.*, e.employee_id, e.position, d.name as department_name
+        Con ``cursor`` (ver encode_cursor) la página empieza justo después de esa
+        fila usando el índice (created_at, id) y ``offset`` se ignora. La página
+        se lee sólo de users; los datos de empleado se completan con una
+        consulta por página y el departamento desde el directorio de nombres.
+        """
+        query = f"""
+            SELECT {self.LIST_COLUMNS}
             FROM users u
-            LEFT JOIN employees e ON u.id = e.user_id
-            LEFT JOIN departments d ON e.department_id = d.id
             WHERE u.is_active = 1
         """
         params = []
@@ -163,13 +1040,30 @@ class User:
             query += " AND u.role = ?"
             params.append(role)
         
-        query += " ORDER BY u.created_at DESC LIMIT ? OFFSET ?"
+        if cursor is not None:
+            query += " AND (u.created_at, u.id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+            offset = 0
+        
+        query += " ORDER BY u.created_at DESC, u.id DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
         
-        users = conn.execute(query, params).fetchall()
-        conn.close()
+        with self.db.connection() as conn:
+            users = [dict(user) for user in conn.execute(query, params)]
+            employees = {}
+            if users:
+                employees = {row['user_id']: row for row in conn.execute(f"""
+                    SELECT user_id, employee_id, position, department_id FROM employees
+                    WHERE user_id IN ({','.join('?' * len(users))})
+                """, [user['id'] for user in users])}
         
-        return [dict(user) for user in users]
+        departments = self.directory.departments() if employees else {}
+        for user in users:
+            employee = employees.get(user['id'])
+            user['employee_id'] = employee['employee_id'] if employee else None
+            user['position'] = employee['position'] if employee else None
+            user['department_name'] = departments.get(employee['department_id']) if employee else None
+        return users
     
     def update_user(self, user_id: int, **kwargs) -> bool:
         """Actualiza información del usuario"""
@@ -191,16 +1085,17 @@ class User:
         set_clause.append("updated_at = CURRENT_TIMESTAMP")
         params.append(user_id)
         
-        conn = self.db.get_connection()
-        cursor = conn.execute(f"""
-            UPDATE users SET {', '.join(set_clause)}
-            WHERE id = ?
-        """, params)
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.execute(f"""
+                UPDATE users SET {', '.join(set_clause)}
+                WHERE id = ?
+            """, params)
+            
+            success = cursor.rowcount > 0
+            conn.commit()
         
+        if success:
+            self._notify_change(user_id)
         return success
 
 class Employee:
@@ -212,42 +1107,38 @@ class Employee:
     def create_employee(self, user_id: int, employee_id: str, department_id: int,
                        position: str, salary: float, hire_date: date, **kwargs) -> Optional[int]:
         """Crea perfil de empleado"""
-        conn = self.db.get_connection()
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.execute("""
+                    INSERT INTO employees (user_id, employee_id, department_id, position,
+                                         salary, hire_date, manager_id, skills, performance_score)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (user_id, employee_id, department_id, position, salary, hire_date,
+                     kwargs.get('manager_id'), json.dumps(kwargs.get('skills', [])),
+                     kwargs.get('performance_score', 0.0)))
+                
+                conn.commit()
+            except sqlite3.IntegrityError:
+                return None
         
-        try:
-            cursor = conn.execute("""
-                INSERT INTO employees (user_id, employee_id, department_id, position,
-                                     salary, hire_date, manager_id, skills, performance_score)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (user_id, employee_id, department_id, position, salary, hire_date,
-                 kwargs.get('manager_id'), json.dumps(kwargs.get('skills', [])),
-                 kwargs.get('performance_score', 0.0)))
-            
-            conn.commit()
-            return cursor.lastrowid
-        except sqlite3.IntegrityError:
-            return None
-        finally:
-            conn.close()
+        self.db.notify_write('employees')
+        return cursor.lastrowid
     
     def get_employee_details(self, user_id: int) -> Optional[Dict]:
         """Obtiene detalles completos del empleado"""
-        conn = self.db.get_connection()
-        
-        employee = conn.execute("""
-            SELECT e.*, u.first_name, u.last_name, u.email, u.phone,
-                   d.name as department_name, 
-                   m.first_name as manager_first_name,
-                   m.last_name as manager_last_name
-            FROM employees e
-            JOIN users u ON e.user_id = u.id
-            LEFT JOIN departments d ON e.department_id = d.id
-            LEFT JOIN employees me ON e.manager_id = me.id
-            LEFT JOIN users m ON me.user_id = m.id
-            WHERE e.user_id = ?
-        """, (user_id,)).fetchone()
-        
-        conn.close()
+        with self.db.connection() as conn:
+            employee = conn.execute("""
+                SELECT e.*, u.first_name, u.last_name, u.email, u.phone,
+                       d.name as department_name, 
+                       m.first_name as manager_first_name,
+                       m.last_name as manager_last_name
+                FROM employees e
+                JOIN users u ON e.user_id = u.id
+                LEFT JOIN departments d ON e.department_id = d.id
+                LEFT JOIN employees me ON e.manager_id = me.id
+                LEFT JOIN users m ON me.user_id = m.id
+                WHERE e.user_id = ?
+            """, (user_id,)).fetchone()
         
         if employee:
             emp_dict = dict(employee)
@@ -257,19 +1148,55 @@ class Employee:
         
         return None
     
-    def get_department_employees(self, department_id: int) -> List[Dict]:
-        """Obtiene empleados de un departamento"""
-        conn = self.db.get_connection()
+    def iter_employees(self, department_id: int = None, status: str = None,
+                       batch_size: int = 500, manager_user_id: int = None,
+                       include_compensation: bool = True):
+        """Exportación de empleados en lotes (ver DatabaseManager.stream_query)
         
-        employees = conn.execute("""
-            SELECT e.*, u.first_name, u.last_name, u.email
+        Con ``manager_user_id`` sólo se exporta su subárbol de reporte (él
+        incluido, vía org_closure); sin ``include_compensation`` se omiten
+        salario y rendimiento.
+        """
+        compensation = ", e.salary, e.performance_score" if include_compensation else ""
+        query = f"""
+            SELECT e.id, e.employee_id, u.first_name, u.last_name, u.email,
+                   e.department_id, d.name as department_name, e.position,
+                   e.hire_date, e.status, e.manager_id, e.skills{compensation}
             FROM employees e
             JOIN users u ON e.user_id = u.id
-            WHERE e.department_id = ? AND e.status = 'active'
-            ORDER BY u.first_name, u.last_name
-        """, (department_id,)).fetchall()
+            LEFT JOIN departments d ON e.department_id = d.id
+            WHERE 1=1
+        """
+        params = []
+        
+        if manager_user_id is not None:
+            query += f"""
+                AND e.id IN (SELECT descendant_id FROM org_closure
+                             WHERE ancestor_id = {OrgChart.EMPLOYEE_ID})
+            """
+            params.append(manager_user_id)
         
-        conn.close()
+        if department_id:
+            query += " AND e.department_id = ?"
+            params.append(department_id)
+        
+        if status:
+            query += " AND e.status = ?"
+            params.append(status)
+        
+        query += " ORDER BY e.id"
+        return self.db.stream_query(query, params, batch_size)
+    
+    def get_department_employees(self, department_id: int) -> List[Dict]:
+        """Obtiene empleados de un departamento"""
+        with self.db.connection() as conn:
+            employees = conn.execute("""
+                SELECT e.*, u.first_name, u.last_name, u.email
+                FROM employees e
+                JOIN users u ON e.user_id = u.id
+                WHERE e.department_id = ? AND e.status = 'active'
+                ORDER BY u.first_name, u.last_name
+            """, (department_id,)).fetchall()
         
         result = []
         for emp in employees:
@@ -280,47 +1207,195 @@ class Employee:
         
         return result
 
+class OrgChart:
+    """Jerarquía de reporte sobre la tabla de clausura org_closure (migración 007)
+    
+    La API trabaja con ids de usuario; internamente cada usuario se resuelve
+    a su fila de employees (índice por user_id). Las comprobaciones de línea
+    de reporte son una búsqueda por clave primaria de la clausura, y subárbol,
+    cadena de mando y agregados son rangos de sus índices.
+    """
+    
+    EMPLOYEE_ID = "(SELECT id FROM employees WHERE user_id = ? LIMIT 1)"
+    
+    def __init__(self, db_manager: DatabaseManager, directory: NameDirectory = None):
+        self.db = db_manager
+        self.directory = directory or NameDirectory(db_manager)
+    
+    def is_in_reporting_line(self, manager_user_id: int, user_id: int) -> bool:
+        """True si ``user_id`` depende (directa o indirectamente) de ``manager_user_id``"""
+        with self.db.connection() as conn:
+            row = conn.execute(f"""
+                SELECT 1 FROM org_closure
+                WHERE ancestor_id = {self.EMPLOYEE_ID}
+                  AND descendant_id = {self.EMPLOYEE_ID}
+                  AND depth > 0
+            """, (manager_user_id, user_id)).fetchone()
+        return row is not None
+    
+    def _with_names(self, rows) -> List[Dict]:
+        users = self.directory.users(row['user_id'] for row in rows)
+        departments = self.directory.departments()
+        result = []
+        for row in rows:
+            item = dict(row)
+            item['first_name'], item['last_name'] = users.get(row['user_id'], (None, None))
+            item['department_name'] = departments.get(row['department_id'])
+            result.append(item)
+        return result
+    
+    def get_team(self, user_id: int, max_depth: int = None) -> Optional[List[Dict]]:
+        """Subárbol de ``user_id`` (sin él), por nivel; None si no es empleado"""
+        with self.db.connection() as conn:
+            root = conn.execute(
+                "SELECT id FROM employees WHERE user_id = ? LIMIT 1", (user_id,)
+            ).fetchone()
+            if root is None:
+                return None
+            rows = conn.execute("""
+                SELECT e.id, e.user_id, e.employee_id, e.position, e.department_id,
+                       e.manager_id, e.status, c.depth
+                FROM org_closure c
+                JOIN employees e ON e.id = c.descendant_id
+                WHERE c.ancestor_id = ? AND c.depth BETWEEN 1 AND ?
+                ORDER BY c.depth, e.id
+            """, (root['id'], max_depth or 1000)).fetchall()
+        return self._with_names(rows)
+    
+    def get_chain(self, user_id: int) -> Optional[List[Dict]]:
+        """Cadena de mando de ``user_id``, del superior directo hacia arriba"""
+        with self.db.connection() as conn:
+            root = conn.execute(
+                "SELECT id FROM employees WHERE user_id = ? LIMIT 1", (user_id,)
+            ).fetchone()
+            if root is None:
+                return None
+            rows = conn.execute("""
+                SELECT e.id, e.user_id, e.employee_id, e.position, e.department_id,
+                       e.manager_id, e.status, c.depth
+                FROM org_closure c
+                JOIN employees e ON e.id = c.ancestor_id
+                WHERE c.descendant_id = ? AND c.depth > 0
+                ORDER BY c.depth
+            """, (root['id'],)).fetchall()
+        return self._with_names(rows)
+    
+    def get_rollup(self, user_id: int) -> Optional[Dict]:
+        """Plantilla activa y masa salarial del subárbol, total y por subordinado directo"""
+        with self.db.connection() as conn:
+            root = conn.execute(
+                "SELECT id FROM employees WHERE user_id = ? LIMIT 1", (user_id,)
+            ).fetchone()
+            if root is None:
+                return None
+            totals = conn.execute("""
+                SELECT COUNT(*) as headcount,
+                       COALESCE(SUM(e.salary), 0) as total_salary,
+                       AVG(e.salary) as avg_salary,
+                       AVG(e.performance_score) as avg_performance,
+                       COALESCE(MAX(c.depth), 0) as levels
+                FROM org_closure c
+                JOIN employees e ON e.id = c.descendant_id
+                WHERE c.ancestor_id = ? AND c.depth > 0 AND e.status = 'active'
+            """, (root['id'],)).fetchone()
+            # Cada subordinado directo cuenta con todo su subárbol (incluido él)
+            branches = conn.execute("""
+                SELECT r.id, r.user_id, r.employee_id, r.position, r.department_id,
+                       COUNT(e.id) as headcount,
+                       COALESCE(SUM(e.salary), 0) as total_salary,
+                       AVG(e.performance_score) as avg_performance
+                FROM employees r
+                JOIN org_closure c ON c.ancestor_id = r.id
+                JOIN employees e ON e.id = c.descendant_id AND e.status = 'active'
+                WHERE r.manager_id = ?
+                GROUP BY r.id
+                ORDER BY headcount DESC, r.id
+            """, (root['id'],)).fetchall()
+        
+        result = dict(totals)
+        for key in ('avg_salary', 'avg_performance'):
+            result[key] = round(result[key], 2) if result[key] is not None else None
+        result['direct_reports'] = self._with_names(branches)
+        for branch in result['direct_reports']:
+            if branch['avg_performance'] is not None:
+                branch['avg_performance'] = round(branch['avg_performance'], 2)
+        return result
+    
+    def set_manager(self, user_id: int, manager_user_id: Optional[int]) -> bool:
+        """Cambia el superior de un empleado (None lo deja sin superior)
+        
+        Los triggers recolocan todo su subárbol en la clausura. ValueError si
+        el superior no es empleado o el cambio crearía un ciclo.
+        """
+        with self.db.connection() as conn:
+            manager_id = None
+            if manager_user_id is not None:
+                manager = conn.execute(
+                    "SELECT id FROM employees WHERE user_id = ? LIMIT 1", (manager_user_id,)
+                ).fetchone()
+                if manager is None:
+                    raise ValueError('El superior indicado no es un empleado')
+                manager_id = manager['id']
+            try:
+                cursor = conn.execute(
+                    "UPDATE employees SET manager_id = ? WHERE user_id = ?",
+                    (manager_id, user_id)
+                )
+                conn.commit()
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                raise ValueError('El cambio crearía un ciclo en la jerarquía')
+        
+        if cursor.rowcount == 0:
+            return False
+        self.db.notify_write('employees')
+        return True
+
 class Project:
     """Modelo para gestión de proyectos"""
     
-    def __init__(self, db_manager: DatabaseManager):
+    # Nombres que se añaden a cada fila desde el directorio (mismo orden que las exportaciones)
+    NAME_COLUMNS = ('created_by_name', 'created_by_lastname', 'assigned_to_name',
+                    'assigned_to_lastname', 'department_name')
+    
+    def __init__(self, db_manager: DatabaseManager, directory: NameDirectory = None):
         self.db = db_manager
+        self.directory = directory or NameDirectory(db_manager)
+        self._progress_listeners = []
+    
+    def add_progress_listener(self, callback):
+        """Registra un callback(project_id, progress) que se invoca tras cambiar el progreso"""
+        self._progress_listeners.append(callback)
     
     def create_project(self, name: str, description: str, created_by: int, **kwargs) -> Optional[int]:
         """Crea un nuevo proyecto"""
-        conn = self.db.get_connection()
-        
-        try:
+        with self.db.connection() as conn:
             cursor = conn.execute("""
                 INSERT INTO projects (name, description, status, priority, start_date,
                                     end_date, deadline, budget, created_by, assigned_to,
-                                    department_id, client_name)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                    department_id, client_name, auto_progress)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (name, description, kwargs.get('status', 'planning'),
                  kwargs.get('priority', 'medium'), kwargs.get('start_date'),
                  kwargs.get('end_date'), kwargs.get('deadline'),
                  kwargs.get('budget', 0), created_by, kwargs.get('assigned_to'),
-                 kwargs.get('department_id'), kwargs.get('client_name')))
+                 kwargs.get('department_id'), kwargs.get('client_name'),
+                 1 if kwargs.get('auto_progress') else 0))
             
             conn.commit()
-            return cursor.lastrowid
-        finally:
-            conn.close()
+        
+        self.db.notify_write('projects')
+        return cursor.lastrowid
     
-    def get_projects(self, status: str = None, department_id: int = None,
-                    limit: int = 50, offset: int = 0) -> List[Dict]:
-        """Obtiene lista de proyectos con filtros"""
-        conn = self.db.get_connection()
+    @staticmethod
+    def _projects_query(status: str = None, department_id: int = None) -> tuple:
+        """SELECT y parámetros con los filtros comunes a listado y exportación
         
+        Sólo lee projects; los nombres los añade ``_names`` por lotes.
+        """
         query = """
-            SELECT p.*, 
-                   u1.first_name as created_by_name, u1.last_name as created_by_lastname,
-                   u2.first_name as assigned_to_name, u2.last_name as assigned_to_lastname,
-                   d.name as department_name
+            SELECT p.*
             FROM projects p
-            LEFT JOIN users u1 ON p.created_by = u1.id
-            LEFT JOIN users u2 ON p.assigned_to = u2.id
-            LEFT JOIN departments d ON p.department_id = d.id
             WHERE 1=1
         """
         params = []
@@ -333,120 +1408,974 @@ class Project:
             query += " AND p.department_id = ?"
             params.append(department_id)
         
-        query += " ORDER BY p.created_at DESC LIMIT ? OFFSET ?"
+        return query, params
+    
+    def _names(self, rows) -> List[tuple]:
+        """Valores de NAME_COLUMNS para cada fila, con una búsqueda por lote"""
+        users = self.directory.users(
+            user_id for row in rows for user_id in (row['created_by'], row['assigned_to'])
+        )
+        departments = self.directory.departments()
+        nobody = (None, None)
+        return [users.get(row['created_by'], nobody) + users.get(row['assigned_to'], nobody)
+                + (departments.get(row['department_id']),) for row in rows]
+    
+    def _with_names(self, rows) -> List[Dict]:
+        return [{**dict(row), **dict(zip(self.NAME_COLUMNS, names))}
+                for row, names in zip(rows, self._names(rows))]
+    
+    def iter_projects(self, status: str = None, department_id: int = None,
+                      batch_size: int = 500):
+        """Exportación de proyectos en lotes, mismo orden y filtros que get_projects"""
+        query, params = self._projects_query(status, department_id)
+        query += " ORDER BY p.created_at DESC, p.id DESC"
+        batches = self.db.stream_query(query, params, batch_size)
+        try:
+            yield next(batches) + self.NAME_COLUMNS
+            for rows in batches:
+                yield [tuple(row) + names for row, names in zip(rows, self._names(rows))]
+        finally:
+            batches.close()
+    
+    def get_projects(self, status: str = None, department_id: int = None,
+                    limit: int = 50, offset: int = 0, cursor: str = None) -> List[Dict]:
+        """Obtiene lista de proyectos con filtros
+        
+        Con ``cursor`` (ver encode_cursor) la página empieza justo después de esa
+        fila usando el índice (created_at, id) y ``offset`` se ignora.
+        """
+        query, params = self._projects_query(status, department_id)
+        
+        if cursor is not None:
+            query += " AND (p.created_at, p.id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+            offset = 0
+        
+        query += " ORDER BY p.created_at DESC, p.id DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
         
-        projects = conn.execute(query, params).fetchall()
-        conn.close()
+        with self.db.connection() as conn:
+            projects = conn.execute(query, params).fetchall()
         
-        return [dict(project) for project in projects]
+        return self._with_names(projects)
     
     def get_project_by_id(self, project_id: int) -> Optional[Dict]:
-        """Obtiene proyecto por ID con detalles completos"""
-        conn = self.db.get_connection()
-        
-        project = conn.execute("""
-            SELECT p.*, 
-                   u1.first_name as created_by_name, u1.last_name as created_by_lastname,
-                   u2.first_name as assigned_to_name, u2.last_name as assigned_to_lastname,
-                   d.name as department_name,
-                   COUNT(t.id) as total_tasks,
-                   SUM(CASE WHEN t.status = 'completed' THEN 1 ELSE 0 END) as completed_tasks
-            FROM projects p
-            LEFT JOIN users u1 ON p.created_by = u1.id
-            LEFT JOIN users u2 ON p.assigned_to = u2.id
-            LEFT JOIN departments d ON p.department_id = d.id
-            LEFT JOIN tasks t ON p.id = t.project_id
-            WHERE p.id = ?
-            GROUP BY p.id
-        """, (project_id,)).fetchone()
+        """Obtiene proyecto por ID con detalles completos
         
-        conn.close()
+        total_tasks / completed_tasks / blocked_tasks son columnas de projects
+        mantenidas por triggers (migración 006): no se agrega tasks.
+        """
+        with self.db.connection() as conn:
+            project = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
         
-        return dict(project) if project else None
+        return self._with_names([project])[0] if project else None
+    
+    def _notify_progress(self, project_id: int, progress: float):
+        for callback in self._progress_listeners:
+            callback(project_id, progress)
     
     def update_progress(self, project_id: int, progress: float) -> bool:
-        """Actualiza el progreso del proyecto"""
-        conn = self.db.get_connection()
+        """Actualiza el progreso del proyecto (desactiva el progreso automático)"""
+        with self.db.connection() as conn:
+            cursor = conn.execute("""
+                UPDATE projects 
+                SET progress = ?, auto_progress = 0, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (progress, project_id))
+            
+            success = cursor.rowcount > 0
+            conn.commit()
+        
+        if success:
+            self.db.notify_write('projects')
+            self._notify_progress(project_id, progress)
+        return success
+    
+    def enable_auto_progress(self, project_id: int) -> Optional[float]:
+        """Deriva el progreso de las tareas completadas; devuelve el valor calculado"""
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE projects SET auto_progress = 1 WHERE id = ?", (project_id,)
+            )
+            if cursor.rowcount == 0:
+                return None
+            progress = conn.execute(
+                "SELECT progress FROM projects WHERE id = ?", (project_id,)
+            ).fetchone()['progress']
+            conn.commit()
+        
+        self.db.notify_write('projects')
+        self._notify_progress(project_id, progress)
+        return progress
+
+class Task:
+    """Modelo para gestión de tareas
+    
+    Los contadores de tareas de cada proyecto los mantienen los triggers de
+    la migración 006 dentro de la misma transacción; aquí sólo se avisa del
+    nuevo progreso de los proyectos con progreso automático.
+    """
+    
+    STATUSES = ('pending', 'in_progress', 'completed', 'blocked')
+    PRIORITIES = ('low', 'medium', 'high', 'urgent')
+    UPDATABLE_FIELDS = ('title', 'description', 'priority', 'estimated_hours',
+                        'actual_hours', 'start_date', 'due_date')
+    
+    def __init__(self, db_manager: DatabaseManager, project_model: Project):
+        self.db = db_manager
+        self.projects = project_model
+    
+    def _after_write(self, project_ids):
+        """Invalida tareas y proyectos y publica el progreso automático"""
+        self.db.notify_write('tasks', 'projects')
         
-        cursor = conn.execute("""
-            UPDATE projects 
-            SET progress = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (progress, project_id))
+        project_ids = [project_id for project_id in set(project_ids) if project_id]
+        if not project_ids:
+            return
+        with self.db.connection() as conn:
+            rows = conn.execute(f"""
+                SELECT id, progress FROM projects
+                WHERE auto_progress = 1 AND id IN ({','.join('?' * len(project_ids))})
+            """, project_ids).fetchall()
+        for row in rows:
+            self.projects._notify_progress(row['id'], row['progress'])
+    
+    def get_task(self, task_id: int) -> Optional[Dict]:
+        """Tarea por ID con el nombre del asignado"""
+        with self.db.connection() as conn:
+            task = conn.execute("""
+                SELECT t.*, u.first_name as assigned_to_name, u.last_name as assigned_to_lastname
+                FROM tasks t
+                LEFT JOIN users u ON t.assigned_to = u.id
+                WHERE t.id = ?
+            """, (task_id,)).fetchone()
+        
+        return dict(task) if task else None
+    
+    def get_tasks(self, project_id: int, status: str = None, assigned_to: int = None) -> List[Dict]:
+        """Tareas de un proyecto (índice project_id + status)"""
+        query = """
+            SELECT t.*, u.first_name as assigned_to_name, u.last_name as assigned_to_lastname
+            FROM tasks t
+            LEFT JOIN users u ON t.assigned_to = u.id
+            WHERE t.project_id = ?
+        """
+        params = [project_id]
+        
+        if status:
+            query += " AND t.status = ?"
+            params.append(status)
+        
+        if assigned_to:
+            query += " AND t.assigned_to = ?"
+            params.append(assigned_to)
+        
+        query += " ORDER BY t.due_date IS NULL, t.due_date, t.id"
+        
+        with self.db.connection() as conn:
+            tasks = conn.execute(query, params).fetchall()
+        
+        return [dict(task) for task in tasks]
+    
+    def create_task(self, project_id: int, title: str, created_by: int, **kwargs) -> Optional[int]:
+        """Crea una tarea; None si el proyecto no existe"""
+        status = kwargs.get('status', 'pending')
+        with self.db.connection() as conn:
+            if not conn.execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone():
+                return None
+            cursor = conn.execute("""
+                INSERT INTO tasks (project_id, title, description, status, priority,
+                                   assigned_to, created_by, estimated_hours, start_date,
+                                   due_date, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                        CASE WHEN ? = 'completed' THEN CURRENT_TIMESTAMP END)
+            """, (project_id, title, kwargs.get('description'), status,
+                 kwargs.get('priority', 'medium'), kwargs.get('assigned_to'), created_by,
+                 kwargs.get('estimated_hours'), kwargs.get('start_date'),
+                 kwargs.get('due_date'), status))
+            conn.commit()
         
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        self._after_write([project_id])
+        return cursor.lastrowid
+    
+    def update_task(self, task_id: int, **kwargs) -> bool:
+        """Actualiza los campos editables de una tarea"""
+        fields = [field for field in self.UPDATABLE_FIELDS if field in kwargs]
+        if not fields:
+            return False
+        
+        with self.db.connection() as conn:
+            cursor = conn.execute(f"""
+                UPDATE tasks SET {', '.join(f'{field} = ?' for field in fields)},
+                                 updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [kwargs[field] for field in fields] + [task_id])
+            success = cursor.rowcount > 0
+            conn.commit()
         
+        if success:
+            self.db.notify_write('tasks')
         return success
+    
+    def set_status(self, task_id: int, status: str) -> bool:
+        """Cambia el estado; completed_at se fija al completar y se borra al reabrir"""
+        with self.db.connection() as conn:
+            rows = conn.execute("""
+                UPDATE tasks SET status = ?,
+                    completed_at = CASE WHEN ? = 'completed'
+                                        THEN COALESCE(completed_at, CURRENT_TIMESTAMP) END,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                RETURNING project_id
+            """, (status, status, task_id)).fetchall()
+            conn.commit()
+        
+        if not rows:
+            return False
+        self._after_write([rows[0]['project_id']])
+        return True
+    
+    def assign(self, task_id: int, user_id: Optional[int]) -> bool:
+        """Asigna la tarea a un usuario (None la deja sin asignar)"""
+        with self.db.connection() as conn:
+            cursor = conn.execute("""
+                UPDATE tasks SET assigned_to = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (user_id, task_id))
+            success = cursor.rowcount > 0
+            conn.commit()
+        
+        if success:
+            self.db.notify_write('tasks')
+        return success
+    
+    def move_tasks(self, task_ids: List[int], project_id: int) -> Optional[List[int]]:
+        """Mueve varias tareas a otro proyecto en una transacción
+        
+        Devuelve los ids movidos (los inexistentes se ignoran) o None si el
+        proyecto destino no existe.
+        """
+        marks = ','.join('?' * len(task_ids))
+        with self.db.connection() as conn:
+            if not conn.execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone():
+                return None
+            sources = [row['project_id'] for row in conn.execute(
+                f"SELECT DISTINCT project_id FROM tasks WHERE id IN ({marks})", task_ids
+            )]
+            moved = [row['id'] for row in conn.execute(f"""
+                UPDATE tasks SET project_id = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id IN ({marks}) AND project_id != ?
+                RETURNING id
+            """, [project_id] + list(task_ids) + [project_id]).fetchall()]
+            conn.commit()
+        
+        if moved:
+            self._after_write(sources + [project_id])
+        return moved
+    
+    def delete_task(self, task_id: int) -> bool:
+        """Elimina una tarea (ValueError si tiene horas registradas)"""
+        with self.db.connection() as conn:
+            try:
+                rows = conn.execute(
+                    "DELETE FROM tasks WHERE id = ? RETURNING project_id", (task_id,)
+                ).fetchall()
+                conn.commit()
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                raise ValueError('La tarea tiene horas registradas y no puede eliminarse')
+        
+        if not rows:
+            return False
+        self._after_write([rows[0]['project_id']])
+        return True
 
-class CompanyMetrics:
-    """Modelo para métricas empresariales"""
+class TimeEntry:
+    """Modelo para registros de horas"""
+    
+    def __init__(self, db_manager: DatabaseManager):
+        self.db = db_manager
+    
+    def iter_entries(self, user_id: int = None, project_id: int = None,
+                     date_from: date = None, date_to: date = None, batch_size: int = 500):
+        """Exportación de horas en lotes (ver DatabaseManager.stream_query)"""
+        query = """
+            SELECT te.id, te.user_id, u.first_name, u.last_name, te.project_id,
+                   p.name as project_name, te.task_id, te.description, te.hours,
+                   te.entry_date, te.billable, te.created_at
+            FROM time_entries te
+            JOIN users u ON te.user_id = u.id
+            LEFT JOIN projects p ON te.project_id = p.id
+            WHERE 1=1
+        """
+        params = []
+        
+        if user_id:
+            query += " AND te.user_id = ?"
+            params.append(user_id)
+        
+        if project_id:
+            query += " AND te.project_id = ?"
+            params.append(project_id)
+        
+        if date_from:
+            query += " AND te.entry_date >= ?"
+            params.append(date_from.isoformat())
+        
+        if date_to:
+            query += " AND te.entry_date <= ?"
+            params.append(date_to.isoformat())
+        
+        query += " ORDER BY te.entry_date, te.id"
+        return self.db.stream_query(query, params, batch_size)
+    
+    MAX_DAILY_HOURS = 24
+    
+    # Agrupaciones de los informes: (columna, nombre unido tras agregar, orden)
+    ROLLUP_GROUPS = {
+        'week': ('r.week_start', None, 'g.group_key'),
+        'project': ('r.project_id', "(SELECT name FROM projects WHERE id = g.group_key)", 'g.hours DESC'),
+        'user': ('r.user_id', "(SELECT first_name || ' ' || last_name FROM users WHERE id = g.group_key)", 'g.hours DESC')
+    }
+    
+    INSERT_SQL = """
+        INSERT INTO time_entries (user_id, project_id, task_id, description, hours,
+                                  entry_date, billable)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    @staticmethod
+    def week_start(day: date) -> date:
+        """Lunes de la semana de ``day`` (mismo criterio que time_entry_weekly)"""
+        return day - timedelta(days=day.weekday())
+    
+    def submit_entries(self, user_id: int, entries: List[Dict]) -> tuple:
+        """Registra un lote de horas de un usuario: (ids, errores)
+        
+        Cada entrada trae ``entry_date`` (date), ``hours`` y opcionalmente
+        ``project_id``, ``task_id``, ``description`` y ``billable``. Proyectos y
+        tareas se validan con una consulta por tabla, el máximo diario se
+        comprueba junto con lo ya registrado y, si algo falla, no se inserta
+        nada. Los errores llevan la posición de la entrada en ``entries``.
+        """
+        errors = []
+        task_ids = {entry['task_id'] for entry in entries if entry.get('task_id')}
+        
+        with self.db.connection() as conn:
+            tasks = {}
+            if task_ids:
+                tasks = {row['id']: row['project_id'] for row in conn.execute(
+                    f"SELECT id, project_id FROM tasks WHERE id IN ({','.join('?' * len(task_ids))})",
+                    list(task_ids)
+                )}
+            
+            for index, entry in enumerate(entries):
+                task_id = entry.get('task_id')
+                if task_id:
+                    if task_id not in tasks:
+                        errors.append({'index': index, 'error': f'Tarea {task_id} no encontrada'})
+                        continue
+                    if entry.get('project_id') and entry['project_id'] != tasks[task_id]:
+                        errors.append({'index': index,
+                                       'error': f'La tarea {task_id} no pertenece al proyecto {entry["project_id"]}'})
+                        continue
+                    entry['project_id'] = tasks[task_id]
+            
+            project_ids = {entry['project_id'] for entry in entries if entry.get('project_id')}
+            projects = {}
+            if project_ids:
+                projects = {row['id']: row['status'] for row in conn.execute(
+                    f"SELECT id, status FROM projects WHERE id IN ({','.join('?' * len(project_ids))})",
+                    list(project_ids)
+                )}
+            for index, entry in enumerate(entries):
+                project_id = entry.get('project_id')
+                if not project_id:
+                    continue
+                if project_id not in projects:
+                    errors.append({'index': index, 'error': f'Proyecto {project_id} no encontrado'})
+                elif projects[project_id] == 'cancelled':
+                    errors.append({'index': index, 'error': f'El proyecto {project_id} está cancelado'})
+            
+            if errors:
+                return [], sorted(errors, key=lambda error: error['index'])
+            
+            # BEGIN IMMEDIATE: el máximo diario no puede saltarse con dos envíos a la vez
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                days = [entry['entry_date'] for entry in entries]
+                totals = {row['entry_date']: row['hours'] for row in conn.execute("""
+                    SELECT entry_date, SUM(hours) as hours FROM time_entries
+                    WHERE user_id = ? AND entry_date BETWEEN ? AND ?
+                    GROUP BY entry_date
+                """, (user_id, min(days).isoformat(), max(days).isoformat()))}
+                for entry in entries:
+                    day = entry['entry_date'].isoformat()
+                    totals[day] = totals.get(day, 0) + entry['hours']
+                
+                for index, entry in enumerate(entries):
+                    day = entry['entry_date'].isoformat()
+                    if totals[day] > self.MAX_DAILY_HOURS:
+                        errors.append({'index': index,
+                                       'error': f'El {day} suma {round(totals[day], 2)} h (máximo {self.MAX_DAILY_HOURS})'})
+                if errors:
+                    conn.rollback()
+                    return [], errors
+                
+                conn.executemany(self.INSERT_SQL, [
+                    (user_id, entry.get('project_id'), entry.get('task_id'),
+                     entry.get('description'), entry['hours'],
+                     entry['entry_date'].isoformat(), 1 if entry.get('billable') else 0)
+                    for entry in entries
+                ])
+                # Un único INSERT repetido con el bloqueo de escritura: ids consecutivos
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        self.db.notify_write('time_entries')
+        return list(range(last_id - len(entries) + 1, last_id + 1)), []
+    
+    def get_week(self, user_id: int, week_start: date) -> List[Dict]:
+        """Registros de una semana de un usuario (índice user_id + entry_date)"""
+        with self.db.connection() as conn:
+            rows = conn.execute("""
+                SELECT te.id, te.project_id, p.name as project_name, te.task_id,
+                       t.title as task_title, te.description, te.hours,
+                       te.entry_date, te.billable, te.created_at
+                FROM time_entries te
+                LEFT JOIN projects p ON te.project_id = p.id
+                LEFT JOIN tasks t ON te.task_id = t.id
+                WHERE te.user_id = ? AND te.entry_date BETWEEN ? AND ?
+                ORDER BY te.entry_date, te.id
+            """, (user_id, week_start.isoformat(),
+                  (week_start + timedelta(days=6)).isoformat())).fetchall()
+        return [dict(row) for row in rows]
+    
+    def get_rollup(self, group_by: str = 'week', user_id: int = None,
+                   project_id: int = None, date_from: date = None,
+                   date_to: date = None) -> List[Dict]:
+        """Totales de horas desde los acumulados semanales (migración 005)
+        
+        Las fechas se ajustan a semanas completas: ``date_from`` cuenta desde
+        el lunes de su semana. Nunca se lee ``time_entries``.
+        """
+        key, name, order = self.ROLLUP_GROUPS[group_by]
+        where, params = ["1=1"], []
+        
+        if user_id:
+            where.append("r.user_id = ?")
+            params.append(user_id)
+        
+        if project_id:
+            where.append("r.project_id = ?")
+            params.append(project_id)
+        
+        if date_from:
+            where.append("r.week_start >= ?")
+            params.append(self.week_start(date_from).isoformat())
+        
+        if date_to:
+            where.append("r.week_start <= ?")
+            params.append(date_to.isoformat())
+        
+        # Los nombres se buscan por PK una vez por grupo, después de agregar
+        query = f"""
+            SELECT g.*, {name or 'NULL'} as name FROM (
+                SELECT {key} as group_key, SUM(r.hours) as hours,
+                       SUM(r.billable_hours) as billable_hours, SUM(r.entries) as entries,
+                       MIN(r.week_start) as first_week, MAX(r.week_start) as last_week
+                FROM time_entry_weekly r
+                WHERE {' AND '.join(where)}
+                GROUP BY {key}
+            ) g
+            ORDER BY {order}
+        """
+        
+        with self.db.connection() as conn:
+            rows = [dict(row) for row in conn.execute(query, params)]
+        
+        for row in rows:
+            group_key = row.pop('group_key')
+            if group_by == 'week':
+                row['week_start'] = group_key
+                del row['name']
+            else:
+                row[f'{group_by}_id'] = group_key or None
+            row['hours'] = round(row['hours'], 2)
+            row['billable_hours'] = round(row['billable_hours'], 2)
+        return rows
+
+class SearchIndex:
+    """Búsqueda de texto completo sobre los índices FTS5 (migración 004)
+    
+    Cada tipo aporta una subconsulta con la misma forma; ``search`` une las
+    permitidas, ordena por bm25 y pagina. Los fragmentos resaltados se
+    escapan como HTML y sólo las coincidencias llevan ``<mark>``.
+    """
+    
+    # Marcadores internos de highlight()/snippet(); se sustituyen tras escapar el texto
+    MARK_OPEN = '\x02'
+    MARK_CLOSE = '\x03'
+    MAX_TERMS = 8
+    
+    SOURCES = {
+        'projects': """
+            SELECT 'project' AS type, p.id AS id,
+                   highlight(projects_fts, 0, char(2), char(3)) AS title,
+                   snippet(projects_fts, -1, char(2), char(3), '…', 16) AS snippet,
+                   'department' AS parent_type, p.department_id AS parent_id,
+                   bm25(projects_fts, 10.0, 1.0, 5.0) AS rank
+            FROM projects_fts JOIN projects p ON p.id = projects_fts.rowid
+            WHERE projects_fts MATCH ?
+        """,
+        'users': """
+            SELECT 'user' AS type, u.id AS id,
+                   highlight(users_fts, 0, char(2), char(3)) || ' ' ||
+                   highlight(users_fts, 1, char(2), char(3)) AS title,
+                   highlight(users_fts, 2, char(2), char(3)) AS snippet,
+                   NULL AS parent_type, NULL AS parent_id,
+                   bm25(users_fts, 5.0, 5.0, 2.0) AS rank
+            FROM users_fts JOIN users u ON u.id = users_fts.rowid
+            WHERE users_fts MATCH ? AND u.is_active = 1
+        """,
+        'tasks': """
+            SELECT 'task' AS type, t.id AS id,
+                   highlight(tasks_fts, 0, char(2), char(3)) AS title,
+                   snippet(tasks_fts, 1, char(2), char(3), '…', 16) AS snippet,
+                   'project' AS parent_type, t.project_id AS parent_id,
+                   bm25(tasks_fts, 5.0, 1.0) AS rank
+            FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid
+            WHERE tasks_fts MATCH ?
+        """,
+        'comments': """
+            SELECT 'comment' AS type, c.id AS id,
+                   c.entity_type AS title,
+                   snippet(comments_fts, 0, char(2), char(3), '…', 16) AS snippet,
+                   c.entity_type AS parent_type, c.entity_id AS parent_id,
+                   bm25(comments_fts) AS rank
+            FROM comments_fts JOIN comments c ON c.id = comments_fts.rowid
+            WHERE comments_fts MATCH ?
+        """
+    }
+    
+    def __init__(self, db_manager: DatabaseManager):
+        self.db = db_manager
+    
+    @classmethod
+    def build_match(cls, text: str) -> Optional[str]:
+        """Convierte texto libre en una consulta FTS5 segura (AND de prefijos)
+        
+        Sólo se usan palabras (\\w+) entrecomilladas, así que la sintaxis de FTS5
+        (NEAR, OR, comillas, *) del usuario nunca llega al motor.
+        """
+        terms = re.findall(r'\w+', text or '', re.UNICODE)[:cls.MAX_TERMS]
+        if not terms:
+            return None
+        return ' '.join(f'"{term}"*' for term in terms)
+    
+    @classmethod
+    def _render(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        return (html.escape(value)
+                .replace(cls.MARK_OPEN, '<mark>')
+                .replace(cls.MARK_CLOSE, '</mark>'))
+    
+    def search(self, text: str, types: List[str], limit: int = 20, offset: int = 0,
+               comment_entities: List[str] = None) -> List[Dict]:
+        """Resultados ordenados por relevancia en ``types`` (claves de SOURCES)
+        
+        ``comment_entities`` limita los comentarios a esos entity_type.
+        """
+        match = self.build_match(text)
+        if match is None:
+            raise ValueError('La búsqueda debe contener al menos una palabra')
+        
+        parts, params = [], []
+        for source in types:
+            query = self.SOURCES[source]
+            if source == 'comments':
+                if not comment_entities:
+                    continue
+                query += f" AND c.entity_type IN ({','.join('?' * len(comment_entities))})"
+                parts.append(query)
+                params.append(match)
+                params.extend(comment_entities)
+            else:
+                parts.append(query)
+                params.append(match)
+        
+        if not parts:
+            return []
+        
+        query = ' UNION ALL '.join(parts) + ' ORDER BY rank LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+        
+        with self.db.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        results = []
+        for row in rows:
+            result = dict(row)
+            result['title'] = self._render(result['title'])
+            result['snippet'] = self._render(result['snippet'])
+            result['rank'] = round(result['rank'], 4)
+            results.append(result)
+        return results
+    
+    def rebuild(self):
+        """Reconstruye los índices FTS desde las tablas base"""
+        with self.db.connection() as conn:
+            for source in self.SOURCES:
+                conn.execute(f"INSERT INTO {source}_fts({source}_fts) VALUES ('rebuild')")
+            conn.commit()
+
+class Notification:
+    """Modelo de solo lectura sobre la tabla notifications"""
     
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
     
+    def latest_id(self) -> int:
+        """Id de la notificación más reciente (0 si no hay ninguna)"""
+        with self.db.connection() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM notifications").fetchone()[0]
+    
+    def get_since(self, after_id: int, limit: int = 100) -> List[Dict]:
+        """Notificaciones con id > ``after_id`` en orden de creación (búsqueda por PK)"""
+        with self.db.connection() as conn:
+            rows = conn.execute("""
+                SELECT id, user_id, title, message, type, action_url, created_at
+                FROM notifications
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (after_id, limit)).fetchall()
+        
+        return [dict(row) for row in rows]
+
+class CompanyMetrics:
+    """Modelo para métricas empresariales
+    
+    Cada punto insertado en ``company_metrics`` actualiza por trigger sus
+    acumulados diario, semanal y mensual (``metric_rollups``, migración 009),
+    así que las series largas se leen de los acumulados y los puntos
+    antiguos pueden purgarse sin perder historia.
+    """
+    
+    # Resoluciones de la más fina a la más gruesa con su duración aproximada en días
+    RESOLUTIONS = {'raw': None, 'day': 1, 'week': 7, 'month': 30.44}
+    
+    INSERT_SQL = """
+        INSERT INTO company_metrics (metric_name, metric_value, metric_type, period, recorded_date)
+        VALUES (?, ?, ?, ?, ?)
+    """
+    
+    def __init__(self, db_manager: DatabaseManager, raw_retention_days: int = 0,
+                 daily_retention_days: int = 0):
+        self.db = db_manager
+        self.raw_retention_days = raw_retention_days
+        self.daily_retention_days = daily_retention_days
+    
     def add_metric(self, metric_name: str, metric_value: float, 
                   metric_type: str, period: str, recorded_date: date) -> int:
         """Añade nueva métrica"""
-        conn = self.db.get_connection()
+        with self.db.connection() as conn:
+            cursor = conn.execute(self.INSERT_SQL, (metric_name, metric_value, metric_type, period, recorded_date))
+            
+            conn.commit()
+        
+        self.db.notify_write('company_metrics', 'metric_rollups')
+        return cursor.lastrowid
+    
+    def add_metrics(self, points: List[Dict], batch_size: int = 1000) -> int:
+        """Ingesta por lotes: un ``executemany`` por bloque en una sola transacción
         
-        cursor = conn.execute("""
-            INSERT INTO company_metrics (metric_name, metric_value, metric_type, period, recorded_date)
-            VALUES (?, ?, ?, ?, ?)
-        """, (metric_name, metric_value, metric_type, period, recorded_date))
+        Cada punto trae ``metric_name``, ``metric_value``, ``recorded_date`` (date)
+        y opcionalmente ``metric_type`` y ``period``. Devuelve los puntos insertados.
+        """
+        if not points:
+            return 0
         
-        conn.commit()
-        conn.close()
+        with self.db.connection() as conn:
+            try:
+                for start in range(0, len(points), batch_size):
+                    conn.executemany(self.INSERT_SQL, [
+                        (point['metric_name'], point['metric_value'], point.get('metric_type'),
+                         point.get('period'), point['recorded_date'].isoformat())
+                        for point in points[start:start + batch_size]
+                    ])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
         
-        return cursor.lastrowid
+        self.db.notify_write('company_metrics', 'metric_rollups')
+        return len(points)
+    
+    def _cutoff(self, days: int) -> Optional[date]:
+        return date.today() - timedelta(days=days) if days and days > 0 else None
+    
+    def choose_resolution(self, metric_name: str, date_from: date, date_to: date,
+                          max_points: int) -> str:
+        """Resolución más fina que cubre el rango completo en ``max_points`` puntos
+        
+        Se descartan los niveles cuya retención ya no cubre ``date_from``: los
+        puntos originales (raw) sólo si además caben contando las filas.
+        """
+        span_days = (date_to - date_from).days + 1
+        raw_cutoff = self._cutoff(self.raw_retention_days)
+        daily_cutoff = self._cutoff(self.daily_retention_days)
+        
+        if raw_cutoff is None or date_from >= raw_cutoff:
+            with self.db.connection() as conn:
+                # LIMIT: basta con saber si se supera el máximo
+                raw_points = conn.execute("""
+                    SELECT COUNT(*) FROM (
+                        SELECT 1 FROM company_metrics
+                        WHERE metric_name = ? AND recorded_date BETWEEN ? AND ?
+                        LIMIT ?
+                    )
+                """, (metric_name, date_from.isoformat(), date_to.isoformat(), max_points + 1)).fetchone()[0]
+            if raw_points <= max_points:
+                return 'raw'
+        
+        for resolution in ('day', 'week'):
+            if resolution == 'day' and daily_cutoff is not None and date_from < daily_cutoff:
+                continue
+            if math.ceil(span_days / self.RESOLUTIONS[resolution]) <= max_points:
+                return resolution
+        return 'month'
+    
+    def get_series(self, metric_name: str, date_from: date, date_to: date,
+                   resolution: str = 'auto', max_points: int = 500) -> Dict[str, Any]:
+        """Serie de una métrica en ``[date_from, date_to]``
+        
+        Con ``resolution='auto'`` se elige la más fina que quepa en
+        ``max_points`` (un año de datos diarios se sirve de ``day``, varios
+        años de ``week`` o ``month``). Los puntos agregados llevan
+        count/sum/min/max/avg/last del periodo.
+        """
+        if resolution == 'auto':
+            resolution = self.choose_resolution(metric_name, date_from, date_to, max_points)
+        elif resolution not in self.RESOLUTIONS:
+            raise ValueError(f"resolution debe ser una de: auto, {', '.join(self.RESOLUTIONS)}")
+        
+        with self.db.connection() as conn:
+            if resolution == 'raw':
+                rows = conn.execute("""
+                    SELECT recorded_date as date, metric_value as value, metric_type
+                    FROM company_metrics
+                    WHERE metric_name = ? AND recorded_date BETWEEN ? AND ?
+                    ORDER BY recorded_date, id
+                """, (metric_name, date_from.isoformat(), date_to.isoformat())).fetchall()
+                points = [dict(row) for row in rows]
+            else:
+                # Un periodo que empieza antes de date_from pero lo solapa también cuenta
+                rows = conn.execute("""
+                    SELECT bucket as date, points as count, sum_value as sum,
+                           min_value as min, max_value as max, last_value as last,
+                           last_date, metric_type
+                    FROM metric_rollups
+                    WHERE metric_name = ? AND resolution = ? AND bucket BETWEEN ? AND ?
+                    ORDER BY bucket
+                """, (metric_name, resolution, self._bucket(date_from, resolution).isoformat(),
+                      date_to.isoformat())).fetchall()
+                points = []
+                for row in rows:
+                    point = dict(row)
+                    point['avg'] = round(point['sum'] / point['count'], 4) if point['count'] else None
+                    point['sum'] = round(point['sum'], 4)
+                    points.append(point)
+        
+        return {
+            'metric_name': metric_name,
+            'resolution': resolution,
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'points': points
+        }
+    
+    @staticmethod
+    def _bucket(day: date, resolution: str) -> date:
+        """Primer día del periodo que contiene ``day`` (mismo criterio que los triggers)"""
+        if resolution == 'week':
+            return day - timedelta(days=day.weekday())
+        if resolution == 'month':
+            return day.replace(day=1)
+        return day
+    
+    def list_metrics(self) -> List[Dict]:
+        """Métricas conocidas con su rango y último valor, desde los acumulados mensuales"""
+        with self.db.connection() as conn:
+            rows = conn.execute("""
+                SELECT r.metric_name, r.metric_type, span.first_month, r.last_date,
+                       r.last_value, span.points
+                FROM (SELECT metric_name, MIN(bucket) as first_month, MAX(bucket) as latest_month,
+                             SUM(points) as points
+                      FROM metric_rollups WHERE resolution = 'month'
+                      GROUP BY metric_name) span
+                JOIN metric_rollups r
+                  ON r.metric_name = span.metric_name AND r.resolution = 'month'
+                 AND r.bucket = span.latest_month
+                ORDER BY r.metric_name
+            """).fetchall()
+        return [dict(row) for row in rows]
+    
+    def apply_retention(self) -> Dict[str, int]:
+        """Purga puntos originales y acumulados diarios fuera de su retención
+        
+        Los puntos ya están contados en sus acumulados; se conserva siempre el
+        más reciente de cada métrica (el dashboard lee el último valor).
+        Semanas y meses no caducan.
+        """
+        raw_cutoff = self._cutoff(self.raw_retention_days)
+        daily_cutoff = self._cutoff(self.daily_retention_days)
+        result = {'raw_deleted': 0, 'daily_deleted': 0}
+        if raw_cutoff is None and daily_cutoff is None:
+            return result
+        
+        with self.db.connection() as conn:
+            if raw_cutoff is not None:
+                result['raw_deleted'] = conn.execute("""
+                    DELETE FROM company_metrics
+                    WHERE recorded_date < ?
+                      AND recorded_date < (SELECT MAX(recorded_date) FROM company_metrics latest
+                                           WHERE latest.metric_name = company_metrics.metric_name)
+                """, (raw_cutoff.isoformat(),)).rowcount
+            if daily_cutoff is not None:
+                result['daily_deleted'] = conn.execute(
+                    "DELETE FROM metric_rollups WHERE resolution = 'day' AND bucket < ?",
+                    (daily_cutoff.isoformat(),)
+                ).rowcount
+            conn.commit()
+        
+        if result['raw_deleted']:
+            self.db.notify_write('company_metrics')
+        if result['daily_deleted']:
+            self.db.notify_write('metric_rollups')
+        return result
     
     def get_dashboard_metrics(self) -> Dict[str, Any]:
-        """Obtiene métricas principales para dashboard"""
-        conn = self.db.get_connection()
-        
-        # Métricas financieras más recientes
-        financial_metrics = conn.execute("""
-            SELECT metric_name, metric_value, recorded_date
-            FROM company_metrics 
-            WHERE metric_type = 'financial' 
-            AND recorded_date = (
-                SELECT MAX(recorded_date) 
+        """Obtiene métricas principales para dashboard desde el resumen materializado"""
+        with self.db.connection() as conn:
+            summary = conn.execute("SELECT * FROM dashboard_summary WHERE id = 1").fetchone()
+            if summary is None:
+                return self.compute_live_dashboard_metrics()
+            
+            # Métricas financieras de la fecha más reciente (índice metric_type, recorded_date)
+            financial_metrics = conn.execute("""
+                SELECT metric_name, metric_value, recorded_date
+                FROM company_metrics
+                WHERE metric_type = 'financial' AND recorded_date = ?
+            """, (summary['latest_financial_date'],)).fetchall()
+            
+            # Tareas completadas en los últimos 7 días (como mucho 8 filas)
+            completed_tasks = conn.execute("""
+                SELECT COALESCE(SUM(completed), 0)
+                FROM dashboard_task_completions
+                WHERE day >= date('now', '-7 days')
+            """).fetchone()[0]
+        
+        return {
+            'financial': [dict(m) for m in financial_metrics],
+            'projects': {
+                'total_projects': summary['total_projects'],
+                'active_projects': summary['active_projects'],
+                'completed_projects': summary['completed_projects'],
+                'avg_progress': (summary['progress_sum'] / summary['progress_count']
+                                 if summary['progress_count'] else None)
+            },
+            'employees': {
+                'total_employees': summary['total_employees'],
+                'avg_performance': (summary['performance_sum'] / summary['performance_count']
+                                    if summary['performance_count'] else None),
+                'departments': summary['active_departments']
+            },
+            'recent_activity': {'completed_tasks': completed_tasks}
+        }
+    
+    def rebuild_dashboard_summary(self):
+        """Recalcula desde cero el resumen materializado del dashboard"""
+        with self.db.connection() as conn:
+            conn.executescript(DASHBOARD_SUMMARY_REBUILD_SQL)
+    
+    def check_dashboard_summary(self, tolerance: float = 1e-6) -> List[Dict]:
+        """Compara el resumen materializado con las tablas base
+        
+        Devuelve la lista de discrepancias (vacía si todo cuadra).
+        """
+        materialized = self.get_dashboard_metrics()
+        live = self.compute_live_dashboard_metrics()
+        mismatches = []
+        
+        for section in ('projects', 'employees', 'recent_activity'):
+            for key, live_value in live[section].items():
+                stored_value = materialized[section].get(key)
+                if live_value is None and stored_value in (None, 0):
+                    continue
+                if stored_value is None or live_value is None or \
+                        abs(float(stored_value) - float(live_value)) > tolerance:
+                    mismatches.append({'metric': f'{section}.{key}',
+                                       'materialized': stored_value, 'live': live_value})
+        
+        if sorted(map(tuple, (m.values() for m in materialized['financial']))) != \
+                sorted(map(tuple, (m.values() for m in live['financial']))):
+            mismatches.append({'metric': 'financial',
+                               'materialized': materialized['financial'],
+                               'live': live['financial']})
+        
+        return mismatches
+    
+    def compute_live_dashboard_metrics(self) -> Dict[str, Any]:
+        """Calcula las métricas del dashboard agregando las tablas base
+        
+        Es la referencia con la que check_dashboard_summary() compara el resumen
+        materializado.
+        """
+        with self.db.connection() as conn:
+            # Métricas financieras más recientes
+            financial_metrics = conn.execute("""
+                SELECT metric_name, metric_value, recorded_date
                 FROM company_metrics 
-                WHERE metric_type = 'financial'
-            )
-        """).fetchall()
-        
-        # Estadísticas de proyectos
-        project_stats = conn.execute("""
-            SELECT 
-                COUNT(*) as total_projects,
-                SUM(CASE WHEN status = 'active' THEN 1 ELSE 0 END) as active_projects,
-                SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed_projects,
-                AVG(progress) as avg_progress
-            FROM projects
-        """).fetchone()
-        
-        # Estadísticas de empleados
-        employee_stats = conn.execute("""
-            SELECT 
-                COUNT(*) as total_employees,
-                AVG(performance_score) as avg_performance,
-                COUNT(DISTINCT department_id) as departments
-            FROM employees
-            WHERE status = 'active'
-        """).fetchone()
-        
-        # Tareas recientes
-        recent_tasks = conn.execute("""
-            SELECT COUNT(*) as completed_tasks
-            FROM tasks
-            WHERE status = 'completed' 
-            AND completed_at >= date('now', '-7 days')
-        """).fetchone()
-        
-        conn.close()
+                WHERE metric_type = 'financial' 
+                AND recorded_date = (
+                    SELECT MAX(recorded_date) 
+                    FROM company_metrics 
+                    WHERE metric_type = 'financial'
+                )
+            """).fetchall()
+            
+            # Estadísticas de proyectos
+            project_stats = conn.execute("""
+                SELECT 
+                    COUNT(*) as total_projects,
+                    SUM(CASE WHEN status = 'active' THEN 1 ELSE 0 END) as active_projects,
+                    SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed_projects,
+                    AVG(progress) as avg_progress
+                FROM projects
+            """).fetchone()
+            
+            # Estadísticas de empleados
+            employee_stats = conn.execute("""
+                SELECT 
+                    COUNT(*) as total_employees,
+                    AVG(performance_score) as avg_performance,
+                    COUNT(DISTINCT department_id) as departments
+                FROM employees
+                WHERE status = 'active'
+            """).fetchone()
+            
+            # Tareas recientes
+            recent_tasks = conn.execute("""
+                SELECT COUNT(*) as completed_tasks
+                FROM tasks
+                WHERE status = 'completed' 
+                AND completed_at >= date('now', '-7 days')
+            """).fetchone()
         
         return {
             'financial': [dict(m) for m in financial_metrics],
@@ -455,6 +2384,263 @@ class CompanyMetrics:
             'recent_activity': dict(recent_tasks)
         }
 
+class DepartmentAnalytics:
+    """Analítica por departamento sobre instantáneas diarias (migración 008)
+    
+    refresh() escribe la fila del día de cada departamento a partir de las
+    tablas vivas: el primer refresco del día recalcula todos y los siguientes
+    sólo los que los triggers marcaron en ``department_snapshot_dirty``. Las
+    lecturas (último estado y tendencias) consultan únicamente
+    ``department_snapshots``.
+    """
+    
+    SNAPSHOT_COLUMNS = (
+        'department_id', 'snapshot_date', 'headcount', 'avg_performance', 'salary_total',
+        'salary_min', 'salary_p25', 'salary_median', 'salary_p75', 'salary_max',
+        'budget', 'project_budget', 'project_spent', 'projects_planning',
+        'projects_active', 'projects_completed', 'projects_cancelled'
+    )
+    PROJECT_STATUSES = ('planning', 'active', 'completed', 'cancelled')
+    TREND_INTERVALS = {'day': '%Y-%m-%d', 'week': '%Y-%W', 'month': '%Y-%m'}
+    
+    UPSERT_SQL = f"""
+        INSERT INTO department_snapshots ({', '.join(SNAPSHOT_COLUMNS)}, refreshed_at)
+        VALUES ({', '.join('?' * len(SNAPSHOT_COLUMNS))}, CURRENT_TIMESTAMP)
+        ON CONFLICT (department_id, snapshot_date) DO UPDATE SET
+            {', '.join(f'{column} = excluded.{column}' for column in SNAPSHOT_COLUMNS[2:])},
+            refreshed_at = excluded.refreshed_at
+    """
+    
+    def __init__(self, db_manager: DatabaseManager, directory: NameDirectory = None):
+        self.db = db_manager
+        self.directory = directory or NameDirectory(db_manager)
+    
+    @staticmethod
+    def _percentile(values: List[float], fraction: float) -> Optional[float]:
+        """Percentil con interpolación lineal sobre una lista ordenada"""
+        if not values:
+            return None
+        position = (len(values) - 1) * fraction
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return round(values[lower] + (values[upper] - values[lower]) * (position - lower), 2)
+    
+    def _compute(self, conn, department_ids: List[int], snapshot_date: str) -> List[tuple]:
+        """Filas de instantánea para los departamentos dados, agregadas en SQLite"""
+        rows = []
+        for start in range(0, len(department_ids), NameDirectory.MAX_VARIABLES):
+            chunk = department_ids[start:start + NameDirectory.MAX_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            
+            budgets = dict(conn.execute(
+                f"SELECT id, budget FROM departments WHERE id IN ({placeholders})", chunk
+            ).fetchall())
+            staff = {row['department_id']: row for row in conn.execute(f"""
+                SELECT department_id, COUNT(*) as headcount,
+                       AVG(performance_score) as avg_performance,
+                       COALESCE(SUM(salary), 0) as salary_total
+                FROM employees
+                WHERE status = 'active' AND department_id IN ({placeholders})
+                GROUP BY department_id
+            """, chunk)}
+            salaries: Dict[int, List[float]] = {}
+            for department_id, salary in conn.execute(f"""
+                SELECT department_id, salary FROM employees
+                WHERE status = 'active' AND salary IS NOT NULL AND department_id IN ({placeholders})
+                ORDER BY department_id, salary
+            """, chunk):
+                salaries.setdefault(department_id, []).append(salary)
+            projects = {row['department_id']: row for row in conn.execute(f"""
+                SELECT department_id,
+                       COALESCE(SUM(budget), 0) as project_budget,
+                       COALESCE(SUM(spent_budget), 0) as project_spent,
+                       {', '.join(f"SUM(status = '{status}') as projects_{status}" for status in self.PROJECT_STATUSES)}
+                FROM projects
+                WHERE department_id IN ({placeholders})
+                GROUP BY department_id
+            """, chunk)}
+            
+            for department_id in chunk:
+                if department_id not in budgets:
+                    continue
+                people = staff.get(department_id)
+                pay = salaries.get(department_id, [])
+                work = projects.get(department_id)
+                rows.append((
+                    department_id, snapshot_date,
+                    people['headcount'] if people else 0,
+                    round(people['avg_performance'], 2) if people and people['avg_performance'] is not None else None,
+                    people['salary_total'] if people else 0,
+                    pay[0] if pay else None,
+                    self._percentile(pay, 0.25),
+                    self._percentile(pay, 0.5),
+                    self._percentile(pay, 0.75),
+                    pay[-1] if pay else None,
+                    budgets[department_id],
+                    work['project_budget'] if work else 0,
+                    work['project_spent'] if work else 0,
+                    *((work[f'projects_{status}'] or 0) if work else 0 for status in self.PROJECT_STATUSES)
+                ))
+        return rows
+    
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Actualiza la instantánea de hoy
+        
+        Incremental salvo con ``full`` o si hoy aún no hay instantánea; las
+        marcas de pendiente se consumen en la misma transacción.
+        """
+        started = time.perf_counter()
+        snapshot_date = date.today().isoformat()
+        
+        with self.db.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not full:
+                    full = conn.execute(
+                        "SELECT 1 FROM department_snapshots WHERE snapshot_date = ? LIMIT 1",
+                        (snapshot_date,)
+                    ).fetchone() is None
+                source = "departments" if full else "department_snapshot_dirty"
+                column = "id" if full else "department_id"
+                department_ids = [row[0] for row in conn.execute(f"SELECT {column} FROM {source}")]
+                
+                rows = self._compute(conn, department_ids, snapshot_date)
+                conn.executemany(self.UPSERT_SQL, rows)
+                conn.execute("DELETE FROM department_snapshot_dirty")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        if rows:
+            self.db.notify_write('department_snapshots')
+        return {
+            'snapshot_date': snapshot_date,
+            'mode': 'full' if full else 'incremental',
+            'departments': len(rows),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+    
+    def purge(self, retention_days: int) -> int:
+        """Elimina instantáneas más antiguas que ``retention_days``"""
+        if not retention_days or retention_days <= 0:
+            return 0
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM department_snapshots WHERE snapshot_date < date('now', ?)",
+                (f'-{int(retention_days)} days',)
+            )
+            conn.commit()
+        
+        if cursor.rowcount:
+            self.db.notify_write('department_snapshots')
+        return cursor.rowcount
+    
+    def pending(self) -> int:
+        """Departamentos con cambios aún no reflejados en la instantánea"""
+        with self.db.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM department_snapshot_dirty").fetchone()[0]
+    
+    def _decorate(self, row: Dict) -> Dict:
+        """Nombre del departamento e indicadores derivados de una fila"""
+        row['department_name'] = self.directory.departments().get(row.get('department_id'))
+        row['burn_rate'] = (round(row['project_spent'] / row['project_budget'], 4)
+                            if row['project_budget'] else None)
+        row['budget_allocated'] = (round(row['project_budget'] / row['budget'], 4)
+                                   if row.get('budget') else None)
+        return row
+    
+    def get_latest(self, department_id: int = None) -> List[Dict]:
+        """Última instantánea de cada departamento (o de uno)"""
+        query = """
+            SELECT s.* FROM department_snapshots s
+            WHERE s.snapshot_date = (SELECT MAX(snapshot_date) FROM department_snapshots
+                                     WHERE department_id = s.department_id)
+        """
+        params = []
+        if department_id:
+            query += " AND s.department_id = ?"
+            params.append(department_id)
+        query += " ORDER BY s.department_id"
+        
+        with self.db.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [self._decorate(dict(row)) for row in rows]
+    
+    def get_trend(self, department_id: int = None, interval: str = 'day',
+                  date_from: date = None, date_to: date = None) -> List[Dict]:
+        """Serie histórica desde las instantáneas
+        
+        Cada punto de ``week`` o ``month`` es la última instantánea del periodo
+        (son estados, no cantidades acumulables). Sin ``department_id`` se
+        suma toda la empresa y el rendimiento se pondera por plantilla; los
+        percentiles salariales sólo existen por departamento.
+        """
+        if interval not in self.TREND_INTERVALS:
+            raise ValueError(f"interval debe ser uno de: {', '.join(self.TREND_INTERVALS)}")
+        
+        where, params = ["1=1"], []
+        if department_id:
+            where.append("department_id = ?")
+            params.append(department_id)
+        if date_from:
+            where.append("snapshot_date >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            where.append("snapshot_date <= ?")
+            params.append(date_to.isoformat())
+        
+        # Último día con datos de cada periodo y departamento
+        latest = f"""
+            SELECT department_id, MAX(snapshot_date) as snapshot_date
+            FROM department_snapshots
+            WHERE {' AND '.join(where)}
+            GROUP BY department_id, strftime(?, snapshot_date)
+        """
+        params.append(self.TREND_INTERVALS[interval])
+        
+        if department_id:
+            query = f"""
+                SELECT s.* FROM ({latest}) l
+                JOIN department_snapshots s
+                  ON s.department_id = l.department_id AND s.snapshot_date = l.snapshot_date
+                ORDER BY s.snapshot_date
+            """
+        else:
+            query = f"""
+                SELECT MAX(s.snapshot_date) as snapshot_date,
+                       SUM(s.headcount) as headcount,
+                       SUM(s.avg_performance * s.headcount) / NULLIF(SUM(s.headcount), 0) as avg_performance,
+                       SUM(s.salary_total) as salary_total,
+                       MIN(s.salary_min) as salary_min, MAX(s.salary_max) as salary_max,
+                       SUM(s.budget) as budget,
+                       SUM(s.project_budget) as project_budget,
+                       SUM(s.project_spent) as project_spent,
+                       {', '.join(f'SUM(s.projects_{status}) as projects_{status}' for status in self.PROJECT_STATUSES)},
+                       COUNT(*) as departments
+                FROM ({latest}) l
+                JOIN department_snapshots s
+                  ON s.department_id = l.department_id AND s.snapshot_date = l.snapshot_date
+                GROUP BY strftime(?, s.snapshot_date)
+                ORDER BY 1
+            """
+            params.append(self.TREND_INTERVALS[interval])
+        
+        with self.db.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        series = []
+        for row in rows:
+            point = dict(row)
+            if point['avg_performance'] is not None:
+                point['avg_performance'] = round(point['avg_performance'], 2)
+            point['burn_rate'] = (round(point['project_spent'] / point['project_budget'], 4)
+                                  if point['project_budget'] else None)
+            if department_id:
+                point.pop('refreshed_at', None)
+            series.append(point)
+        return series
+
 # Función para inicializar la base de datos
 def init_db():
     """Inicializa la base de datos al ejecutar el archivo"""
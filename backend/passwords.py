@@ -0,0 +1,301 @@
+"""
+🔑 EnterprisePro - Hash de Contraseñas
+PBKDF2 ejecutado en un pool de procesos dedicado con límite de concurrencia
+Formato autodescriptivo: ``algoritmo$iteraciones$salt$hash``
+"""
+
+import hashlib
+import hmac
+import multiprocessing
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any, List
+
+PBKDF2_ITERATIONS = 100000
+
+class PasswordPoolBusyError(Exception):
+    """Demasiadas operaciones de hash en curso; la petición debe reintentarse"""
+
+def _pbkdf2_hex(password: str, salt: str, iterations: int) -> str:
+    """PBKDF2-SHA256 en hex (se ejecuta en los procesos del pool)"""
+    return hashlib.pbkdf2_hmac('sha256',
+                               password.encode('utf-8'),
+                               salt.encode('utf-8'),
+                               iterations).hex()
+
+class PBKDF2SHA256Hasher:
+    """Formato actual: ``pbkdf2_sha256$iteraciones$salt$hash``"""
+    
+    algorithm = 'pbkdf2_sha256'
+    
+    def __init__(self, iterations: int = PBKDF2_ITERATIONS):
+        self.iterations = int(iterations)
+    
+    def identify(self, encoded: str) -> bool:
+        return encoded.startswith(self.algorithm + '$')
+    
+    def encode(self, compute, password: str) -> str:
+        salt = secrets.token_hex(32)
+        return self.format(salt, compute(password, salt, self.iterations))
+    
+    def format(self, salt: str, digest: str) -> str:
+        """Hash almacenable para un (salt, digest) calculado con ``iterations``"""
+        return f"{self.algorithm}${self.iterations}${salt}${digest}"
+    
+    def verify(self, compute, password: str, encoded: str) -> bool:
+        try:
+            _, iterations, salt, stored_hash = encoded.split('$')
+            iterations = int(iterations)
+        except ValueError:
+            return False
+        return hmac.compare_digest(compute(password, salt, iterations), stored_hash)
+    
+    def must_update(self, encoded: str) -> bool:
+        try:
+            return int(encoded.split('$')[1]) != self.iterations
+        except (IndexError, ValueError):
+            return True
+
+class LegacyPBKDF2Hasher:
+    """Formato heredado ``salt$hash`` con 100.000 iteraciones
+    
+    Sólo verifica: no tiene ``encode`` porque los hashes nuevos siempre usan
+    el hasher configurado y ``must_update`` fuerza a regenerar estos al
+    iniciar sesión.
+    """
+    
+    algorithm = 'pbkdf2_legacy'
+    iterations = 100000
+    
+    def identify(self, encoded: str) -> bool:
+        return encoded.count('$') == 1
+    
+    def verify(self, compute, password: str, encoded: str) -> bool:
+        salt, stored_hash = encoded.split('$')
+        return hmac.compare_digest(compute(password, salt, self.iterations), stored_hash)
+    
+    def must_update(self, encoded: str) -> bool:
+        return True
+
+# Registro de hashers por algoritmo; identify_hasher() elige según el hash almacenado
+PASSWORD_HASHERS: Dict[str, Any] = {}
+
+def register_hasher(hasher) -> None:
+    """Registra (o sustituye) un hasher por su nombre de algoritmo"""
+    PASSWORD_HASHERS[hasher.algorithm] = hasher
+
+def identify_hasher(encoded: str):
+    """Devuelve el hasher capaz de verificar ``encoded`` o None"""
+    if not isinstance(encoded, str):
+        return None
+    for hasher in PASSWORD_HASHERS.values():
+        if hasher.identify(encoded):
+            return hasher
+    return None
+
+register_hasher(PBKDF2SHA256Hasher())
+register_hasher(LegacyPBKDF2Hasher())
+
+class PasswordWorkerPool:
+    """Pool de procesos para PBKDF2 con cola acotada y métricas de latencia
+    
+    - ``workers`` procesos calculan los hashes fuera de los hilos de Flask;
+      con ``workers=0`` se calcula en el propio hilo.
+    - Como máximo ``max_concurrency`` operaciones pueden estar en curso o en
+      espera; si no hay hueco en ``queue_timeout`` segundos se lanza
+      ``PasswordPoolBusyError`` en lugar de acumular peticiones.
+    """
+    
+    def __init__(self, workers: int = 2, max_concurrency: int = 8,
+                 queue_timeout: float = 2.0, iterations: int = PBKDF2_ITERATIONS):
+        self.workers = max(0, int(workers))
+        # Hasher con el que se crean los hashes nuevos (coste configurable)
+        self.hasher = PBKDF2SHA256Hasher(iterations)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.queue_timeout = queue_timeout
+        
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._stats = {'operations': 0, 'rejected': 0, 'in_flight': 0,
+                       'total_ms': 0.0, 'max_ms': 0.0,
+                       'batch_operations': 0, 'batch_ms': 0.0}
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Crea el pool de procesos bajo demanda"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # spawn: no hereda los hilos (pool de BD, auditoría) del proceso padre
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+    
+    def pbkdf2(self, password: str, salt: str, iterations: int) -> str:
+        """Calcula PBKDF2 respetando el límite de concurrencia"""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            raise PasswordPoolBusyError(
+                f"Cola de hash llena (max_concurrency={self.max_concurrency})"
+            )
+        
+        with self._stats_lock:
+            self._stats['in_flight'] += 1
+        start = time.perf_counter()
+        try:
+            if self.workers:
+                return self._get_executor().submit(
+                    _pbkdf2_hex, password, salt, iterations
+                ).result()
+            return _pbkdf2_hex(password, salt, iterations)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._slots.release()
+            with self._stats_lock:
+                self._stats['in_flight'] -= 1
+                self._stats['operations'] += 1
+                self._stats['total_ms'] += elapsed_ms
+                self._stats['max_ms'] = max(self._stats['max_ms'], elapsed_ms)
+                self._latencies.append(elapsed_ms)
+    
+    def hash_password(self, password: str) -> str:
+        """Hash seguro de contraseña con el hasher y coste configurados"""
+        return self.hasher.encode(self.pbkdf2, password)
+    
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hashes de un lote repartidos entre todos los procesos del pool
+        
+        El lote ocupa un único hueco de concurrencia y nunca tiene más de
+        ``workers`` hashes encolados a la vez, así que los inicios de sesión
+        concurrentes se intercalan en lugar de esperar al lote completo.
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            raise PasswordPoolBusyError(
+                f"Cola de hash llena (max_concurrency={self.max_concurrency})"
+            )
+        
+        with self._stats_lock:
+            self._stats['in_flight'] += 1
+        iterations = self.hasher.iterations
+        salts = [secrets.token_hex(32) for _ in passwords]
+        start = time.perf_counter()
+        try:
+            if self.workers:
+                executor = self._get_executor()
+                digests, pending = [], deque()
+                for password, salt in zip(passwords, salts):
+                    if len(pending) >= self.workers:
+                        digests.append(pending.popleft().result())
+                    pending.append(executor.submit(_pbkdf2_hex, password, salt, iterations))
+                digests.extend(future.result() for future in pending)
+            else:
+                digests = [_pbkdf2_hex(password, salt, iterations)
+                           for password, salt in zip(passwords, salts)]
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._slots.release()
+            with self._stats_lock:
+                self._stats['in_flight'] -= 1
+                self._stats['batch_operations'] += len(passwords)
+                self._stats['batch_ms'] += elapsed_ms
+        
+        return [self.hasher.format(salt, digest) for salt, digest in zip(salts, digests)]
+    
+    def verify_password(self, password: str, password_hash: str) -> bool:
+        """Verifica contraseña contra hash en tiempo constante"""
+        hasher = identify_hasher(password_hash)
+        if hasher is None:
+            return False
+        return hasher.verify(self.pbkdf2, password, password_hash)
+    
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Indica si el hash usa un formato o coste distinto del configurado"""
+        hasher = identify_hasher(password_hash)
+        if hasher is None or hasher.algorithm != self.hasher.algorithm:
+            return True
+        return self.hasher.must_update(password_hash)
+    
+    def warmup(self):
+        """Arranca los procesos del pool antes de la primera petición"""
+        if self.workers:
+            executor = self._get_executor()
+            for future in [executor.submit(_pbkdf2_hex, '', '', 1)
+                           for _ in range(self.workers)]:
+                future.result()
+    
+    def shutdown(self):
+        """Detiene los procesos del pool"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de latencia del hash (ms)"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+        
+        operations = stats.pop('operations')
+        total_ms = stats.pop('total_ms')
+        batch_ms = stats.pop('batch_ms')
+        stats.update({
+            'algorithm': self.hasher.algorithm,
+            'iterations': self.hasher.iterations,
+            'workers': self.workers,
+            'max_concurrency': self.max_concurrency,
+            'operations': operations,
+            'avg_ms': round(total_ms / operations, 2) if operations else 0.0,
+            'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2) if latencies else 0.0,
+            'max_ms': round(stats['max_ms'], 2),
+            # Importaciones masivas: ms por hash con el lote repartido entre procesos
+            'batch_avg_ms': round(batch_ms / stats['batch_operations'], 2) if stats['batch_operations'] else 0.0
+        })
+        return stats
+
+_default_pool: Optional[PasswordWorkerPool] = None
+_default_pool_lock = threading.Lock()
+
+def configure_password_pool(**kwargs) -> PasswordWorkerPool:
+    """Sustituye el pool por defecto (se llama al crear la aplicación)"""
+    global _default_pool
+    with _default_pool_lock:
+        previous, _default_pool = _default_pool, PasswordWorkerPool(**kwargs)
+    if previous is not None:
+        previous.shutdown()
+    return _default_pool
+
+def get_password_pool() -> PasswordWorkerPool:
+    """Pool compartido por AuthManager y los modelos"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = PasswordWorkerPool(workers=0)
+    return _default_pool
+
+def hash_password(password: str) -> str:
+    """Atajo: hash con el pool por defecto"""
+    return get_password_pool().hash_password(password)
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Atajo: hashes de un lote con el pool por defecto"""
+    return get_password_pool().hash_many(passwords)
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """Atajo: verificación con el pool por defecto"""
+    return get_password_pool().verify_password(password, password_hash)
+
+def needs_rehash(password_hash: str) -> bool:
+    """Atajo: comprobación de formato/coste con el pool por defecto"""
+    return get_password_pool().needs_rehash(password_hash)
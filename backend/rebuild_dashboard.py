@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Reconstruye y verifica el resumen materializado del dashboard
+
+Uso:
+    python3 rebuild_dashboard.py          # recalcula y verifica
+    python3 rebuild_dashboard.py --check  # sólo verifica
+"""
+import sys
+
+from models import DatabaseManager, CompanyMetrics
+
+def rebuild_dashboard(check_only: bool = False) -> int:
+    db_manager = DatabaseManager()
+    metrics = CompanyMetrics(db_manager)
+    
+    if not check_only:
+        metrics.rebuild_dashboard_summary()
+        print("✅ Resumen del dashboard recalculado")
+    
+    mismatches = metrics.check_dashboard_summary()
+    db_manager.close()
+    
+    if mismatches:
+        print(f"❌ {len(mismatches)} discrepancias entre el resumen y las tablas base:")
+        for mismatch in mismatches:
+            print(f"   {mismatch['metric']}: resumen={mismatch['materialized']} real={mismatch['live']}")
+        return 1
+    
+    print("✅ El resumen del dashboard coincide con las tablas base")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(rebuild_dashboard(check_only='--check' in sys.argv))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+🚀 EnterprisePro - Servidor de producción multiproceso (Gunicorn)
+
+El proceso maestro crea la aplicación una sola vez (preload: migraciones,
+permisos compilados, instantáneas iniciales) y hace fork de N workers
+``gthread``. Cada worker arranca después sus propios hilos de fondo y abre
+sus conexiones bajo demanda en su pool; los contadores de versión por tabla
+están en memoria compartida, de modo que las cachés en proceso de cada
+worker se invalidan con las escrituras de los demás.
+
+Señales (al proceso maestro):
+    HUP    recarga: vuelve a leer la configuración, recrea la aplicación y
+           sustituye los workers de forma ordenada (sin cortar peticiones)
+    TERM   parada ordenada; QUIT / INT parada inmediata
+    TTIN / TTOU  un worker más / menos
+
+Uso:
+    python3 server.py                              # un worker por núcleo en 0.0.0.0:5000
+    python3 server.py --workers 8 --bind 127.0.0.1:8000
+"""
+import argparse
+import os
+import runpy
+
+from gunicorn.app.base import BaseApplication
+
+# Valores base de config.py (raíz del proyecto); el entorno tiene prioridad
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.py')
+
+SERVER_DEFAULTS = {
+    'SERVER_BIND': ('0.0.0.0:5000', str),
+    'SERVER_WORKERS': (0, int),
+    'SERVER_THREADS': (8, int),
+    'SERVER_KEEPALIVE': (5, int),
+    'SERVER_TIMEOUT': (60, int),
+    'SERVER_GRACEFUL_TIMEOUT': (30, int),
+    'SERVER_MAX_REQUESTS': (0, int),
+    'SERVER_MAX_REQUESTS_JITTER': (0, int),
+    'SERVER_BACKLOG': (2048, int)
+}
+
+def read_config() -> dict:
+    """Variables de config.py (vacío si no existe)"""
+    try:
+        return runpy.run_path(CONFIG_PATH)
+    except (OSError, SyntaxError):
+        return {}
+
+def load_settings(base: dict) -> dict:
+    """Ajustes SERVER_* de config.py y del entorno"""
+    settings = {}
+    for name, (default, cast) in SERVER_DEFAULTS.items():
+        settings[name] = cast(os.environ.get(name, base.get(name, default)))
+    if settings['SERVER_WORKERS'] <= 0:
+        settings['SERVER_WORKERS'] = os.cpu_count() or 1
+    return settings
+
+def gunicorn_options(settings: dict) -> dict:
+    """Traduce los ajustes a la configuración de Gunicorn"""
+    return {
+        'bind': settings['SERVER_BIND'],
+        'workers': settings['SERVER_WORKERS'],
+        'worker_class': 'gthread',
+        'threads': settings['SERVER_THREADS'],
+        'keepalive': settings['SERVER_KEEPALIVE'],
+        'timeout': settings['SERVER_TIMEOUT'],
+        'graceful_timeout': settings['SERVER_GRACEFUL_TIMEOUT'],
+        'max_requests': settings['SERVER_MAX_REQUESTS'],
+        'max_requests_jitter': settings['SERVER_MAX_REQUESTS_JITTER'],
+        'backlog': settings['SERVER_BACKLOG'],
+        'preload_app': True,
+        'proc_name': 'enterprisepro',
+        'accesslog': None,
+        'errorlog': '-',
+        'post_fork': post_fork,
+        'worker_exit': worker_exit
+    }
+
+def post_fork(server, worker):
+    """Ya en el worker: hilos de fondo e identidad para /api/health/details"""
+    worker.app.wsgi().start_worker(worker.age)
+
+def worker_exit(server, worker):
+    """Vacía la auditoría pendiente y cierra las conexiones del worker"""
+    worker.app.wsgi().shutdown()
+
+class EnterpriseServer(BaseApplication):
+    """Aplicación Gunicorn que precarga EnterprisePro en el maestro"""
+    
+    def __init__(self, overrides: dict = None):
+        self.overrides = overrides or {}
+        super().__init__()
+    
+    def load_config(self):
+        base = read_config()
+        settings = load_settings(base)
+        settings.update(self.overrides)
+        for name, value in gunicorn_options(settings).items():
+            self.cfg.set(name, value)
+        
+        cache_type = os.environ.get('CACHE_TYPE', base.get('CACHE_TYPE', 'simple'))
+        if settings['SERVER_WORKERS'] > 1 and cache_type == 'simple':
+            print("ℹ️ CACHE_TYPE=simple: cada worker llena su propia caché de respuestas "
+                  "(filesystem la comparte entre procesos)")
+    
+    def load(self):
+        from app import create_app
+        os.environ.setdefault('FLASK_DEBUG', 'False')
+        return create_app(preload=True)
+    
+    def reload(self):
+        """SIGHUP: relee la configuración y vuelve a crear la aplicación precargada
+        
+        Al descartar la instancia precargada, el árbitro crea otra (con
+        contadores de versión nuevos) antes de lanzar los workers de
+        reemplazo. El código de los módulos ya importados no cambia: para
+        eso hace falta reiniciar o USR2.
+        """
+        self.callable = None
+        super().reload()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de producción de EnterprisePro")
+    parser.add_argument('--workers', type=int, help="Procesos worker (por defecto, uno por núcleo)")
+    parser.add_argument('--threads', type=int, help="Hilos por worker")
+    parser.add_argument('--bind', help="Dirección de escucha, p. ej. 0.0.0.0:5000")
+    args = parser.parse_args()
+    
+    overrides = {}
+    if args.workers:
+        overrides['SERVER_WORKERS'] = args.workers
+    if args.threads:
+        overrides['SERVER_THREADS'] = args.threads
+    if args.bind:
+        overrides['SERVER_BIND'] = args.bind
+    EnterpriseServer(overrides).run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,391 @@
+"""
+📡 EnterprisePro - Canal de Eventos (SSE)
+Hub de difusión: cada cambio se serializa una vez y se reparte a N suscriptores
+Métricas del dashboard (deltas), progreso de proyectos y notificaciones
+"""
+
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Callable
+
+class StreamFullError(Exception):
+    """Se alcanzó el máximo de conexiones SSE simultáneas"""
+
+class Subscriber:
+    """Conexión SSE: cola acotada de frames ya serializados
+    
+    ``waker``, si se asigna, se llama tras cada frame encolado o al cerrar;
+    el servidor ASGI lo usa para despertar la corrutina de la conexión en
+    lugar de bloquear un hilo en ``queue.get``.
+    
+    ``role``, ``expires_at`` (``exp`` del token) y ``token_digest`` describen
+    la sesión que abrió la conexión: el canal termina al caducar el token y
+    ``EventHub.disconnect`` lo cierra si la sesión se revoca.
+    """
+    
+    def __init__(self, user_id: int, can: Callable[[str], bool], queue_size: int,
+                 role: str = None, expires_at: float = None, token_digest: str = None):
+        self.user_id = user_id
+        self.can = can
+        self.role = role
+        self.expires_at = expires_at
+        self.token_digest = token_digest
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+        self.waker: Optional[Callable[[], None]] = None
+    
+    def wait_time(self, keepalive: float) -> float:
+        """Segundos hasta el próximo keepalive o hasta que caduque el token"""
+        if self.expires_at is None:
+            return keepalive
+        return min(keepalive, self.expires_at - time.time())
+    
+    def offer(self, frame: Optional[bytes]) -> bool:
+        """Encola un frame (None = fin); si la cola está llena, False"""
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            return False
+        self.wake()
+        return True
+    
+    def wake(self):
+        waker = self.waker
+        if waker is not None:
+            waker()
+    
+    def accepts(self, permission: Optional[str], user_id: Optional[int]) -> bool:
+        """Eventos dirigidos a otro usuario o sin permiso suficiente no se entregan"""
+        if user_id is not None and user_id != self.user_id:
+            return False
+        return permission is None or self.can(permission)
+
+class EventHub:
+    """Difusión en proceso con colas por suscriptor y búfer de repetición
+    
+    - ``publish`` serializa el evento una sola vez y lo encola en todos los
+      suscriptores que pueden verlo.
+    - Un cliente lento que llena su cola se desconecta; al reconectar envía
+      ``Last-Event-ID`` y recupera lo perdido desde el búfer de repetición.
+    """
+    
+    def __init__(self, max_subscribers: int = 100, queue_size: int = 100,
+                 replay_size: int = 200):
+        self.max_subscribers = max(1, int(max_subscribers))
+        self.queue_size = max(1, int(queue_size))
+        self._subscribers = set()
+        self._replay = deque(maxlen=replay_size)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stats = {'published': 0, 'delivered': 0, 'dropped': 0, 'rejected': 0,
+                       'disconnected': 0}
+    
+    @staticmethod
+    def _frame(event: str, data: Any, event_id: int = None) -> bytes:
+        lines = [f"id: {event_id}"] if event_id is not None else []
+        lines.append(f"event: {event}")
+        lines.append(f"data: {json.dumps(data, default=str)}")
+        return ('\n'.join(lines) + '\n\n').encode('utf-8')
+    
+    def subscribe(self, user_id: int, can: Callable[[str], bool],
+                  last_event_id: int = None, **session) -> Subscriber:
+        """Registra una conexión; con ``last_event_id`` repite los eventos posteriores
+        
+        ``session`` son los datos de sesión de ``Subscriber`` (``role``,
+        ``expires_at``, ``token_digest``).
+        """
+        subscriber = Subscriber(user_id, can, self.queue_size, **session)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self._stats['rejected'] += 1
+                raise StreamFullError(f"Máximo de {self.max_subscribers} conexiones SSE")
+            
+            if last_event_id is not None:
+                for event_id, frame, permission, target in self._replay:
+                    if event_id > last_event_id and subscriber.accepts(permission, target):
+                        if not subscriber.offer(frame):
+                            break
+            self._subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.closed = True
+        subscriber.waker = None
+        with self._lock:
+            self._subscribers.discard(subscriber)
+    
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+    
+    def subscribers(self) -> list:
+        with self._lock:
+            return list(self._subscribers)
+    
+    def disconnect(self, predicate: Callable[[Subscriber], bool]) -> int:
+        """Cierra las conexiones que cumplen ``predicate`` (sesión revocada, usuario inactivo...)"""
+        with self._lock:
+            subscribers = [subscriber for subscriber in self._subscribers
+                           if not subscriber.closed and predicate(subscriber)]
+            self._stats['disconnected'] += len(subscribers)
+        for subscriber in subscribers:
+            subscriber.closed = True
+            if not subscriber.offer(None):
+                subscriber.wake()
+        return len(subscribers)
+    
+    def send(self, subscriber: Subscriber, event: str, data: Any):
+        """Evento sólo para un suscriptor (sin id: no altera Last-Event-ID)"""
+        if not subscriber.offer(self._frame(event, data)):
+            subscriber.closed = True
+            subscriber.wake()
+    
+    def publish(self, event: str, data: Any, permission: str = None,
+                user_id: int = None) -> int:
+        """Difunde un evento; devuelve a cuántos suscriptores se entregó"""
+        with self._lock:
+            self._seq += 1
+            frame = self._frame(event, data, self._seq)
+            self._replay.append((self._seq, frame, permission, user_id))
+            subscribers = list(self._subscribers)
+        
+        delivered = dropped = 0
+        for subscriber in subscribers:
+            if not subscriber.accepts(permission, user_id):
+                continue
+            if subscriber.offer(frame):
+                delivered += 1
+            else:
+                subscriber.closed = True
+                subscriber.wake()
+                dropped += 1
+        
+        with self._lock:
+            self._stats['published'] += 1
+            self._stats['delivered'] += delivered
+            self._stats['dropped'] += dropped
+        return delivered
+    
+    def listen(self, subscriber: Subscriber, keepalive: float = 15.0):
+        """Generador de frames SSE; comentario de keepalive si no hay eventos
+        
+        Termina al cerrarse la conexión o al caducar el token de la sesión.
+        """
+        try:
+            yield b"retry: 3000\n\n"
+            while not subscriber.closed:
+                timeout = subscriber.wait_time(keepalive)
+                if timeout <= 0:
+                    break
+                try:
+                    frame = subscriber.queue.get(timeout=timeout)
+                except queue.Empty:
+                    if subscriber.wait_time(keepalive) > 0:
+                        yield b": keepalive\n\n"
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+    
+    async def listen_async(self, subscriber: Subscriber, keepalive: float = 15.0):
+        """Como ``listen`` pero sin ocupar un hilo por conexión
+        
+        La corrutina duerme en el bucle de eventos hasta que ``publish`` (desde
+        el hilo del canal) la despierta a través de ``Subscriber.waker``.
+        """
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        
+        def waker():
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # Bucle ya cerrado
+        
+        subscriber.waker = waker
+        try:
+            yield b"retry: 3000\n\n"
+            while not subscriber.closed:
+                timeout = subscriber.wait_time(keepalive)
+                if timeout <= 0:
+                    break
+                ready.clear()
+                try:
+                    frame = subscriber.queue.get_nowait()
+                except queue.Empty:
+                    try:
+                        await asyncio.wait_for(ready.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        if subscriber.wait_time(keepalive) > 0:
+                            yield b": keepalive\n\n"
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+    
+    def close(self):
+        """Cierra todas las conexiones abiertas"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for subscriber in subscribers:
+            subscriber.closed = True
+            if not subscriber.offer(None):
+                subscriber.wake()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['subscribers'] = len(self._subscribers)
+        stats['max_subscribers'] = self.max_subscribers
+        return stats
+
+def metrics_delta(old: Dict, new: Dict) -> Dict:
+    """Claves de ``new`` que cambiaron respecto a ``old`` (recursivo en diccionarios)"""
+    delta = {}
+    for key, value in new.items():
+        previous = old.get(key) if isinstance(old, dict) else None
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = metrics_delta(previous, value)
+            if nested:
+                delta[key] = nested
+        elif value != previous:
+            delta[key] = value
+    return delta
+
+class DashboardFeed:
+    """Convierte escrituras de los modelos en eventos del hub
+    
+    Un único hilo agrupa los cambios durante ``debounce`` segundos y calcula
+    las métricas una vez por lote, haya uno o cien suscriptores. Las
+    notificaciones se leen por id creciente cada ``poll_interval`` segundos,
+    y sólo mientras haya alguien escuchando. ``sync``, si se indica, se llama
+    antes de cada lote para recoger las escrituras de otros procesos.
+    """
+    
+    METRIC_TABLES = frozenset({'projects', 'employees', 'tasks', 'company_metrics'})
+    
+    def __init__(self, hub: EventHub, metrics_loader: Callable[[], Dict],
+                 notifications, poll_interval: float = 5.0, debounce: float = 0.25,
+                 sync: Optional[Callable[[], Any]] = None):
+        self.hub = hub
+        self.metrics_loader = metrics_loader
+        self.notifications = notifications
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.sync = sync
+        
+        self._metrics = None
+        self._last_notification = None
+        self._dirty = set()
+        self._progress = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'batches': 0, 'metric_computations': 0, 'errors': 0}
+    
+    def on_write(self, tables):
+        """Listener de DatabaseManager.notify_write"""
+        with self._lock:
+            self._dirty.update(tables)
+        self._wake.set()
+    
+    def on_progress(self, project_id: int, progress: float):
+        """Listener de Project.update_progress (se queda el último valor por proyecto)"""
+        with self._lock:
+            self._progress[project_id] = progress
+        self._wake.set()
+    
+    def snapshot(self) -> Dict:
+        """Métricas completas para un suscriptor nuevo
+        
+        Reutiliza la última calculada salvo que haya cambios pendientes; en
+        ese caso carga una copia fresca sin tocar la base de los deltas.
+        """
+        with self._lock:
+            stale = self._metrics is None or bool(self._dirty & self.METRIC_TABLES)
+            metrics = self._metrics
+        if not stale:
+            return metrics
+        
+        metrics = self.metrics_loader()
+        with self._lock:
+            if self._metrics is None:
+                self._metrics = metrics
+        return metrics
+    
+    def dispatch(self):
+        """Publica lo acumulado desde el último lote"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            progress, self._progress = self._progress, {}
+        
+        if not self.hub.subscriber_count():
+            # Nadie escucha: la próxima conexión parte de una instantánea nueva
+            with self._lock:
+                self._metrics = None
+            self._last_notification = None
+            return
+        
+        self._stats['batches'] += 1
+        for project_id, value in progress.items():
+            self.hub.publish('project_progress',
+                             {'project_id': project_id, 'progress': value},
+                             permission='project.read')
+        
+        if dirty & self.METRIC_TABLES:
+            metrics = self.metrics_loader()
+            self._stats['metric_computations'] += 1
+            with self._lock:
+                previous, self._metrics = self._metrics, metrics
+            delta = metrics_delta(previous or {}, metrics)
+            if delta:
+                self.hub.publish('metrics', delta, permission='metrics.read')
+        
+        if self._last_notification is None:
+            self._last_notification = self.notifications.latest_id()
+        for notification in self.notifications.get_since(self._last_notification):
+            self._last_notification = notification['id']
+            self.hub.publish('notification', notification, user_id=notification['user_id'])
+    
+    def _run(self):
+        while not self._stop.is_set():
+            if self._wake.wait(self.poll_interval):
+                # Agrupar ráfagas de escrituras en un único cálculo
+                self._stop.wait(self.debounce)
+            if self._stop.is_set():
+                break
+            try:
+                if self.sync is not None:
+                    self.sync()
+                self._wake.clear()
+                self.dispatch()
+            except Exception as e:
+                self._stats['errors'] += 1
+                print(f"⚠️ Error en el canal de eventos: {e}")
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='dashboard-feed', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats['poll_interval'] = self.poll_interval
+        return stats
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+🧪 EnterprisePro - Pruebas del punto de entrada ASGI
+
+Ejecuta la aplicación ASGI sin servidor (receive/send simulados) sobre una
+copia de ``enterprise.db`` en un directorio temporal:
+    
+    cd backend && python3 -m unittest test_asgi
+"""
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+async def asgi_request(application, method: str, path: str, body: bytes = b'',
+                       headers=(), disconnect_after: int = 0) -> tuple:
+    """(status, headers, cuerpo) de una petición HTTP contra la app ASGI
+    
+    Con ``disconnect_after`` el cliente se desconecta tras recibir ese
+    número de trozos del cuerpo.
+    """
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'root_path': '',
+        'query_string': query.encode('latin-1'), 'http_version': '1.1', 'scheme': 'http',
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+        'headers': [(b'content-type', b'application/json'), *headers]
+    }
+    finished = asyncio.Event()
+    requested = False
+    response = {'status': None, 'headers': [], 'chunks': []}
+    
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+    
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = message.get('headers', [])
+            return
+        response['chunks'].append(message.get('body', b''))
+        if not message.get('more_body') or len(response['chunks']) == disconnect_after:
+            finished.set()
+    
+    await application(scope, receive, send)
+    finished.set()
+    return response['status'], dict(response['headers']), b''.join(response['chunks'])
+
+class AsgiExportTest(unittest.TestCase):
+    """Exportaciones en streaming a través de la app ASGI"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.previous_dir = os.getcwd()
+        cls.previous_env = dict(os.environ)
+        cls.workdir = tempfile.mkdtemp(prefix='enterprisepro-asgi-')
+        shutil.copy(os.path.join(BACKEND_DIR, 'enterprise.db'), cls.workdir)
+        os.chdir(cls.workdir)
+        os.environ.update({
+            'FLASK_DEBUG': 'False',
+            'CACHE_DIR': os.path.join(cls.workdir, 'cache'),
+            # Un trozo por fila: el iterable avanza muchas veces por exportación
+            'EXPORT_BATCH_SIZE': '1',
+            'PASSWORD_WORKERS': '0'
+        })
+        if BACKEND_DIR not in sys.path:
+            sys.path.insert(0, BACKEND_DIR)
+        from asgi import create_asgi_app
+        
+        cls.loop = asyncio.new_event_loop()
+        cls.application = create_asgi_app(executor_threads=4)
+        status, _, body = cls.call('POST', '/api/auth/login', body=json.dumps(
+            {'email': 'admin@enterprise.com', 'password': 'admin123'}).encode('utf-8'))
+        assert status == 200, body
+        token = json.loads(body)['tokens']['access_token']
+        cls.auth = [(b'authorization', f"Bearer {token}".encode('latin-1'))]
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.application.shutdown()
+        cls.loop.close()
+        os.chdir(cls.previous_dir)
+        os.environ.clear()
+        os.environ.update(cls.previous_env)
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+    
+    @classmethod
+    def call(cls, method: str, path: str, **kwargs) -> tuple:
+        return cls.loop.run_until_complete(asgi_request(cls.application, method, path, **kwargs))
+    
+    def gather(self, *requests) -> list:
+        """Peticiones GET autenticadas en paralelo dentro del mismo bucle"""
+        async def run_all():
+            return await asyncio.gather(
+                *(asgi_request(self.application, 'GET', path, headers=self.auth, **kwargs)
+                  for path, kwargs in requests)
+            )
+        return self.loop.run_until_complete(run_all())
+    
+    def assert_pool_released(self):
+        status = self.application.enterprise.db_manager.pool_status()
+        self.assertEqual(status['in_use'], 0)
+        self.assertLessEqual(status['idle'], status['created'] - status['discarded'])
+    
+    def test_concurrent_exports(self):
+        """Varias exportaciones a la vez junto a rutas normales no descuadran el pool"""
+        results = self.gather(
+            *[('/api/export/projects?format=ndjson', {})] * 3,
+            *[('/api/projects?per_page=5', {})] * 3
+        )
+        exports, listings = results[:3], results[3:]
+        for status, headers, body in exports:
+            self.assertEqual(status, 200)
+            self.assertNotIn(b'content-length', headers)
+            rows = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+            self.assertGreater(len(rows), 1)
+        self.assertEqual(len({body for _, _, body in exports}), 1)
+        for status, _, _ in listings:
+            self.assertEqual(status, 200)
+        
+        self.assert_pool_released()
+        status, _, _ = self.call('GET', '/api/users', headers=self.auth)
+        self.assertEqual(status, 200)
+    
+    def test_client_disconnect(self):
+        """El iterable se cierra en su hilo aunque el cliente corte la exportación"""
+        results = self.gather(*[('/api/export/projects?format=csv', {'disconnect_after': 2})] * 3)
+        for status, _, body in results:
+            self.assertEqual(status, 200)
+            self.assertTrue(body)
+        
+        self.assert_pool_released()
+        status, _, _ = self.call('GET', '/api/export/projects?format=csv', headers=self.auth)
+        self.assertEqual(status, 200)
+        self.assert_pool_released()
+
+if __name__ == '__main__':
+    unittest.main()
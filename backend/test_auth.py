@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+🧪 EnterprisePro - Pruebas de la rotación de refresh tokens
+
+``POST /api/auth/refresh`` con el cliente de pruebas de Flask sobre una copia
+de ``enterprise.db``:
+    
+    cd backend && python3 -m unittest test_auth
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class RefreshRotationTest(unittest.TestCase):
+    """Rotación, margen de reutilización y revocación por familia"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.previous_dir = os.getcwd()
+        cls.previous_env = dict(os.environ)
+        cls.workdir = tempfile.mkdtemp(prefix='enterprisepro-auth-')
+        shutil.copy(os.path.join(BACKEND_DIR, 'enterprise.db'), cls.workdir)
+        os.chdir(cls.workdir)
+        os.environ.update({
+            'FLASK_DEBUG': 'False',
+            'CACHE_DIR': os.path.join(cls.workdir, 'cache'),
+            'PASSWORD_WORKERS': '0'
+        })
+        if BACKEND_DIR not in sys.path:
+            sys.path.insert(0, BACKEND_DIR)
+        from app import create_app
+        
+        cls.enterprise = create_app()
+        cls.db = cls.enterprise.db_manager
+        cls.client = cls.enterprise.app.test_client()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.enterprise.shutdown()
+        os.chdir(cls.previous_dir)
+        os.environ.clear()
+        os.environ.update(cls.previous_env)
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+    
+    def login(self, email: str = 'developer1@enterprise.com', password: str = 'emp123') -> str:
+        """Refresh token de un login nuevo (una familia por llamada)"""
+        response = self.client.post('/api/auth/login', json={'email': email, 'password': password})
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return response.get_json()['tokens']['refresh_token']
+    
+    def refresh(self, refresh_token: str):
+        return self.client.post('/api/auth/refresh', json={'refresh_token': refresh_token})
+    
+    def claims(self, refresh_token: str) -> dict:
+        return self.enterprise.auth_manager.verify_token(refresh_token)
+    
+    def family(self, refresh_token: str) -> dict:
+        """{jti: revocado} de la familia del token"""
+        with self.db.connection() as conn:
+            rows = conn.execute(
+                "SELECT jti, revoked_at IS NOT NULL FROM refresh_tokens WHERE family_id = ?",
+                (self.claims(refresh_token)['fam'],)
+            ).fetchall()
+        return dict(rows)
+    
+    def age_rotation(self, refresh_token: str, seconds: int):
+        """Simula que ``refresh_token`` se rotó hace ``seconds`` segundos"""
+        with self.db.connection() as conn:
+            conn.execute(
+                "UPDATE refresh_tokens SET revoked_at = datetime('now', ?) WHERE jti = ?",
+                (f'-{seconds} seconds', self.claims(refresh_token)['jti'])
+            )
+            conn.commit()
+    
+    def test_rotate_returns_new_token(self):
+        """Cada refresh consume el token y emite otro de la misma familia"""
+        old = self.login()
+        response = self.refresh(old)
+        self.assertEqual(response.status_code, 200)
+        tokens = response.get_json()
+        new = tokens['refresh_token']
+        
+        self.assertNotEqual(new, old)
+        self.assertTrue(tokens['access_token'])
+        self.assertEqual(self.claims(new)['fam'], self.claims(old)['fam'])
+        self.assertNotEqual(self.claims(new)['jti'], self.claims(old)['jti'])
+        self.assertEqual(self.family(old), {self.claims(old)['jti']: 1, self.claims(new)['jti']: 0})
+    
+    def test_replay_within_grace_keeps_family(self):
+        """Repetir el token rotado dentro del margen es 401, pero su sustituto sigue valiendo"""
+        old = self.login()
+        new = self.refresh(old).get_json()['refresh_token']
+        
+        self.assertEqual(self.refresh(old).status_code, 401)
+        self.assertEqual(self.family(old)[self.claims(new)['jti']], 0)
+        
+        response = self.refresh(new)
+        self.assertEqual(response.status_code, 200)
+    
+    def test_replay_after_grace_revokes_family(self):
+        """Repetir el token rotado pasado el margen revoca toda la familia"""
+        old = self.login()
+        new = self.refresh(old).get_json()['refresh_token']
+        self.age_rotation(old, self.enterprise.refresh_store.REUSE_GRACE_SECONDS + 5)
+        
+        self.assertEqual(self.refresh(old).status_code, 401)
+        self.assertTrue(all(self.family(old).values()))
+        self.assertEqual(self.refresh(new).status_code, 401)
+    
+    def test_refresh_fails_for_inactive_user(self):
+        """Un usuario desactivado no renueva su sesión y su familia queda revocada"""
+        refresh_token = self.login('developer2@enterprise.com', 'emp123')
+        user_id = self.claims(refresh_token)['user_id']
+        
+        def set_active(active: int):
+            with self.db.connection() as conn:
+                conn.execute("UPDATE users SET is_active = ? WHERE id = ?", (active, user_id))
+                conn.commit()
+            self.db.notify_write('users')
+        
+        set_active(0)
+        self.addCleanup(set_active, 1)
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)
+        self.assertTrue(all(self.family(refresh_token).values()))
+        
+        set_active(1)
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
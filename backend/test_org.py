@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+🧪 EnterprisePro - Pruebas de la jerarquía organizativa
+
+OrgChart sobre la tabla de clausura y permisos de las rutas /api/org, con el
+cliente de pruebas de Flask sobre una copia de ``enterprise.db``:
+    
+    cd backend && python3 -m unittest test_org
+
+Jerarquía de los datos de ejemplo (ids de usuario): 1 → 4 → {7, 8, 9};
+2 → 5 → {10, 11}; 2 → 6 → {12}.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class OrgChartTest(unittest.TestCase):
+    """Clausura, ciclos y autorización de la jerarquía de reporte"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.previous_dir = os.getcwd()
+        cls.previous_env = dict(os.environ)
+        cls.workdir = tempfile.mkdtemp(prefix='enterprisepro-org-')
+        shutil.copy(os.path.join(BACKEND_DIR, 'enterprise.db'), cls.workdir)
+        os.chdir(cls.workdir)
+        os.environ.update({
+            'FLASK_DEBUG': 'False',
+            'CACHE_DIR': os.path.join(cls.workdir, 'cache'),
+            'PASSWORD_WORKERS': '0'
+        })
+        if BACKEND_DIR not in sys.path:
+            sys.path.insert(0, BACKEND_DIR)
+        from app import create_app
+        
+        cls.enterprise = create_app()
+        cls.org_chart = cls.enterprise.org_chart
+        cls.client = cls.enterprise.app.test_client()
+        cls.admin = cls.login('admin@enterprise.com', 'admin123')
+        cls.manager = cls.login('manager.tech@enterprise.com', 'manager123')
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.enterprise.shutdown()
+        os.chdir(cls.previous_dir)
+        os.environ.clear()
+        os.environ.update(cls.previous_env)
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+    
+    @classmethod
+    def login(cls, email: str, password: str) -> dict:
+        response = cls.client.post('/api/auth/login', json={'email': email, 'password': password})
+        assert response.status_code == 200, response.get_json()
+        return {'Authorization': f"Bearer {response.get_json()['tokens']['access_token']}"}
+    
+    def chain(self, user_id: int) -> list:
+        return [row['user_id'] for row in self.org_chart.get_chain(user_id)]
+    
+    def team(self, user_id: int) -> set:
+        return {row['user_id'] for row in self.org_chart.get_team(user_id)}
+    
+    def move(self, user_id: int, manager_user_id: int, previous_manager_user_id: int):
+        """set_manager y vuelta al superior original al terminar la prueba"""
+        self.assertTrue(self.org_chart.set_manager(user_id, manager_user_id))
+        self.addCleanup(self.org_chart.set_manager, user_id, previous_manager_user_id)
+    
+    def test_manager_reads_own_subtree_only(self):
+        """Un manager ve equipo, cadena y agregados de su subárbol, no los de otro manager"""
+        for path in ('/api/org/4/team', '/api/org/4/rollup', '/api/org/7/team',
+                     '/api/org/7/chain', '/api/org/9/rollup'):
+            self.assertEqual(self.client.get(path, headers=self.manager).status_code, 200, path)
+        
+        for user_id in (5, 10, 12):
+            for view in ('team', 'chain', 'rollup'):
+                path = f'/api/org/{user_id}/{view}'
+                self.assertEqual(self.client.get(path, headers=self.manager).status_code, 403, path)
+        
+        response = self.client.get('/api/org/4/team', headers=self.manager)
+        self.assertEqual({row['user_id'] for row in response.get_json()['team']}, {7, 8, 9})
+    
+    def test_move_subtree_rewrites_closure(self):
+        """Mover a un manager recoloca a todo su subárbol en la clausura"""
+        self.assertEqual(self.chain(7), [4, 1])
+        self.move(4, 5, previous_manager_user_id=1)
+        
+        self.assertEqual(self.chain(4), [5, 2])
+        self.assertEqual(self.chain(7), [4, 5, 2])
+        self.assertEqual(self.team(5), {4, 7, 8, 9, 10, 11})
+        self.assertEqual(self.team(2), {4, 5, 6, 7, 8, 9, 10, 11, 12})
+        self.assertEqual(self.team(1), set())
+        self.assertTrue(self.org_chart.is_in_reporting_line(5, 9))
+        self.assertFalse(self.org_chart.is_in_reporting_line(1, 9))
+        
+        rollup = self.org_chart.get_rollup(5)
+        self.assertEqual(rollup['levels'], 2)
+        self.assertIn(4, [branch['user_id'] for branch in rollup['direct_reports']])
+    
+    def test_cycle_is_rejected(self):
+        """Un superior dentro del propio subárbol (o uno mismo) lanza ValueError sin cambiar nada"""
+        for manager_user_id in (7, 4):
+            with self.assertRaises(ValueError):
+                self.org_chart.set_manager(4, manager_user_id)
+        self.assertEqual(self.chain(4), [1])
+        self.assertEqual(self.chain(7), [4, 1])
+        self.assertEqual(self.team(4), {7, 8, 9})
+        
+        response = self.client.put('/api/org/4/manager', headers=self.admin, json={'manager_user_id': 9})
+        self.assertEqual(response.status_code, 409)
+    
+    def test_non_admin_cannot_detach_or_move_self(self):
+        """Un manager no quita superiores ni cambia el suyo; sí reorganiza su subárbol"""
+        for user_id, manager_user_id in ((4, None), (4, 5), (4, 7), (7, None)):
+            response = self.client.put(f'/api/org/{user_id}/manager', headers=self.manager,
+                                       json={'manager_user_id': manager_user_id})
+            self.assertEqual(response.status_code, 403, (user_id, manager_user_id))
+        self.assertEqual(self.chain(4), [1])
+        self.assertEqual(self.chain(7), [4, 1])
+        
+        # Fuera de su subárbol tampoco, ni como empleado ni como nuevo superior
+        for user_id, manager_user_id in ((10, 4), (9, 10)):
+            response = self.client.put(f'/api/org/{user_id}/manager', headers=self.manager,
+                                       json={'manager_user_id': manager_user_id})
+            self.assertEqual(response.status_code, 403, (user_id, manager_user_id))
+        
+        self.addCleanup(self.org_chart.set_manager, 9, 4)
+        response = self.client.put('/api/org/9/manager', headers=self.manager, json={'manager_user_id': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.chain(9), [7, 4, 1])
+
+if __name__ == '__main__':
+    unittest.main()
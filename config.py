@@ -7,6 +7,9 @@ DATABASE_URL = 'enterprise.db'
 JWT_ALGORITHM = 'HS256'
 JWT_ACCESS_TOKEN_EXPIRES = 28800  # 8 hours
 JWT_REFRESH_TOKEN_EXPIRES = 604800  # 7 days
+TOKEN_CACHE_SIZE = 10000  # Tokens verificados en caché (LRU)
+TOKEN_CACHE_TTL = 300  # Segundos máximos en caché (nunca más allá del exp del token)
+IDENTITY_CACHE_TTL = 300  # Caché id → email/rol usada al renovar tokens
 
 # CORS Configuration
 CORS_ORIGINS = [
@@ -24,12 +27,25 @@ COMPANY_NAME = 'Your Company Name'
 DB_POOL_SIZE = 10
 DB_MAX_OVERFLOW = 20
 DB_POOL_TIMEOUT = 30
+DB_PRAGMA_PROFILE = 'production'  # production, strict, legacy
+DB_PRAGMAS = {}  # Overrides por PRAGMA, p. ej. {'mmap_size': 0}
+DB_MAINTENANCE_INTERVAL = 300  # Segundos entre checkpoint del WAL y PRAGMA optimize
+
+# Audit Settings
+AUDIT_MODE = 'async'  # async (cola + lotes en segundo plano) o sync (estricto)
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 1.0  # Segundos máximos antes de volcar un lote
 
 # Security Settings
 PASSWORD_MIN_LENGTH = 6
 PASSWORD_REQUIRE_SPECIAL = False
 PASSWORD_REQUIRE_NUMBERS = False
 PASSWORD_REQUIRE_UPPERCASE = False
+PASSWORD_HASH_ITERATIONS = 100000  # Coste PBKDF2 de los hashes nuevos; los antiguos se migran al iniciar sesión
+PASSWORD_WORKERS = 2  # Procesos dedicados a PBKDF2 (0 = en el hilo de la petición)
+PASSWORD_MAX_CONCURRENCY = 8  # Hashes en curso o en espera antes de rechazar con 503
+PASSWORD_QUEUE_TIMEOUT = 2.0  # Segundos de espera por un hueco en la cola de hash
 
 # Upload Settings (for future use)
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
@@ -48,9 +64,49 @@ MAIL_DEFAULT_SENDER = ''
 DEFAULT_PAGE_SIZE = 20
 MAX_PAGE_SIZE = 100
 
-# Cache Settings (for future use)
-CACHE_TYPE = 'simple'
-CACHE_DEFAULT_TIMEOUT = 300
+# Cache Settings (caché de respuestas de lectura)
+CACHE_TYPE = 'simple'  # simple (LRU en proceso), filesystem (SQLite en CACHE_DIR, compartida entre workers) o null
+CACHE_DEFAULT_TIMEOUT = 300  # Segundos; las escrituras invalidan antes por tabla
+CACHE_MAX_ENTRIES = 1000
+# CACHE_DIR = '/var/cache/enterprisepro'  # Por defecto backend/cache
+
+# Real-time stream (SSE en /api/stream)
+STREAM_MAX_SUBSCRIBERS = 100  # Conexiones simultáneas por proceso (503 al superarlo)
+STREAM_KEEPALIVE = 15  # Segundos entre comentarios keepalive
+STREAM_POLL_INTERVAL = 5  # Segundos entre lecturas de notificaciones nuevas
+
+# Exports (/api/export/<recurso>)
+EXPORT_BATCH_SIZE = 500  # Filas por fetchmany; acota la memoria de cada exportación
+
+# Bulk imports (/api/users/import)
+IMPORT_CHUNK_SIZE = 500  # Filas por transacción y por registro de auditoría
+IMPORT_MAX_ROWS = 10000
+
+# Timesheets (/api/timesheets)
+TIMESHEET_MAX_ENTRIES = 200  # Entradas por envío semanal
+
+# Company metrics time series (/api/metrics)
+METRICS_INGEST_MAX_POINTS = 10000  # Puntos por petición de ingesta
+METRICS_RAW_RETENTION_DAYS = 180  # Puntos originales; antes sólo quedan los acumulados (0 = sin purga)
+METRICS_DAILY_RETENTION_DAYS = 730  # Acumulados diarios; semanas y meses no caducan (0 = sin purga)
+
+# Department analytics (/api/reports/departments)
+ANALYTICS_RETENTION_DAYS = 730  # Días de instantáneas diarias que se conservan (0 = sin purga)
+ANALYTICS_SNAPSHOT_MAX_AGE = 300  # Segundos máximos de las columnas NumPy en memoria (/api/reports/projects, ...)
+
+# Production server (backend/server.py: Gunicorn con preload y workers gthread)
+SERVER_BIND = '0.0.0.0:5000'
+SERVER_WORKERS = 0  # Procesos worker (0 = uno por núcleo)
+SERVER_THREADS = 8  # Hilos por worker; cada conexión SSE ocupa uno mientras está abierta
+SERVER_KEEPALIVE = 5  # Segundos que se mantiene abierta una conexión keep-alive ociosa
+SERVER_TIMEOUT = 60  # Un worker sin responder durante más tiempo se reinicia
+SERVER_GRACEFUL_TIMEOUT = 30  # Segundos para terminar las peticiones en curso al recargar o parar
+SERVER_MAX_REQUESTS = 0  # Reciclar cada worker tras N peticiones (0 = nunca)
+SERVER_MAX_REQUESTS_JITTER = 0  # Variación aleatoria para no reciclar todos a la vez
+SERVER_BACKLOG = 2048  # Conexiones pendientes de aceptar
+
+# ASGI server (backend/asgi.py: SSE nativo, resto de rutas en un executor)
+ASGI_EXECUTOR_THREADS = 0  # Hilos para SQLite y Flask (0 = DB_POOL_SIZE + DB_MAX_OVERFLOW)
 
 # Logging
 LOG_LEVEL = 'INFO'
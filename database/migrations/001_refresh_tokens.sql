@@ -0,0 +1,19 @@
+-- 🔄 Refresh tokens con rotación y revocación
+-- Un registro por refresh token emitido; la PK (jti) permite validar y rotar
+-- con una sola búsqueda indexada. Todos los tokens de un login comparten
+-- family_id, de modo que reutilizar un token ya rotado revoca la familia.
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    jti VARCHAR(64) PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    family_id VARCHAR(64) NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMP,
+    replaced_by VARCHAR(64),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens(family_id);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens(user_id);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires ON refresh_tokens(expires_at);
@@ -0,0 +1,9 @@
+-- 📑 Índices compuestos para paginación por cursor (created_at, id)
+-- Permiten que cada página sea un rango del índice en lugar de un OFFSET que
+-- recorre y descarta todas las filas anteriores.
+
+CREATE INDEX IF NOT EXISTS idx_users_created_id ON users(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_users_role_created_id ON users(role, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_projects_created_id ON projects(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_projects_status_created_id ON projects(status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_projects_department_created_id ON projects(department_id, created_at, id);
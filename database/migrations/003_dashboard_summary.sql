@@ -0,0 +1,229 @@
+-- 📊 Resumen materializado del dashboard
+-- Una fila (id = 1) con los agregados de /api/dashboard/metrics, mantenida de
+-- forma incremental por triggers. Las medias se guardan como suma + conteo
+-- para poder sumar y restar contribuciones.
+
+CREATE TABLE IF NOT EXISTS dashboard_summary (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_projects INTEGER NOT NULL DEFAULT 0,
+    active_projects INTEGER NOT NULL DEFAULT 0,
+    completed_projects INTEGER NOT NULL DEFAULT 0,
+    progress_sum REAL NOT NULL DEFAULT 0,
+    progress_count INTEGER NOT NULL DEFAULT 0,
+    total_employees INTEGER NOT NULL DEFAULT 0,
+    performance_sum REAL NOT NULL DEFAULT 0,
+    performance_count INTEGER NOT NULL DEFAULT 0,
+    active_departments INTEGER NOT NULL DEFAULT 0,
+    latest_financial_date DATE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Empleados activos por departamento (para COUNT(DISTINCT department_id))
+CREATE TABLE IF NOT EXISTS dashboard_department_counts (
+    department_id INTEGER PRIMARY KEY,
+    active_employees INTEGER NOT NULL DEFAULT 0
+);
+
+-- Tareas completadas por día (ventana de los últimos 7 días)
+CREATE TABLE IF NOT EXISTS dashboard_task_completions (
+    day DATE PRIMARY KEY,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_metrics_type_date ON company_metrics(metric_type, recorded_date);
+
+-- Estado inicial a partir de los datos existentes
+INSERT OR REPLACE INTO dashboard_department_counts (department_id, active_employees)
+SELECT department_id, COUNT(*) FROM employees
+WHERE status = 'active' AND department_id IS NOT NULL
+GROUP BY department_id;
+
+DELETE FROM dashboard_task_completions;
+INSERT INTO dashboard_task_completions (day, completed)
+SELECT date(completed_at), COUNT(*) FROM tasks
+WHERE status = 'completed' AND date(completed_at) IS NOT NULL
+GROUP BY date(completed_at);
+
+INSERT OR REPLACE INTO dashboard_summary (
+    id, total_projects, active_projects, completed_projects, progress_sum, progress_count,
+    total_employees, performance_sum, performance_count, active_departments, latest_financial_date
+)
+SELECT 1,
+    (SELECT COUNT(*) FROM projects),
+    (SELECT COUNT(*) FROM projects WHERE status = 'active'),
+    (SELECT COUNT(*) FROM projects WHERE status = 'completed'),
+    (SELECT COALESCE(SUM(progress), 0) FROM projects),
+    (SELECT COUNT(progress) FROM projects),
+    (SELECT COUNT(*) FROM employees WHERE status = 'active'),
+    (SELECT COALESCE(SUM(performance_score), 0) FROM employees WHERE status = 'active'),
+    (SELECT COUNT(performance_score) FROM employees WHERE status = 'active'),
+    (SELECT COUNT(*) FROM dashboard_department_counts WHERE active_employees > 0),
+    (SELECT MAX(recorded_date) FROM company_metrics WHERE metric_type = 'financial');
+
+-- ============================================
+-- Proyectos
+-- ============================================
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_projects_insert
+AFTER INSERT ON projects
+BEGIN
+    UPDATE dashboard_summary SET
+        total_projects = total_projects + 1,
+        active_projects = active_projects + (NEW.status IS 'active'),
+        completed_projects = completed_projects + (NEW.status IS 'completed'),
+        progress_sum = progress_sum + COALESCE(NEW.progress, 0),
+        progress_count = progress_count + (NEW.progress IS NOT NULL),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_projects_update
+AFTER UPDATE OF status, progress ON projects
+BEGIN
+    UPDATE dashboard_summary SET
+        active_projects = active_projects - (OLD.status IS 'active') + (NEW.status IS 'active'),
+        completed_projects = completed_projects - (OLD.status IS 'completed') + (NEW.status IS 'completed'),
+        progress_sum = progress_sum - COALESCE(OLD.progress, 0) + COALESCE(NEW.progress, 0),
+        progress_count = progress_count - (OLD.progress IS NOT NULL) + (NEW.progress IS NOT NULL),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_projects_delete
+AFTER DELETE ON projects
+BEGIN
+    UPDATE dashboard_summary SET
+        total_projects = total_projects - 1,
+        active_projects = active_projects - (OLD.status IS 'active'),
+        completed_projects = completed_projects - (OLD.status IS 'completed'),
+        progress_sum = progress_sum - COALESCE(OLD.progress, 0),
+        progress_count = progress_count - (OLD.progress IS NOT NULL),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+END;
+
+-- ============================================
+-- Empleados (sólo cuentan los activos)
+-- ============================================
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_employees_insert
+AFTER INSERT ON employees
+WHEN NEW.status IS 'active'
+BEGIN
+    INSERT INTO dashboard_department_counts (department_id, active_employees)
+    SELECT NEW.department_id, 1 WHERE NEW.department_id IS NOT NULL
+    ON CONFLICT(department_id) DO UPDATE SET active_employees = active_employees + 1;
+    
+    UPDATE dashboard_summary SET
+        total_employees = total_employees + 1,
+        performance_sum = performance_sum + COALESCE(NEW.performance_score, 0),
+        performance_count = performance_count + (NEW.performance_score IS NOT NULL),
+        active_departments = (SELECT COUNT(*) FROM dashboard_department_counts WHERE active_employees > 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_employees_update
+AFTER UPDATE OF status, performance_score, department_id ON employees
+BEGIN
+    UPDATE dashboard_department_counts SET active_employees = active_employees - 1
+    WHERE department_id = OLD.department_id AND OLD.status IS 'active';
+    
+    INSERT INTO dashboard_department_counts (department_id, active_employees)
+    SELECT NEW.department_id, 1 WHERE NEW.department_id IS NOT NULL AND NEW.status IS 'active'
+    ON CONFLICT(department_id) DO UPDATE SET active_employees = active_employees + 1;
+    
+    UPDATE dashboard_summary SET
+        total_employees = total_employees - (OLD.status IS 'active') + (NEW.status IS 'active'),
+        performance_sum = performance_sum
+            - CASE WHEN OLD.status IS 'active' THEN COALESCE(OLD.performance_score, 0) ELSE 0 END
+            + CASE WHEN NEW.status IS 'active' THEN COALESCE(NEW.performance_score, 0) ELSE 0 END,
+        performance_count = performance_count
+            - (OLD.status IS 'active' AND OLD.performance_score IS NOT NULL)
+            + (NEW.status IS 'active' AND NEW.performance_score IS NOT NULL),
+        active_departments = (SELECT COUNT(*) FROM dashboard_department_counts WHERE active_employees > 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_employees_delete
+AFTER DELETE ON employees
+WHEN OLD.status IS 'active'
+BEGIN
+    UPDATE dashboard_department_counts SET active_employees = active_employees - 1
+    WHERE department_id = OLD.department_id;
+    
+    UPDATE dashboard_summary SET
+        total_employees = total_employees - 1,
+        performance_sum = performance_sum - COALESCE(OLD.performance_score, 0),
+        performance_count = performance_count - (OLD.performance_score IS NOT NULL),
+        active_departments = (SELECT COUNT(*) FROM dashboard_department_counts WHERE active_employees > 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+END;
+
+-- ============================================
+-- Tareas completadas
+-- ============================================
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_tasks_insert
+AFTER INSERT ON tasks
+WHEN NEW.status IS 'completed' AND date(NEW.completed_at) IS NOT NULL
+BEGIN
+    INSERT INTO dashboard_task_completions (day, completed)
+    VALUES (date(NEW.completed_at), 1)
+    ON CONFLICT(day) DO UPDATE SET completed = completed + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_tasks_update
+AFTER UPDATE OF status, completed_at ON tasks
+BEGIN
+    UPDATE dashboard_task_completions SET completed = completed - 1
+    WHERE day = date(OLD.completed_at) AND OLD.status IS 'completed';
+    
+    INSERT INTO dashboard_task_completions (day, completed)
+    SELECT date(NEW.completed_at), 1
+    WHERE NEW.status IS 'completed' AND date(NEW.completed_at) IS NOT NULL
+    ON CONFLICT(day) DO UPDATE SET completed = completed + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_tasks_delete
+AFTER DELETE ON tasks
+WHEN OLD.status IS 'completed'
+BEGIN
+    UPDATE dashboard_task_completions SET completed = completed - 1
+    WHERE day = date(OLD.completed_at);
+END;
+
+-- ============================================
+-- Métricas financieras (fecha más reciente)
+-- ============================================
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_metrics_insert
+AFTER INSERT ON company_metrics
+WHEN NEW.metric_type IS 'financial'
+BEGIN
+    UPDATE dashboard_summary SET
+        latest_financial_date = NEW.recorded_date,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1 AND (latest_financial_date IS NULL OR NEW.recorded_date > latest_financial_date);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_metrics_update
+AFTER UPDATE OF metric_type, recorded_date ON company_metrics
+BEGIN
+    UPDATE dashboard_summary SET
+        latest_financial_date = (SELECT MAX(recorded_date) FROM company_metrics WHERE metric_type = 'financial'),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_metrics_delete
+AFTER DELETE ON company_metrics
+WHEN OLD.metric_type IS 'financial'
+BEGIN
+    UPDATE dashboard_summary SET
+        latest_financial_date = (SELECT MAX(recorded_date) FROM company_metrics WHERE metric_type = 'financial'),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+END;
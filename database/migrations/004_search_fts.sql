@@ -0,0 +1,88 @@
+-- 🔎 Búsqueda de texto completo (FTS5) sobre proyectos, usuarios, tareas y comentarios
+-- Índices de contenido externo: el texto vive sólo en la tabla base y los
+-- triggers mantienen el índice sincronizado en cada INSERT / UPDATE / DELETE.
+-- remove_diacritics: 'gestion' encuentra 'Gestión'; prefix acelera las búsquedas por prefijo.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5(
+    name, description, client_name,
+    content='projects', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS projects_fts_ai AFTER INSERT ON projects BEGIN
+    INSERT INTO projects_fts(rowid, name, description, client_name) VALUES (new.id, new.name, new.description, new.client_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS projects_fts_ad AFTER DELETE ON projects BEGIN
+    INSERT INTO projects_fts(projects_fts, rowid, name, description, client_name) VALUES ('delete', old.id, old.name, old.description, old.client_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS projects_fts_au AFTER UPDATE OF name, description, client_name ON projects BEGIN
+    INSERT INTO projects_fts(projects_fts, rowid, name, description, client_name) VALUES ('delete', old.id, old.name, old.description, old.client_name);
+    INSERT INTO projects_fts(rowid, name, description, client_name) VALUES (new.id, new.name, new.description, new.client_name);
+END;
+
+INSERT INTO projects_fts(projects_fts) VALUES ('rebuild');
+
+CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+    first_name, last_name, email,
+    content='users', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+    INSERT INTO users_fts(rowid, first_name, last_name, email) VALUES (new.id, new.first_name, new.last_name, new.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+    INSERT INTO users_fts(users_fts, rowid, first_name, last_name, email) VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF first_name, last_name, email ON users BEGIN
+    INSERT INTO users_fts(users_fts, rowid, first_name, last_name, email) VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+    INSERT INTO users_fts(rowid, first_name, last_name, email) VALUES (new.id, new.first_name, new.last_name, new.email);
+END;
+
+INSERT INTO users_fts(users_fts) VALUES ('rebuild');
+
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+    title, description,
+    content='tasks', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+    INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+    INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN
+    INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
+
+INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild');
+
+CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+    comment,
+    content='comments', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS comments_fts_ai AFTER INSERT ON comments BEGIN
+    INSERT INTO comments_fts(rowid, comment) VALUES (new.id, new.comment);
+END;
+
+CREATE TRIGGER IF NOT EXISTS comments_fts_ad AFTER DELETE ON comments BEGIN
+    INSERT INTO comments_fts(comments_fts, rowid, comment) VALUES ('delete', old.id, old.comment);
+END;
+
+CREATE TRIGGER IF NOT EXISTS comments_fts_au AFTER UPDATE OF comment ON comments BEGIN
+    INSERT INTO comments_fts(comments_fts, rowid, comment) VALUES ('delete', old.id, old.comment);
+    INSERT INTO comments_fts(rowid, comment) VALUES (new.id, new.comment);
+END;
+
+INSERT INTO comments_fts(comments_fts) VALUES ('rebuild');
@@ -0,0 +1,85 @@
+-- ⏱️ Acumulados semanales de horas
+-- Una fila por (usuario, proyecto, semana) mantenida por triggers sobre
+-- time_entries: los informes de horas leen estas filas en lugar de agregar
+-- la tabla de registros. Las semanas empiezan en lunes y las horas sin
+-- proyecto se acumulan con project_id = 0.
+
+CREATE TABLE IF NOT EXISTS time_entry_weekly (
+    user_id INTEGER NOT NULL,
+    project_id INTEGER NOT NULL DEFAULT 0,
+    week_start DATE NOT NULL,
+    hours REAL NOT NULL DEFAULT 0,
+    billable_hours REAL NOT NULL DEFAULT 0,
+    entries INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, project_id, week_start)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_time_weekly_project ON time_entry_weekly(project_id, week_start);
+CREATE INDEX IF NOT EXISTS idx_time_weekly_week ON time_entry_weekly(week_start);
+
+-- Hojas de horas por usuario y día (validación del máximo diario, semana propia)
+CREATE INDEX IF NOT EXISTS idx_time_entries_user_date ON time_entries(user_id, entry_date);
+
+-- Estado inicial a partir de los registros existentes
+DELETE FROM time_entry_weekly;
+INSERT INTO time_entry_weekly (user_id, project_id, week_start, hours, billable_hours, entries)
+SELECT user_id, COALESCE(project_id, 0), date(entry_date, 'weekday 0', '-6 days'),
+       SUM(hours), SUM(CASE WHEN billable THEN hours ELSE 0 END), COUNT(*)
+FROM time_entries
+GROUP BY user_id, COALESCE(project_id, 0), date(entry_date, 'weekday 0', '-6 days');
+
+CREATE TRIGGER IF NOT EXISTS trg_time_weekly_insert
+AFTER INSERT ON time_entries
+BEGIN
+    INSERT INTO time_entry_weekly (user_id, project_id, week_start, hours, billable_hours, entries)
+    VALUES (NEW.user_id, COALESCE(NEW.project_id, 0), date(NEW.entry_date, 'weekday 0', '-6 days'),
+            NEW.hours, CASE WHEN NEW.billable THEN NEW.hours ELSE 0 END, 1)
+    ON CONFLICT (user_id, project_id, week_start) DO UPDATE SET
+        hours = hours + excluded.hours,
+        billable_hours = billable_hours + excluded.billable_hours,
+        entries = entries + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_time_weekly_delete
+AFTER DELETE ON time_entries
+BEGIN
+    UPDATE time_entry_weekly SET
+        hours = hours - OLD.hours,
+        billable_hours = billable_hours - CASE WHEN OLD.billable THEN OLD.hours ELSE 0 END,
+        entries = entries - 1
+    WHERE user_id = OLD.user_id
+      AND project_id = COALESCE(OLD.project_id, 0)
+      AND week_start = date(OLD.entry_date, 'weekday 0', '-6 days');
+
+    DELETE FROM time_entry_weekly
+    WHERE user_id = OLD.user_id
+      AND project_id = COALESCE(OLD.project_id, 0)
+      AND week_start = date(OLD.entry_date, 'weekday 0', '-6 days')
+      AND entries <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_time_weekly_update
+AFTER UPDATE OF user_id, project_id, hours, entry_date, billable ON time_entries
+BEGIN
+    UPDATE time_entry_weekly SET
+        hours = hours - OLD.hours,
+        billable_hours = billable_hours - CASE WHEN OLD.billable THEN OLD.hours ELSE 0 END,
+        entries = entries - 1
+    WHERE user_id = OLD.user_id
+      AND project_id = COALESCE(OLD.project_id, 0)
+      AND week_start = date(OLD.entry_date, 'weekday 0', '-6 days');
+
+    DELETE FROM time_entry_weekly
+    WHERE user_id = OLD.user_id
+      AND project_id = COALESCE(OLD.project_id, 0)
+      AND week_start = date(OLD.entry_date, 'weekday 0', '-6 days')
+      AND entries <= 0;
+
+    INSERT INTO time_entry_weekly (user_id, project_id, week_start, hours, billable_hours, entries)
+    VALUES (NEW.user_id, COALESCE(NEW.project_id, 0), date(NEW.entry_date, 'weekday 0', '-6 days'),
+            NEW.hours, CASE WHEN NEW.billable THEN NEW.hours ELSE 0 END, 1)
+    ON CONFLICT (user_id, project_id, week_start) DO UPDATE SET
+        hours = hours + excluded.hours,
+        billable_hours = billable_hours + excluded.billable_hours,
+        entries = entries + 1;
+END;
@@ -0,0 +1,70 @@
+-- 📋 Contadores de tareas en projects
+-- total_tasks / completed_tasks / blocked_tasks se mantienen por triggers en
+-- la misma transacción que la escritura de la tarea, así que el detalle y el
+-- listado de proyectos los leen sin agregar tasks. Con auto_progress = 1 el
+-- progreso se deriva de los contadores.
+-- ALTER TABLE ... ADD COLUMN no admite IF NOT EXISTS: schema_migrations
+-- garantiza que este script sólo se ejecuta una vez por base de datos.
+
+ALTER TABLE projects ADD COLUMN total_tasks INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE projects ADD COLUMN completed_tasks INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE projects ADD COLUMN blocked_tasks INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE projects ADD COLUMN auto_progress BOOLEAN NOT NULL DEFAULT 0;
+
+-- Estado inicial a partir de las tareas existentes
+UPDATE projects SET
+    total_tasks = (SELECT COUNT(*) FROM tasks WHERE tasks.project_id = projects.id),
+    completed_tasks = (SELECT COUNT(*) FROM tasks WHERE tasks.project_id = projects.id AND tasks.status = 'completed'),
+    blocked_tasks = (SELECT COUNT(*) FROM tasks WHERE tasks.project_id = projects.id AND tasks.status = 'blocked');
+
+CREATE INDEX IF NOT EXISTS idx_tasks_project_status ON tasks(project_id, status);
+
+CREATE TRIGGER IF NOT EXISTS trg_project_tasks_insert
+AFTER INSERT ON tasks
+BEGIN
+    UPDATE projects SET
+        total_tasks = total_tasks + 1,
+        completed_tasks = completed_tasks + (NEW.status IS 'completed'),
+        blocked_tasks = blocked_tasks + (NEW.status IS 'blocked')
+    WHERE id = NEW.project_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_project_tasks_delete
+AFTER DELETE ON tasks
+BEGIN
+    UPDATE projects SET
+        total_tasks = total_tasks - 1,
+        completed_tasks = completed_tasks - (OLD.status IS 'completed'),
+        blocked_tasks = blocked_tasks - (OLD.status IS 'blocked')
+    WHERE id = OLD.project_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_project_tasks_update
+AFTER UPDATE OF status, project_id ON tasks
+WHEN OLD.status IS NOT NEW.status OR OLD.project_id IS NOT NEW.project_id
+BEGIN
+    UPDATE projects SET
+        total_tasks = total_tasks - 1,
+        completed_tasks = completed_tasks - (OLD.status IS 'completed'),
+        blocked_tasks = blocked_tasks - (OLD.status IS 'blocked')
+    WHERE id = OLD.project_id;
+
+    UPDATE projects SET
+        total_tasks = total_tasks + 1,
+        completed_tasks = completed_tasks + (NEW.status IS 'completed'),
+        blocked_tasks = blocked_tasks + (NEW.status IS 'blocked')
+    WHERE id = NEW.project_id;
+END;
+
+-- Progreso automático: porcentaje de tareas completadas
+CREATE TRIGGER IF NOT EXISTS trg_project_auto_progress
+AFTER UPDATE OF total_tasks, completed_tasks, auto_progress ON projects
+WHEN NEW.auto_progress
+BEGIN
+    UPDATE projects SET
+        progress = CASE WHEN NEW.total_tasks > 0
+                        THEN ROUND(100.0 * NEW.completed_tasks / NEW.total_tasks, 2)
+                        ELSE 0 END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = NEW.id;
+END;
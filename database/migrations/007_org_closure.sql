@@ -0,0 +1,69 @@
+-- 🌳 Jerarquía organizativa (tabla de clausura sobre employees.manager_id)
+-- Una fila por cada par (superior, subordinado) de la línea de reporte, con
+-- la distancia entre ambos; cada empleado es su propio ancestro a depth 0.
+-- "¿X está en la línea de Y?" es una búsqueda por clave primaria y el
+-- subárbol de Y un rango del índice. Los triggers la mantienen al crear,
+-- mover o eliminar empleados y rechazan ciclos.
+
+CREATE TABLE IF NOT EXISTS org_closure (
+    ancestor_id INTEGER NOT NULL,
+    descendant_id INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_org_closure_descendant ON org_closure(descendant_id, depth);
+CREATE INDEX IF NOT EXISTS idx_employees_manager ON employees(manager_id);
+
+-- Estado inicial a partir de employees.manager_id
+DELETE FROM org_closure;
+WITH RECURSIVE chain(ancestor_id, descendant_id, depth) AS (
+    SELECT id, id, 0 FROM employees
+    UNION ALL
+    SELECT e.manager_id, chain.descendant_id, chain.depth + 1
+    FROM chain JOIN employees e ON e.id = chain.ancestor_id
+    WHERE e.manager_id IS NOT NULL AND chain.depth < 100
+)
+INSERT OR IGNORE INTO org_closure (ancestor_id, descendant_id, depth)
+SELECT ancestor_id, descendant_id, depth FROM chain;
+
+CREATE TRIGGER IF NOT EXISTS trg_org_employees_insert
+AFTER INSERT ON employees
+BEGIN
+    INSERT INTO org_closure (ancestor_id, descendant_id, depth) VALUES (NEW.id, NEW.id, 0);
+    INSERT INTO org_closure (ancestor_id, descendant_id, depth)
+    SELECT ancestor_id, NEW.id, depth + 1 FROM org_closure
+    WHERE descendant_id = NEW.manager_id;
+END;
+
+-- Un empleado no puede depender de sí mismo ni de alguien de su propio subárbol
+CREATE TRIGGER IF NOT EXISTS trg_org_employees_cycle
+BEFORE UPDATE OF manager_id ON employees
+WHEN NEW.manager_id IS NOT NULL AND EXISTS (
+    SELECT 1 FROM org_closure WHERE ancestor_id = NEW.id AND descendant_id = NEW.manager_id
+)
+BEGIN
+    SELECT RAISE(ABORT, 'org_cycle');
+END;
+
+-- Mover un subárbol: se desenganchan sus ancestros externos y se enganchan los del nuevo superior
+CREATE TRIGGER IF NOT EXISTS trg_org_employees_move
+AFTER UPDATE OF manager_id ON employees
+WHEN OLD.manager_id IS NOT NEW.manager_id
+BEGIN
+    DELETE FROM org_closure
+    WHERE descendant_id IN (SELECT descendant_id FROM org_closure WHERE ancestor_id = NEW.id)
+      AND ancestor_id IN (SELECT ancestor_id FROM org_closure
+                          WHERE descendant_id = NEW.id AND ancestor_id != NEW.id);
+
+    INSERT INTO org_closure (ancestor_id, descendant_id, depth)
+    SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+    FROM org_closure above, org_closure below
+    WHERE above.descendant_id = NEW.manager_id AND below.ancestor_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_org_employees_delete
+AFTER DELETE ON employees
+BEGIN
+    DELETE FROM org_closure WHERE descendant_id = OLD.id OR ancestor_id = OLD.id;
+END;
@@ -0,0 +1,99 @@
+-- 🏢 Instantáneas diarias por departamento
+-- Una fila compacta (sólo números) por departamento y día con plantilla,
+-- rendimiento, distribución salarial, presupuesto consumido y estado de los
+-- proyectos. Las calcula DepartmentAnalytics desde la tarea de mantenimiento
+-- o bajo demanda; los endpoints de tendencias leen sólo esta tabla.
+-- Los triggers anotan en department_snapshot_dirty qué departamentos han
+-- cambiado desde la última instantánea, de modo que el refresco del día
+-- recalcula únicamente esos.
+
+CREATE TABLE IF NOT EXISTS department_snapshots (
+    department_id INTEGER NOT NULL,
+    snapshot_date DATE NOT NULL,
+    headcount INTEGER NOT NULL DEFAULT 0,
+    avg_performance REAL,
+    salary_total REAL NOT NULL DEFAULT 0,
+    salary_min REAL,
+    salary_p25 REAL,
+    salary_median REAL,
+    salary_p75 REAL,
+    salary_max REAL,
+    budget REAL,
+    project_budget REAL NOT NULL DEFAULT 0,
+    project_spent REAL NOT NULL DEFAULT 0,
+    projects_planning INTEGER NOT NULL DEFAULT 0,
+    projects_active INTEGER NOT NULL DEFAULT 0,
+    projects_completed INTEGER NOT NULL DEFAULT 0,
+    projects_cancelled INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (department_id, snapshot_date)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_department_snapshots_date ON department_snapshots(snapshot_date);
+
+-- Refresco incremental: agregados de proyectos de unos pocos departamentos
+CREATE INDEX IF NOT EXISTS idx_projects_department ON projects(department_id, status);
+
+-- Departamentos pendientes de recalcular (OR IGNORE descarta también los NULL)
+CREATE TABLE IF NOT EXISTS department_snapshot_dirty (
+    department_id INTEGER NOT NULL PRIMARY KEY
+) WITHOUT ROWID;
+
+-- Todos pendientes: el primer refresco genera la instantánea inicial
+INSERT OR IGNORE INTO department_snapshot_dirty (department_id) SELECT id FROM departments;
+
+CREATE TRIGGER IF NOT EXISTS trg_dept_dirty_employees_insert
+AFTER INSERT ON employees
+BEGIN
+    INSERT OR IGNORE INTO department_snapshot_dirty (department_id) VALUES (NEW.department_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dept_dirty_employees_delete
+AFTER DELETE ON employees
+BEGIN
+    INSERT OR IGNORE INTO department_snapshot_dirty (department_id) VALUES (OLD.department_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dept_dirty_employees_update
+AFTER UPDATE OF department_id, salary, status, performance_score ON employees
+BEGIN
+    INSERT OR IGNORE INTO department_snapshot_dirty (department_id) VALUES (OLD.department_id);
+    INSERT OR IGNORE INTO department_snapshot_dirty (department_id) VALUES (NEW.department_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dept_dirty_projects_insert
+AFTER INSERT ON projects
+BEGIN
+    INSERT OR IGNORE INTO department_snapshot_dirty (department_id) VALUES (NEW.department_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dept_dirty_projects_delete
+AFTER DELETE ON projects
+BEGIN
+    INSERT OR IGNORE INTO department_snapshot_dirty (department_id) VALUES (OLD.department_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dept_dirty_projects_update
+AFTER UPDATE OF department_id, status, budget, spent_budget ON projects
+BEGIN
+    INSERT OR IGNORE INTO department_snapshot_dirty (department_id) VALUES (OLD.department_id);
+    INSERT OR IGNORE INTO department_snapshot_dirty (department_id) VALUES (NEW.department_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dept_dirty_departments_insert
+AFTER INSERT ON departments
+BEGIN
+    INSERT OR IGNORE INTO department_snapshot_dirty (department_id) VALUES (NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dept_dirty_departments_update
+AFTER UPDATE OF budget ON departments
+BEGIN
+    INSERT OR IGNORE INTO department_snapshot_dirty (department_id) VALUES (NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dept_dirty_departments_delete
+AFTER DELETE ON departments
+BEGIN
+    DELETE FROM department_snapshot_dirty WHERE department_id = OLD.id;
+END;
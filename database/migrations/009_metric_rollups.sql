@@ -0,0 +1,72 @@
+-- 📈 Series temporales de company_metrics
+-- Acumulados por métrica y periodo (día, semana desde el lunes, mes) con
+-- count/sum/min/max y el último valor, mantenidos por un trigger al insertar
+-- puntos. Las consultas de rango leen la resolución más gruesa suficiente y
+-- la retención puede borrar puntos antiguos de company_metrics sin perder
+-- los acumulados: no hay trigger de borrado a propósito.
+
+CREATE TABLE IF NOT EXISTS metric_rollups (
+    metric_name VARCHAR(100) NOT NULL,
+    resolution VARCHAR(10) NOT NULL,  -- day, week, month
+    bucket DATE NOT NULL,  -- primer día del periodo
+    metric_type VARCHAR(50),
+    points INTEGER NOT NULL DEFAULT 0,
+    sum_value REAL NOT NULL DEFAULT 0,
+    min_value REAL,
+    max_value REAL,
+    last_value REAL,
+    last_date DATE,
+    PRIMARY KEY (metric_name, resolution, bucket)
+) WITHOUT ROWID;
+
+-- Estado inicial a partir de los puntos existentes (el último por fecha e id)
+DELETE FROM metric_rollups;
+WITH buckets AS (
+    SELECT id, metric_name, metric_type, metric_value, recorded_date, 'day' as resolution,
+           date(recorded_date) as bucket
+    FROM company_metrics
+    UNION ALL
+    SELECT id, metric_name, metric_type, metric_value, recorded_date, 'week',
+           date(recorded_date, 'weekday 0', '-6 days')
+    FROM company_metrics
+    UNION ALL
+    SELECT id, metric_name, metric_type, metric_value, recorded_date, 'month',
+           date(recorded_date, 'start of month')
+    FROM company_metrics
+),
+ranked AS (
+    SELECT *, ROW_NUMBER() OVER (
+        PARTITION BY metric_name, resolution, bucket ORDER BY recorded_date DESC, id DESC
+    ) as position
+    FROM buckets
+)
+INSERT INTO metric_rollups (metric_name, resolution, bucket, metric_type, points,
+                            sum_value, min_value, max_value, last_value, last_date)
+SELECT metric_name, resolution, bucket,
+       MAX(CASE WHEN position = 1 THEN metric_type END),
+       COUNT(*), SUM(metric_value), MIN(metric_value), MAX(metric_value),
+       MAX(CASE WHEN position = 1 THEN metric_value END),
+       MAX(recorded_date)
+FROM ranked
+GROUP BY metric_name, resolution, bucket;
+
+CREATE TRIGGER IF NOT EXISTS trg_metric_rollups_insert
+AFTER INSERT ON company_metrics
+BEGIN
+    INSERT INTO metric_rollups (metric_name, resolution, bucket, metric_type, points,
+                                sum_value, min_value, max_value, last_value, last_date)
+    VALUES (NEW.metric_name, 'day', date(NEW.recorded_date), NEW.metric_type, 1,
+            NEW.metric_value, NEW.metric_value, NEW.metric_value, NEW.metric_value, date(NEW.recorded_date)),
+           (NEW.metric_name, 'week', date(NEW.recorded_date, 'weekday 0', '-6 days'), NEW.metric_type, 1,
+            NEW.metric_value, NEW.metric_value, NEW.metric_value, NEW.metric_value, date(NEW.recorded_date)),
+           (NEW.metric_name, 'month', date(NEW.recorded_date, 'start of month'), NEW.metric_type, 1,
+            NEW.metric_value, NEW.metric_value, NEW.metric_value, NEW.metric_value, date(NEW.recorded_date))
+    ON CONFLICT (metric_name, resolution, bucket) DO UPDATE SET
+        points = points + 1,
+        sum_value = sum_value + excluded.sum_value,
+        min_value = MIN(min_value, excluded.min_value),
+        max_value = MAX(max_value, excluded.max_value),
+        last_value = CASE WHEN excluded.last_date >= last_date THEN excluded.last_value ELSE last_value END,
+        metric_type = CASE WHEN excluded.last_date >= last_date THEN excluded.metric_type ELSE metric_type END,
+        last_date = MAX(last_date, excluded.last_date);
+END;
@@ -0,0 +1,12 @@
+-- 🚪 Tokens de acceso revocados (logout)
+-- La caché de tokens de cada proceso sólo recuerda sus propias revocaciones;
+-- esta tabla las comparte entre workers y sobrevive a reinicios. Se guarda
+-- el SHA-256 del token (nunca el token en claro) hasta su expiración.
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    token_digest CHAR(64) PRIMARY KEY,
+    expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens(expires_at);
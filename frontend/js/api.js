@@ -7,6 +7,9 @@ class APIClient {
     constructor() {
         this.baseURL = window.location.origin + '/api';
         this.token = localStorage.getItem('access_token');
+        // Respuestas GET con sus validadores (ETag / Last-Modified) para revalidar con 304
+        this.responseCache = new Map();
+        this.maxCacheEntries = 50;
     }
 
     /**
@@ -36,14 +39,48 @@ class APIClient {
         return headers;
     }
 
+    /**
+     * Vaciar la caché de respuestas (al cambiar de sesión cambian los datos visibles)
+     */
+    clearCache() {
+        this.responseCache.clear();
+    }
+
+    /**
+     * Guardar una respuesta GET junto con sus validadores
+     */
+    cacheResponse(endpoint, response, data) {
+        const etag = response.headers.get('ETag');
+        const lastModified = response.headers.get('Last-Modified');
+        if (!etag && !lastModified) return;
+
+        // Reinsertar para mantener el orden LRU del Map
+        this.responseCache.delete(endpoint);
+        this.responseCache.set(endpoint, { etag, lastModified, data });
+
+        if (this.responseCache.size > this.maxCacheEntries) {
+            this.responseCache.delete(this.responseCache.keys().next().value);
+        }
+    }
+
     /**
      * Realizar petición HTTP genérica
+     * Las peticiones GET envían If-None-Match / If-Modified-Since y reutilizan
+     * la copia local cuando el servidor responde 304
      */
-    async request(endpoint, options = {}) {
+    async request(endpoint, options = {}, isRetry = false) {
         const url = `${this.baseURL}${endpoint}`;
+        const isGet = !options.method || options.method.toUpperCase() === 'GET';
+        const cached = isGet ? this.responseCache.get(endpoint) : null;
         
+        const headers = this.getHeaders();
+        if (cached) {
+            if (cached.etag) headers['If-None-Match'] = cached.etag;
+            if (cached.lastModified) headers['If-Modified-Since'] = cached.lastModified;
+        }
+
         const config = {
-            headers: this.getHeaders(),
+            headers,
             ...options
         };
 
@@ -51,9 +88,15 @@ class APIClient {
             showLoading(true);
             const response = await fetch(url, config);
             
-            if (response.status === 401) {
-                // Token expirado, intentar renovar o redirigir a login
-                await this.handleUnauthorized();
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
+            
+            if (response.status === 401 && !endpoint.startsWith('/auth/')) {
+                // Token expirado: renovar y repetir la petición una sola vez
+                if (!isRetry && await this.handleUnauthorized()) {
+                    return await this.request(endpoint, options, true);
+                }
                 return null;
             }
 
@@ -63,6 +106,10 @@ class APIClient {
                 throw new Error(data.error || `HTTP ${response.status}`);
             }
 
+            if (isGet) {
+                this.cacheResponse(endpoint, response, data);
+            }
+
             return data;
         } catch (error) {
             console.error('API Error:', error);
@@ -75,43 +122,165 @@ class APIClient {
 
     /**
      * Manejar token no autorizado
+     * Devuelve true si se obtuvo un nuevo token de acceso
      */
     async handleUnauthorized() {
-        const refreshToken = localStorage.getItem('refresh_token');
-        
-        if (refreshToken) {
-            try {
-                const response = await fetch(`${this.baseURL}/auth/refresh`, {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ refresh_token: refreshToken })
-                });
+        // Peticiones concurrentes comparten una única renovación (el refresh token es de un solo uso)
+        if (!this.refreshPromise) {
+            this.refreshPromise = this.refreshTokens().finally(() => {
+                this.refreshPromise = null;
+            });
+        }
 
-                if (response.ok) {
-                    const data = await response.json();
-                    this.setToken(data.access_token);
-                    localStorage.setItem('refresh_token', data.refresh_token);
-                    return;
-                }
-            } catch (error) {
-                console.error('Token refresh failed:', error);
-            }
+        if (await this.refreshPromise) {
+            return true;
         }
 
         // Si no se puede renovar, cerrar sesión
         this.logout();
+        return false;
+    }
+
+    /**
+     * Renovar tokens con el refresh token (rotación: se guarda el nuevo)
+     */
+    async refreshTokens() {
+        const refreshToken = localStorage.getItem('refresh_token');
+        if (!refreshToken) return false;
+
+        try {
+            const response = await fetch(`${this.baseURL}/auth/refresh`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ refresh_token: refreshToken })
+            });
+
+            if (response.ok) {
+                const data = await response.json();
+                this.setToken(data.access_token);
+                localStorage.setItem('refresh_token', data.refresh_token);
+                return true;
+            }
+        } catch (error) {
+            console.error('Token refresh failed:', error);
+        }
+
+        return false;
     }
 
     /**
      * Cerrar sesión
      */
     logout() {
+        this.revokeSession();
         localStorage.removeItem('access_token');
         localStorage.removeItem('refresh_token');
         localStorage.removeItem('user_data');
         window.location.reload();
     }
 
+    /**
+     * Invalidar el token actual en el servidor (sin esperar respuesta)
+     */
+    revokeSession() {
+        this.clearCache();
+        if (!this.token) return;
+
+        fetch(`${this.baseURL}/auth/logout`, {
+            method: 'POST',
+            headers: this.getHeaders(),
+            body: JSON.stringify({ refresh_token: localStorage.getItem('refresh_token') }),
+            keepalive: true
+        }).catch(() => {});
+    }
+
+    /**
+     * Abrir el canal en tiempo real (/api/stream, Server-Sent Events)
+     * Se usa fetch en lugar de EventSource para poder enviar el token;
+     * reconecta solo y reanuda con Last-Event-ID. Devuelve una función para cerrarlo
+     */
+    openStream(handlers) {
+        const stream = { closed: false, controller: null, lastEventId: null, retryDelay: 3000 };
+
+        const connect = async () => {
+            if (stream.closed) return;
+            stream.controller = new AbortController();
+
+            try {
+                const headers = this.getHeaders();
+                if (stream.lastEventId) {
+                    headers['Last-Event-ID'] = stream.lastEventId;
+                }
+
+                const response = await fetch(`${this.baseURL}/stream`, {
+                    headers,
+                    signal: stream.controller.signal
+                });
+
+                if (response.status === 401) {
+                    if (!await this.handleUnauthorized()) return;
+                } else if (response.ok) {
+                    await this.readEventStream(response, stream, handlers);
+                }
+            } catch (error) {
+                if (stream.closed) return;
+                console.error('Stream error:', error);
+            }
+
+            setTimeout(connect, stream.retryDelay);
+        };
+
+        connect();
+
+        return () => {
+            stream.closed = true;
+            if (stream.controller) stream.controller.abort();
+        };
+    }
+
+    /**
+     * Leer una respuesta text/event-stream y despachar cada evento a su handler
+     */
+    async readEventStream(response, stream, handlers) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) return;
+
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+
+                block.split('\n').forEach(line => {
+                    // Las líneas que empiezan por ':' son keepalives
+                    if (!line || line.startsWith(':')) return;
+
+                    const separator = line.indexOf(':');
+                    const field = separator === -1 ? line : line.slice(0, separator);
+                    const fieldValue = separator === -1 ? '' : line.slice(separator + 1).replace(/^ /, '');
+
+                    if (field === 'event') event = fieldValue;
+                    else if (field === 'data') data += (data ? '\n' : '') + fieldValue;
+                    else if (field === 'id') stream.lastEventId = fieldValue;
+                    else if (field === 'retry') stream.retryDelay = parseInt(fieldValue, 10) || stream.retryDelay;
+                });
+
+                if (data && handlers[event]) {
+                    handlers[event](JSON.parse(data));
+                }
+            }
+        }
+    }
+
     // ============================================
     // 🔐 ENDPOINTS DE AUTENTICACIÓN
     // ============================================
@@ -123,6 +292,7 @@ class APIClient {
         });
 
         if (response) {
+            this.clearCache();
             this.setToken(response.tokens.access_token);
             localStorage.setItem('refresh_token', response.tokens.refresh_token);
             localStorage.setItem('user_data', JSON.stringify(response.user));
@@ -197,6 +367,15 @@ class APIClient {
         return await this.request('/dashboard/metrics');
     }
 
+    // ============================================
+    // 🔎 BÚSQUEDA
+    // ============================================
+
+    async search(query, params = {}) {
+        const queryString = new URLSearchParams({ q: query, ...params }).toString();
+        return await this.request(`/search?${queryString}`);
+    }
+
     // ============================================
     // 🔍 ENDPOINTS DE UTILIDAD
     // ============================================
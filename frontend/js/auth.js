@@ -85,6 +85,9 @@ class AuthManager {
         this.currentUser = null;
         this.userPermissions = [];
         
+        // Invalidar el token en el servidor
+        apiClient.revokeSession();
+        
         // Limpiar localStorage
         localStorage.removeItem('access_token');
         localStorage.removeItem('refresh_token');
@@ -6,7 +6,8 @@
 class DashboardManager {
     constructor() {
         this.charts = {};
-        this.refreshInterval = null;
+        this.metrics = null;
+        this.closeStream = null;
         this.autoRefreshEnabled = true;
     }
 
@@ -23,6 +24,7 @@ class DashboardManager {
             const metrics = await apiClient.getDashboardMetrics();
             
             if (metrics) {
+                this.metrics = metrics;
                 this.updateKPICards(metrics);
                 this.initializeCharts(metrics);
                 this.updateActivityFeed();
@@ -276,26 +278,41 @@ class DashboardManager {
 
     /**
      * Iniciar actualización automática
+     * El servidor empuja los cambios por /api/stream en lugar de sondear
      */
     startAutoRefresh() {
-        if (!this.autoRefreshEnabled) return;
-
-        // Refrescar cada 5 minutos
-        this.refreshInterval = setInterval(() => {
-            this.refreshMetrics();
-        }, 5 * 60 * 1000);
+        if (!this.autoRefreshEnabled || this.closeStream) return;
+
+        this.closeStream = apiClient.openStream({
+            snapshot: (metrics) => this.applyMetrics(metrics, true),
+            metrics: (delta) => this.applyMetrics(delta),
+            project_progress: (event) => updateProjectProgress(event.project_id, event.progress),
+            notification: (notification) => {
+                showNotification(`${escapeHtml(notification.title)}: ${escapeHtml(notification.message)}`,
+                                 notification.type);
+            }
+        });
     }
 
     /**
      * Detener actualización automática
      */
     stopAutoRefresh() {
-        if (this.refreshInterval) {
-            clearInterval(this.refreshInterval);
-            this.refreshInterval = null;
+        if (this.closeStream) {
+            this.closeStream();
+            this.closeStream = null;
         }
     }
 
+    /**
+     * Aplicar métricas recibidas por el canal (instantánea completa o delta)
+     */
+    applyMetrics(metrics, replace = false) {
+        this.metrics = replace || !this.metrics ? metrics : mergeMetrics(this.metrics, metrics);
+        this.updateKPICards(this.metrics);
+        this.updateChartData(this.metrics);
+    }
+
     /**
      * Refrescar métricas
      */
@@ -303,6 +320,7 @@ class DashboardManager {
         try {
             const metrics = await apiClient.getDashboardMetrics();
             if (metrics) {
+                this.metrics = metrics;
                 this.updateKPICards(metrics);
                 
                 // Actualizar datos de gráficos si es necesario
@@ -356,6 +374,18 @@ class DashboardManager {
 // 🎯 FUNCIONES DE UTILIDAD DEL DASHBOARD
 // ============================================
 
+/**
+ * Combinar un delta de métricas con las actuales (recursivo en objetos)
+ */
+function mergeMetrics(current, delta) {
+    const merged = { ...current };
+    Object.entries(delta).forEach(([key, value]) => {
+        const isObject = value && typeof value === 'object' && !Array.isArray(value);
+        merged[key] = isObject && current[key] ? mergeMetrics(current[key], value) : value;
+    });
+    return merged;
+}
+
 /**
  * Actualizar progreso de proyecto en tiempo real
  */
@@ -12,6 +12,7 @@ class ProjectsManager {
             priority: '',
             search: ''
         };
+        this.searchResultIds = null;
         this.isLoading = false;
     }
 
@@ -49,8 +50,9 @@ class ProjectsManager {
         }
 
         if (searchInput) {
-            searchInput.addEventListener('input', debounce((e) => {
-                this.currentFilters.search = e.target.value.toLowerCase();
+            searchInput.addEventListener('input', debounce(async (e) => {
+                this.currentFilters.search = e.target.value.trim();
+                await this.searchProjects();
                 this.applyFilters();
             }, 300));
         }
@@ -94,6 +96,32 @@ class ProjectsManager {
         }
     }
 
+    /**
+     * Buscar proyectos en el servidor (índice de texto completo)
+     * Guarda los ids por orden de relevancia; los que no están cargados se piden aparte
+     */
+    async searchProjects() {
+        this.searchResultIds = null;
+        if (!this.currentFilters.search) return;
+
+        try {
+            const response = await apiClient.search(this.currentFilters.search, {
+                type: 'projects',
+                per_page: 50
+            });
+            if (!response) return;
+
+            this.searchResultIds = response.results.map(result => result.id);
+
+            const loaded = new Set(this.projects.map(project => project.id));
+            const missing = this.searchResultIds.filter(id => !loaded.has(id));
+            const fetched = await Promise.all(missing.map(id => apiClient.getProject(id)));
+            this.projects.push(...fetched.filter(Boolean));
+        } catch (error) {
+            console.error('Error searching projects:', error);
+        }
+    }
+
     /**
      * Aplicar filtros a los proyectos
      */
@@ -114,12 +142,19 @@ class ProjectsManager {
             );
         }
 
-        // Filtro por búsqueda
-        if (this.currentFilters.search) {
+        // Filtro por búsqueda (orden de relevancia devuelto por /api/search)
+        if (this.currentFilters.search && this.searchResultIds) {
+            const order = new Map(this.searchResultIds.map((id, index) => [id, index]));
+            filtered = filtered
+                .filter(project => order.has(project.id))
+                .sort((a, b) => order.get(a.id) - order.get(b.id));
+        } else if (this.currentFilters.search) {
+            // Sin respuesta del servidor: filtrar lo ya cargado
+            const term = this.currentFilters.search.toLowerCase();
             filtered = filtered.filter(project =>
-                project.name.toLowerCase().includes(this.currentFilters.search) ||
-                project.description?.toLowerCase().includes(this.currentFilters.search) ||
-                project.client_name?.toLowerCase().includes(this.currentFilters.search)
+                project.name.toLowerCase().includes(term) ||
+                project.description?.toLowerCase().includes(term) ||
+                project.client_name?.toLowerCase().includes(term)
             );
         }
 